@@ -0,0 +1,71 @@
+# backend/benchmarks/bench_prompts.py
+
+"""
+Micro-benchmark del costo de CPU por petición al formatear prompts.
+
+Compara compilar las plantillas en cada petición (comportamiento anterior) con
+formatear las plantillas ya compiladas del registro, y verifica que el prefijo
+estático de cada prompt sea idéntico byte a byte entre peticiones.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_prompts [--iterations 2000]
+"""
+
+import argparse
+import timeit
+
+from langchain.schema import AIMessage, HumanMessage
+
+from src.prompts import PROMPTS, build_registry
+
+HISTORY = [
+    HumanMessage(content="¿Qué dice la CGR sobre la ley Karin?"),
+    AIMessage(content="La Contraloría ha emitido dictámenes sobre la aplicación de la ley N° 21.643... " * 5),
+] * 2
+
+CONTEXT = "\n---\n".join(f"Fuente: E{i}/2024\nContenido: " + "texto del dictamen " * 60 for i in range(5))
+
+CASES = {
+    "rag_answer": {"chat_history": HISTORY, "context": CONTEXT, "query": "¿Aplica a municipios?"},
+    "conversational": {"chat_history": HISTORY, "query": "¿Qué es un dictamen?"},
+    "classification": {"chat_history": HISTORY, "query": "¿Aplica a municipios?"},
+    "rewrite": {"chat_history": HISTORY, "original_query": "¿Aplica a municipios?"},
+}
+
+
+def _per_call_us(fn, iterations: int) -> float:
+    return timeit.timeit(fn, number=iterations) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de formateo de prompts")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    compile_us = _per_call_us(build_registry, max(args.iterations // 10, 1))
+    print(f"Compilación de todas las plantillas: {compile_us:9.1f} µs (costo por petición antes del registro)")
+    print()
+    print(f"{'prompt':<16}{'compilar+formatear µs':>24}{'formatear µs':>16}{'prefijo estable':>18}")
+
+    for name, variables in CASES.items():
+        template = PROMPTS.get(name)
+
+        def compiled():
+            template.format_messages(**variables)
+
+        def rebuilt():
+            build_registry().get(name).format_messages(**variables)
+
+        first = template.format_messages(**variables)[0].content.encode("utf-8")
+        second = PROMPTS.get(name).format_messages(**{**variables, "query": "otra consulta"})[0].content.encode("utf-8")
+
+        print(
+            f"{name:<16}"
+            f"{_per_call_us(rebuilt, max(args.iterations // 10, 1)):>24.1f}"
+            f"{_per_call_us(compiled, args.iterations):>16.1f}"
+            f"{'sí' if first == second else 'NO':>18}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# backend/benchmarks/bench_serialization.py
+
+"""
+Benchmark de CPU de serialización y bytes transmitidos para respuestas típicas de /chat.
+
+Compara `json` estándar (como `jsonify` por defecto) con `serialization.dumps` (orjson si
+está instalado) y el tamaño en la red sin compresión, con gzip y con brotli.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_serialization [--iterations 500]
+"""
+
+import argparse
+import json
+import timeit
+
+from src.serialization import BROTLI_AVAILABLE, ORJSON_AVAILABLE, compress, dumps
+
+LEGAL_LIST_ROW = """
+**{i}. Dictamen E{i}0{i}1/2024**
+
+| Campo | Información |
+|-------|-------------|
+| **Número** | E{i}0{i}1 |
+| **Año** | 2024 |
+| **Fecha** | 12/03/2024 |
+| **Resumen** | Se pronuncia sobre la aplicación de la ley N° 21.643 en los procedimientos de investigación por acoso laboral en municipios... |
+| **Leyes Aplicadas** | Ley 21.643, Ley 18.883 art. 82, DFL 29/2004... |
+| **Dictámenes Aplicados** | E123456/2023, E234567/2023... |
+| **URL** | [https://www.contraloria.cl/pdfbuscador/dictamenes/E{i}0{i}1N24/html](https://www.contraloria.cl/pdfbuscador/dictamenes/E{i}0{i}1N24/html) |
+
+---
+"""
+
+ANSWER = (
+    "De acuerdo con la jurisprudencia administrativa de la Contraloría General de la República, "
+    "las licencias médicas de los funcionarios municipales se rigen por... "
+) * 12
+
+
+def legal_list_payload():
+    table = "## 📋 Dictámenes Encontrados\n" + "".join(LEGAL_LIST_ROW.format(i=i) for i in range(1, 4))
+    sources = [{"numero_dictamen": f"E{i}0{i}1", "url": f"https://www.contraloria.cl/{i}"} for i in range(1, 4)]
+    history = [
+        {"role": "user", "content": "¿Cuáles son los dictámenes sobre la ley Karin?", "sources": []},
+        {"role": "assistant", "content": table, "sources": sources},
+    ] * 3
+    return {"response": table, "sources": sources, "session_id": "1712345678901", "history": history}
+
+
+def long_session_payload():
+    sources = [{"source": f"E{i}00{i}/2024", "url": f"https://www.contraloria.cl/{i}", "score": 2.5 - i / 10} for i in range(5)]
+    history = []
+    for turn in range(25):
+        history.append({"role": "user", "content": f"Pregunta de seguimiento número {turn} sobre la materia", "sources": []})
+        history.append({"role": "assistant", "content": ANSWER, "sources": sources})
+    return {"response": ANSWER, "sources": sources, "session_id": "1712345678901", "history": history}
+
+
+def _per_call_us(fn, iterations: int) -> float:
+    return timeit.timeit(fn, number=iterations) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de serialización y compresión")
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"Serializador rápido: {'orjson' if ORJSON_AVAILABLE else 'json compacto (orjson no instalado)'}")
+    print()
+    header = f"{'respuesta':<14}{'json µs':>10}{'rápido µs':>12}{'json B':>10}{'rápido B':>10}{'gzip B':>10}{'gzip µs':>10}"
+    if BROTLI_AVAILABLE:
+        header += f"{'br B':>10}{'br µs':>10}"
+    print(header)
+
+    for name, payload in (("legal_list", legal_list_payload()), ("sesión_larga", long_session_payload())):
+        default_bytes = json.dumps(payload).encode("utf-8")
+        fast_bytes = dumps(payload)
+        gzipped = compress(fast_bytes, "gzip")
+
+        row = (
+            f"{name:<14}"
+            f"{_per_call_us(lambda: json.dumps(payload).encode('utf-8'), args.iterations):>10.1f}"
+            f"{_per_call_us(lambda: dumps(payload), args.iterations):>12.1f}"
+            f"{len(default_bytes):>10}"
+            f"{len(fast_bytes):>10}"
+            f"{len(gzipped):>10}"
+            f"{_per_call_us(lambda: compress(fast_bytes, 'gzip'), args.iterations):>10.1f}"
+        )
+        if BROTLI_AVAILABLE:
+            row += (
+                f"{len(compress(fast_bytes, 'br')):>10}"
+                f"{_per_call_us(lambda: compress(fast_bytes, 'br'), args.iterations):>10.1f}"
+            )
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
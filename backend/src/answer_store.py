@@ -0,0 +1,261 @@
+# backend/src/answer_store.py
+
+"""
+Almacén de respuestas precomputadas para consultas GENERAL_CGR y CONVERSACIONAL.
+
+Las preguntas como "¿qué es un dictamen?" siempre tienen la misma respuesta, por lo que
+se generan una vez con el `conversational_prompt` y se sirven sin llamar al LLM.
+
+El archivo generado está versionado con una huella del prompt y de los modelos de chat
+del pool (AZURE_OPENAI_DEPLOYMENTS): si cambian, el almacén queda obsoleto y se ignora
+hasta regenerarlo con:
+
+    python -m src.answer_store build
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import unicodedata
+from datetime import datetime
+from typing import Dict, List, Optional
+
+STORE_FORMAT_VERSION = 1
+
+# Preguntas semilla agrupadas por respuesta. La primera pregunta de cada grupo es la
+# que se envía al LLM al regenerar; el resto son paráfrasis que comparten la respuesta.
+SEED_QUESTIONS: List[Dict] = [
+    {
+        "id": "saludo",
+        "intent": "CONVERSACIONAL",
+        "questions": ["Hola", "Hola, buenos días", "Buenas tardes", "Buenas noches", "Hello"],
+    },
+    {
+        "id": "despedida",
+        "intent": "CONVERSACIONAL",
+        "questions": ["Chao", "Adiós", "Hasta luego", "Nos vemos", "Bye"],
+    },
+    {
+        "id": "agradecimiento",
+        "intent": "CONVERSACIONAL",
+        "questions": ["Gracias", "Muchas gracias", "Ok, gracias", "Entendido, gracias"],
+    },
+    {
+        "id": "quien_eres",
+        "intent": "CONVERSACIONAL",
+        "questions": ["¿Quién eres?", "¿Qué haces?", "¿En qué me puedes ayudar?", "Ayuda"],
+    },
+    {
+        "id": "que_es_dictamen",
+        "intent": "GENERAL_CGR",
+        "questions": [
+            "¿Qué es un dictamen CGR?", "¿Qué es un dictamen?", "Definición de dictamen",
+            "Concepto de dictamen", "¿Qué significa dictamen?",
+        ],
+    },
+    {
+        "id": "que_es_cgr",
+        "intent": "GENERAL_CGR",
+        "questions": [
+            "¿Qué es la Contraloría General de la República?", "¿Qué es la Contraloría?",
+            "¿Qué es la CGR?",
+        ],
+    },
+    {
+        "id": "funcion_cgr",
+        "intent": "GENERAL_CGR",
+        "questions": [
+            "¿Qué hace la Contraloría?", "¿Cuál es la función de la Contraloría?",
+            "¿Para qué sirve la Contraloría?",
+        ],
+    },
+    {
+        "id": "tipos_dictamen",
+        "intent": "GENERAL_CGR",
+        "questions": [
+            "¿Qué tipos de dictámenes existen?", "Tipos de dictamen", "Clases de dictamen",
+            "Categorías de dictamen",
+        ],
+    },
+]
+
+
+def normalize_query(text: str) -> str:
+    """Normaliza una consulta: minúsculas, sin tildes, sin puntuación y espacios colapsados."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r"[^\w\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def prompt_fingerprint(system_prompt: str, deployment: Optional[str]) -> str:
+    """
+    Huella del prompt y de los modelos con que se generaron las respuestas.
+
+    Args:
+        deployment: Implementaciones de chat del pool, ordenadas y separadas por coma
+    """
+    payload = json.dumps({"prompt": system_prompt, "deployment": deployment}, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class CannedAnswerStore:
+    """
+    Índice de respuestas precomputadas.
+
+    Características:
+    - Coincidencia exacta por consulta normalizada (sin llamadas externas)
+    - Coincidencia por similitud de embedding de paráfrasis con umbral configurable
+    - Se invalida automáticamente si la huella del prompt no coincide
+    """
+
+    def __init__(self, entries: List[Dict], similarity_threshold: float, max_query_words: int):
+        self.entries = entries
+        self.similarity_threshold = similarity_threshold
+        self.max_query_words = max_query_words
+
+        self._by_normalized: Dict[str, Dict] = {}
+        self._vectors: List[tuple] = []
+        for entry in entries:
+            for vector in entry.get("embeddings") or []:
+                self._vectors.append((vector, entry))
+            for question in entry["questions"]:
+                self._by_normalized[normalize_query(question)] = entry
+
+    @classmethod
+    def load(cls, path: str, expected_fingerprint: str, similarity_threshold: float,
+             max_query_words: int) -> Optional["CannedAnswerStore"]:
+        """
+        Carga el almacén desde disco.
+
+        Returns:
+            El almacén, o None si no existe, tiene otro formato o fue generado con otro prompt
+        """
+        if not os.path.exists(path):
+            print(f"ℹ️ Sin respuestas precomputadas en {path}. Genera con: python -m src.answer_store build")
+            return None
+
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"❌ Error al leer respuestas precomputadas: {e}")
+            return None
+
+        if data.get("format_version") != STORE_FORMAT_VERSION:
+            print("⚠️ Formato de respuestas precomputadas incompatible. Se ignoran.")
+            return None
+
+        if data.get("prompt_fingerprint") != expected_fingerprint:
+            print("⚠️ Respuestas precomputadas obsoletas (cambió el prompt o los modelos). Se ignoran hasta regenerarlas.")
+            return None
+
+        store = cls(data.get("entries", []), similarity_threshold, max_query_words)
+        print(f"✅ {len(store.entries)} respuestas precomputadas cargadas (versión {data['prompt_fingerprint']}).")
+        return store
+
+    def lookup(self, query: str, embed=None) -> Optional[Dict]:
+        """
+        Busca una respuesta precomputada para la consulta.
+
+        Args:
+            query: Consulta del usuario
+            embed: Función opcional texto -> embedding para la coincidencia por paráfrasis
+
+        Returns:
+            La entrada encontrada (con 'answer', 'intent' e 'id') o None
+        """
+        normalized = normalize_query(query)
+        if not normalized:
+            return None
+
+        entry = self._by_normalized.get(normalized)
+        if entry:
+            return entry
+
+        if not embed or not self._vectors or len(normalized.split()) > self.max_query_words:
+            return None
+
+        query_vector = embed(query)
+        if not query_vector:
+            return None
+
+        best_score, best_entry = 0.0, None
+        for vector, candidate in self._vectors:
+            score = _cosine(query_vector, vector)
+            if score > best_score:
+                best_score, best_entry = score, candidate
+
+        if best_score >= self.similarity_threshold:
+            print(f"🎯 Paráfrasis de '{best_entry['id']}' (similitud {best_score:.3f})")
+            return best_entry
+        return None
+
+
+def build_store(output_path: str) -> Dict:
+    """Regenera todas las respuestas con el prompt conversacional actual y las guarda en disco."""
+    from .rag_service import RAGService
+    from .utils import get_embeddings
+
+    rag = RAGService()
+    entries = []
+    for seed in SEED_QUESTIONS:
+        formatted_prompt = rag.conversational_prompt.format_messages(
+            chat_history=[],
+            query=seed["questions"][0]
+        )
+        answer = rag.llm.invoke(formatted_prompt).content
+        embeddings = get_embeddings(seed["questions"]) or []
+        entries.append({**seed, "answer": answer, "embeddings": embeddings})
+        print(f"✍️ Generada respuesta para '{seed['id']}' ({len(embeddings)} paráfrasis con embedding)")
+
+    data = {
+        "format_version": STORE_FORMAT_VERSION,
+        "prompt_fingerprint": rag.conversational_fingerprint,
+        "generated_at": datetime.utcnow().isoformat(),
+        "entries": entries,
+    }
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+    print(f"💾 {len(entries)} respuestas guardadas en {output_path}")
+    return data
+
+
+def main():
+    from .config import CANNED_ANSWERS_PATH
+
+    parser = argparse.ArgumentParser(description="Gestión de respuestas precomputadas")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Regenera el almacén con el prompt actual")
+    build_parser.add_argument("--output", default=CANNED_ANSWERS_PATH)
+
+    show_parser = subparsers.add_parser("show", help="Muestra las entradas del almacén")
+    show_parser.add_argument("--path", default=CANNED_ANSWERS_PATH)
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build_store(args.output)
+    elif args.command == "show":
+        with open(args.path, encoding="utf-8") as f:
+            data = json.load(f)
+        print(f"Versión: {data.get('prompt_fingerprint')} - generado {data.get('generated_at')}")
+        for entry in data.get("entries", []):
+            print(f"- [{entry['intent']}] {entry['id']}: {len(entry['questions'])} preguntas")
+
+
+if __name__ == "__main__":
+    main()
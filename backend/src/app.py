@@ -1,13 +1,114 @@
 from quart import Quart, request, jsonify
+from quart.utils import run_sync
 from quart_cors import cors
+import asyncio
+import math
+import threading
 import uuid
-from .rag_service import RAGService
+from .config import WARMUP_ON_STARTUP, TRAFFIC_EXPOSE_TRACE, WARM_CACHE_ENABLED
+from .cosmos_manager import is_reserved_session_id
+from . import serialization, traffic
 
 app = Quart(__name__)
 app = cors(app, allow_origin="*") 
+serialization.install(app)
+
+# El servicio RAG (y sus dependencias pesadas) se crea en el hook de inicio, no al importar
+rag_service = None
+cosmos_db_manager = None
+export_manager = None
+batch_runner = None
+cache_warmer = None
+app_state = {"ready": False}
+
+
+def parse_latency_budget(value):
+    """
+    Presupuesto de latencia de /chat en ms (None = LATENCY_BUDGET_DEFAULT_MS). Acepta
+    números y cadenas numéricas.
+
+    Raises:
+        ValueError: si no es un número positivo
+    """
+    if value is None:
+        return None
+    try:
+        budget = None if isinstance(value, bool) else float(value)
+    except (TypeError, ValueError):
+        budget = None
+    if budget is None or not math.isfinite(budget) or budget <= 0:
+        raise ValueError("latency_budget_ms debe ser un número positivo")
+    return budget
+
+
+@app.before_serving
+async def startup():
+    """
+    Crea el servicio RAG (y el grabador de tráfico, si está activo) y conecta Cosmos DB
+    antes de aceptar tráfico.
+    El warm-up de conexiones corre en segundo plano; /readyz responde 503 hasta que termine.
+    Después, si WARM_CACHE_ENABLED, se inicia el warm-up periódico de cachés.
+    """
+    global rag_service, cosmos_db_manager, export_manager, batch_runner, cache_warmer
+    from .rag_service import RAGService, cosmos_db_manager as manager
+    from .export_jobs import ExportJobManager
+    from .batch import BatchRunner
+    
+    await run_sync(traffic.start_recording)()
+    rag_service = await run_sync(RAGService)()
+    cosmos_db_manager = manager
+    export_manager = ExportJobManager(rag_service.retriever)
+    batch_runner = BatchRunner(rag_service)
+    await run_sync(rag_service.startup)()
+    
+    if WARM_CACHE_ENABLED:
+        from .cache_warmer import CacheWarmer
+        cache_warmer = CacheWarmer(rag_service)
+    
+    if WARMUP_ON_STARTUP:
+        app.add_background_task(warmup)
+    else:
+        app_state["ready"] = True
+        if cache_warmer:
+            cache_warmer.start()
+
+
+async def warmup():
+    await run_sync(rag_service.warmup)()
+    app_state["ready"] = True
+    print("✅ Worker listo para recibir tráfico.")
+    if cache_warmer:
+        cache_warmer.start()
+
+
+@app.after_serving
+async def shutdown():
+    app_state["ready"] = False
+    if cache_warmer:
+        cache_warmer.stop()
+    if export_manager:
+        export_manager.shutdown()
+    if batch_runner:
+        batch_runner.close()
+    if traffic.recorder:
+        traffic.recorder.close()
+    if rag_service:
+        await run_sync(rag_service.shutdown)()
+
+
+@app.route("/healthz", methods=["GET"])
+async def healthz_handler():
+    """Liveness: el proceso responde."""
+    return jsonify({"status": "ok"})
+
+
+@app.route("/readyz", methods=["GET"])
+async def readyz_handler():
+    """Readiness: el servicio está creado y el warm-up terminó."""
+    if not app_state["ready"]:
+        return jsonify({"status": "starting"}), 503
+    return jsonify({"status": "ready", "cosmos_db": cosmos_db_manager.enabled})
 
-rag_service = RAGService()
-# Nota: CosmosDBManager se inicializa dentro de RAGService 
 
 @app.route("/chat", methods=["POST"])
 async def chat_handler():
@@ -16,43 +117,205 @@ async def chat_handler():
     """
     try:
         data = await request.get_json()
+        if not isinstance(data, dict):
+            return jsonify({"error": "Se espera un objeto JSON"}), 400
         user_query = data.get("query", "")
         session_id = data.get("session_id", str(uuid.uuid4()))
         use_two_vectors = data.get("use_two_vectors", False) 
 
         if not user_query:
             return jsonify({"error": "Consulta vacía", "session_id": session_id}), 400
+        if is_reserved_session_id(session_id):
+            return jsonify({"error": "session_id inválido"}), 400
+        try:
+            latency_budget_ms = parse_latency_budget(data.get("latency_budget_ms"))
+        except ValueError as e:
+            return jsonify({"error": str(e), "session_id": session_id}), 400
 
         print(f"[{session_id}] Nueva consulta: '{user_query[:50]}...'. Doble Vector: {use_two_vectors}")
         
         # 1. Generar respuesta RAG (guarda la conversación en memoria RAM)
-        result = rag_service.generate_response(
+        # Se ejecuta en un hilo para no bloquear el event loop (y los probes de salud)
+        result, trace = await run_sync(traffic.traced)(
+            "chat", session_id, user_query,
+            rag_service.generate_response,
             session_id=session_id, 
             query=user_query, 
-            use_two_vectors=use_two_vectors
+            use_two_vectors=use_two_vectors,
+            latency_budget_ms=latency_budget_ms
         )
         
         # 2. Obtener el historial completo actualizado desde el servicio RAG
-        updated_history = rag_service.get_formatted_history(session_id)
+        updated_history = await run_sync(rag_service.get_formatted_history)(session_id)
         
         # CLAVE: Asegurarse de que el último mensaje del historial (el del asistente)
         # tenga las fuentes adjuntas, ya que el servicio RAG solo devuelve el texto y las fuentes.
-        if updated_history and updated_history[-1]['role'] == 'assistant':
+        # Con la generación en segundo plano, el turno actual aún no está en el historial.
+        if updated_history and updated_history[-1]['role'] == 'assistant' and not result.get('pending_answer_id'):
              updated_history[-1]['sources'] = result['sources']
 
 
         # 3. Enviar respuesta final
-        return jsonify({
+        response_payload = {
             "response": result['response'],
             "sources": result['sources'],
             "session_id": session_id,
             "history": updated_history
-        })
+        }
+        
+        # Resultado estructurado (LEGAL_LIST): filas tipadas que renderiza el frontend
+        if result.get('result_type'):
+            response_payload["result_type"] = result['result_type']
+            response_payload["rows"] = result['rows']
+        
+        # Respuesta degradada (solo fuentes): la completa se consulta en /chat/pending/<id>
+        if result.get('degraded'):
+            response_payload["degraded"] = True
+            if result.get('pending_answer_id'):
+                response_payload["pending_answer_id"] = result['pending_answer_id']
+                response_payload["pending_url"] = f"/chat/pending/{result['pending_answer_id']}"
+        
+        # Parámetros de búsqueda elegidos para el presupuesto de latencia
+        if result.get('retrieval_plan'):
+            response_payload["retrieval_plan"] = result['retrieval_plan']
+        
+        response = jsonify(response_payload)
+        if TRAFFIC_EXPOSE_TRACE:
+            response.headers["X-Request-Trace"] = serialization.dumps(trace.summary()).decode("utf-8")
+        return response
     
     except Exception as e:
         print(f"Error fatal en el chat_handler: {e}")
+        history = []
+        if rag_service:
+            try:
+                history = await run_sync(rag_service.get_formatted_history)(session_id)
+            except Exception as history_error:
+                print(f"⚠️ No se pudo cargar el historial de {session_id}: {history_error}")
         return jsonify({
             "error": f"Error interno del servidor: {e}", 
             "session_id": session_id,
-            "history": rag_service.get_formatted_history(session_id) if 'rag_service' in locals() else []
+            "history": history
         }), 500
+
+
+@app.route("/chat/batch", methods=["POST"])
+async def chat_batch_handler():
+    """
+    Responde un lote de preguntas sin sesión y entrega los resultados en JSONL a medida
+    que terminan (la última línea es {"summary": {...}}).
+    
+    Body: {"queries": ["...", {"id": "...", "query": "..."}], "use_two_vectors": false, "retrieval_only": false}
+    """
+    from .batch import parse_items
+    
+    data = await request.get_json()
+    if not isinstance(data, dict):
+        return jsonify({"error": "Se espera un objeto JSON"}), 400
+    try:
+        items = parse_items(data.get("queries") or [])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    stop = threading.Event()
+    results = batch_runner.run(
+        items,
+        use_two_vectors=data.get("use_two_vectors", False),
+        retrieval_only=data.get("retrieval_only", False),
+        stop=stop
+    )
+    
+    async def stream_results():
+        try:
+            while True:
+                result = await asyncio.to_thread(next, results, None)
+                if result is None:
+                    break
+                yield serialization.dumps(result) + b"\n"
+        finally:
+            # El generador puede estar ejecutándose en otro hilo y no se puede cerrar desde
+            # aquí: el lote ve el evento, cancela sus tareas pendientes y termina solo
+            stop.set()
+    
+    return serialization.streaming_response(app, request, stream_results(), "application/x-ndjson")
+
+
+@app.route("/chat/pending/<answer_id>", methods=["GET"])
+async def pending_answer_handler(answer_id):
+    """
+    Resultado de una generación que continuó en segundo plano tras una respuesta degradada.
+    Responde 202 mientras sigue pendiente.
+    """
+    entry = rag_service.pending_answers.get(answer_id)
+    if not entry:
+        return jsonify({"error": "Respuesta no encontrada o expirada"}), 404
+    
+    if entry["status"] == "pending":
+        return jsonify(entry), 202
+    return jsonify(entry)
+
+
+@app.route("/exports", methods=["POST"])
+async def create_export_handler():
+    """
+    Crea un trabajo de exportación del listado completo de dictámenes (CSV o JSONL).
+    
+    Body: {"query": "...", "format": "csv" | "jsonl", "since": "YYYY-MM-DD", "max_rows": N}
+    """
+    data = await request.get_json()
+    if not isinstance(data, dict):
+        return jsonify({"error": "Se espera un objeto JSON"}), 400
+    query = data.get("query", "")
+    if not query:
+        return jsonify({"error": "Consulta vacía"}), 400
+    
+    try:
+        job = export_manager.start(
+            query=query,
+            export_format=data.get("format", "csv"),
+            since=data.get("since"),
+            max_rows=data.get("max_rows")
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify({**job, "status_url": f"/exports/{job['job_id']}"}), 202
+
+
+@app.route("/exports/<job_id>", methods=["GET"])
+async def export_status_handler(job_id):
+    """Estado y progreso de un trabajo de exportación."""
+    job = export_manager.get(job_id)
+    if not job:
+        return jsonify({"error": "Exportación no encontrada"}), 404
+    
+    if job["status"] == "completed":
+        job["download_url"] = f"/exports/{job_id}/download"
+    return jsonify(job)
+
+
+@app.route("/exports/<job_id>/download", methods=["GET"])
+async def export_download_handler(job_id):
+    """Descarga el resultado de una exportación en streaming (con compresión negociada)."""
+    job = export_manager.get(job_id)
+    if not job:
+        return jsonify({"error": "Exportación no encontrada"}), 404
+    if job["status"] != "completed":
+        return jsonify({"error": f"Exportación en estado '{job['status']}'"}), 409
+    
+    path = export_manager.output_path(job)
+    
+    async def read_chunks():
+        with open(path, "rb") as f:
+            while True:
+                chunk = await asyncio.to_thread(f.read, 64 * 1024)
+                if not chunk:
+                    break
+                yield chunk
+    
+    mimetype = "text/csv" if job["format"] == "csv" else "application/x-ndjson"
+    filename = f"dictamenes_{job_id[:8]}.{job['format']}"
+    return serialization.streaming_response(
+        app, request, read_chunks(), mimetype,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -0,0 +1,322 @@
+# backend/src/batch.py
+
+"""
+Respuesta masiva de preguntas (sin sesión) para cargas de auditoría.
+
+Flujo de un lote:
+1. Se deduplican las preguntas (normalizadas) y las repetidas reciben la misma respuesta
+2. Los embeddings se calculan en lotes de BATCH_EMBED_SIZE en un hilo productor, que encola
+   cada pregunta apenas tiene su embedding
+3. Búsqueda y generación corren con concurrencia acotada (BATCH_MAX_CONCURRENCY)
+4. Las llamadas al LLM pasan por un limitador de peticiones/tokens por minuto compartido
+   por todos los lotes del proceso, para aprovechar la cuota sin provocar 429 en cadena
+5. Los resultados se entregan a medida que terminan (JSONL en /chat/batch y en el CLI), sin
+   esperar a que se calculen todos los embeddings
+6. Si el consumidor se detiene (cliente desconectado), el lote cancela lo pendiente
+
+Uso del CLI (desde backend/):
+    python -m src.batch --input preguntas.txt [--output resultados.jsonl] [--retrieval-only]
+    python -m src.batch --input preguntas.jsonl --url http://localhost:8000
+Cada línea de entrada es una pregunta o un JSON {"id": ..., "query": ...}.
+"""
+
+import argparse
+import json
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional
+
+from .answer_store import normalize_query
+from .config import BATCH_MAX_QUERIES, BATCH_EMBED_SIZE, BATCH_MAX_CONCURRENCY, BATCH_MAX_RETRIES
+from .config import BATCH_LLM_REQUESTS_PER_MINUTE, BATCH_LLM_TOKENS_PER_MINUTE
+from .utils import get_embeddings
+
+# Estimación de tokens de una petición: ~4 caracteres por token más la respuesta esperada
+CHARS_PER_TOKEN = 4
+EXPECTED_COMPLETION_TOKENS = 600
+
+# Frecuencia con que el consumidor revisa si el lote se detuvo
+STOP_POLL_SECONDS = 0.5
+
+
+class RateLimiter:
+    """
+    Limitador de peticiones y tokens por minuto (token bucket), seguro entre hilos.
+
+    Un límite en 0 lo desactiva. El límite es por proceso: con varios workers, cada uno
+    debe recibir su parte de la cuota de Azure OpenAI.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._request_allowance = float(requests_per_minute)
+        self._token_allowance = float(tokens_per_minute)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed_minutes = (now - self._updated_at) / 60
+        self._updated_at = now
+        self._request_allowance = min(self.requests_per_minute,
+                                      self._request_allowance + elapsed_minutes * self.requests_per_minute)
+        self._token_allowance = min(self.tokens_per_minute,
+                                    self._token_allowance + elapsed_minutes * self.tokens_per_minute)
+
+    def acquire(self, tokens: int):
+        """Bloquea hasta que haya cupo para una petición de `tokens` tokens."""
+        if self.tokens_per_minute:
+            tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            with self._lock:
+                self._refill()
+                request_ok = not self.requests_per_minute or self._request_allowance >= 1
+                tokens_ok = not self.tokens_per_minute or self._token_allowance >= tokens
+                if request_ok and tokens_ok:
+                    if self.requests_per_minute:
+                        self._request_allowance -= 1
+                    if self.tokens_per_minute:
+                        self._token_allowance -= tokens
+                    return
+                wait_s = 0.0
+                if not request_ok:
+                    wait_s = max(wait_s, (1 - self._request_allowance) / self.requests_per_minute * 60)
+                if not tokens_ok:
+                    wait_s = max(wait_s, (tokens - self._token_allowance) / self.tokens_per_minute * 60)
+            time.sleep(min(wait_s, 5.0))
+
+
+# Compartido por todos los lotes del proceso
+llm_rate_limiter = RateLimiter(BATCH_LLM_REQUESTS_PER_MINUTE, BATCH_LLM_TOKENS_PER_MINUTE)
+
+
+def parse_items(raw_items: List) -> List[Dict]:
+    """
+    Normaliza la entrada: cadenas o dicts {"id", "query"}.
+
+    Raises:
+        ValueError: entrada vacía, demasiado grande o con elementos inválidos
+    """
+    if not raw_items:
+        raise ValueError("El lote no contiene preguntas")
+    if len(raw_items) > BATCH_MAX_QUERIES:
+        raise ValueError(f"El lote supera el máximo de {BATCH_MAX_QUERIES} preguntas")
+
+    items = []
+    for i, raw in enumerate(raw_items):
+        if isinstance(raw, str):
+            raw = {"query": raw}
+        if not isinstance(raw, dict) or not str(raw.get("query", "")).strip():
+            raise ValueError(f"Elemento {i} inválido: se espera una pregunta o {{\"id\", \"query\"}}")
+        items.append({"id": raw.get("id", i), "query": str(raw["query"]).strip()})
+    return items
+
+
+class BatchRunner:
+    """Ejecuta lotes de preguntas sin sesión contra un RAGService."""
+
+    def __init__(self, rag_service):
+        self.rag_service = rag_service
+        self._executor = ThreadPoolExecutor(max_workers=BATCH_MAX_CONCURRENCY, thread_name_prefix="batch")
+
+    def run(self, items: List[Dict], use_two_vectors: bool = False, retrieval_only: bool = False,
+            stop: Optional[threading.Event] = None) -> Iterator[Dict]:
+        """
+        Responde las preguntas y entrega un resultado por elemento de entrada a medida que
+        terminan; al final entrega una línea {"summary": {...}}.
+
+        Args:
+            stop: Evento para detener el lote desde otro hilo (p. ej. el event loop cuando el
+                cliente se desconecta). El lote cancela sus propias tareas pendientes y el
+                iterador termina; también se detiene si el iterador se cierra.
+        """
+        start = time.perf_counter()
+        stop = stop or threading.Event()
+
+        # 1. Deduplicación por consulta normalizada
+        groups: Dict[str, List[Dict]] = {}
+        for item in items:
+            groups.setdefault(normalize_query(item["query"]) or item["query"], []).append(item)
+        keys = list(groups)
+        print(f"📦 Lote: {len(items)} preguntas, {len(keys)} únicas")
+
+        # 2 y 3. Embeddings por lotes en un hilo productor; cada pregunta se encola apenas
+        # tiene su embedding y avisa al terminar en `completed` (None = fin de la producción)
+        futures = {}
+        futures_lock = threading.Lock()
+        completed: "queue.Queue" = queue.Queue()
+
+        def produce():
+            try:
+                for offset in range(0, len(keys), BATCH_EMBED_SIZE):
+                    if stop.is_set():
+                        return
+                    chunk = keys[offset:offset + BATCH_EMBED_SIZE]
+                    embeddings = get_embeddings([groups[key][0]["query"] for key in chunk]) or [None] * len(chunk)
+                    for key, embedding in zip(chunk, embeddings):
+                        with futures_lock:
+                            if stop.is_set():
+                                return
+                            future = self._executor.submit(
+                                self._answer, groups[key][0]["query"], embedding, use_two_vectors, retrieval_only
+                            )
+                            futures[future] = key
+                        future.add_done_callback(completed.put)
+            except Exception as e:
+                print(f"❌ Lote: error al encolar preguntas: {e}")
+            finally:
+                completed.put(None)
+
+        threading.Thread(target=produce, name="batch-producer", daemon=True).start()
+
+        # 5. Resultados en orden de término
+        errors = 0
+        answered = 0
+        producing = True
+        try:
+            while not stop.is_set() and (producing or answered < len(futures)):
+                try:
+                    future = completed.get(timeout=STOP_POLL_SECONDS)
+                except queue.Empty:
+                    continue
+                if future is None:
+                    producing = False
+                    continue
+                answered += 1
+                if future.cancelled():
+                    continue
+                result = future.result()
+                if "error" in result:
+                    errors += 1
+                for item in groups[futures[future]]:
+                    yield {"id": item["id"], "query": item["query"], **result}
+
+            if stop.is_set():
+                print(f"🛑 Lote detenido: {answered}/{len(keys)} preguntas respondidas, se cancela lo pendiente")
+                return
+
+            yield {"summary": {
+                "total": len(items),
+                "unique": len(keys),
+                "errors": errors,
+                "elapsed_s": round(time.perf_counter() - start, 2)
+            }}
+        finally:
+            # 6. Consumidor detenido o lote terminado: nada más se encola y lo pendiente se cancela
+            stop.set()
+            with futures_lock:
+                for future in futures:
+                    future.cancel()
+
+    def _answer(self, query: str, embedding, use_two_vectors: bool, retrieval_only: bool) -> Dict:
+        """Búsqueda y generación de una pregunta (en un hilo del pool del lote)."""
+        service = self.rag_service
+        try:
+            if embedding is None:
+                return {"error": "No se pudo generar el embedding de la consulta"}
+
+            # Sin clasificación de intención, solo la coincidencia exacta con una pregunta
+            # semilla es segura (una paráfrasis podría ser una consulta específica)
+            if service.answer_store and not retrieval_only:
+                canned = service.answer_store.lookup(query)
+                if canned:
+                    return {"response": canned["answer"], "sources": []}
+
+            documents = service.retriever.run_hybrid_search(
+                query_text=query, use_two_vectors=use_two_vectors, query_embedding=embedding
+            )
+            sources = service._format_sources(documents)
+            if retrieval_only:
+                return {"sources": sources}
+
+            formatted_prompt = service.prompt.format_messages(
+                context=service._format_context(documents),
+                chat_history=[],
+                query=query
+            )
+            estimated_tokens = (sum(len(message.content) for message in formatted_prompt) // CHARS_PER_TOKEN
+                                + EXPECTED_COMPLETION_TOKENS)
+
+            for attempt in range(BATCH_MAX_RETRIES + 1):
+                llm_rate_limiter.acquire(estimated_tokens)
+                try:
+                    response = service.llm.invoke(formatted_prompt).content
+                    return {"response": response, "sources": sources}
+                except Exception as e:
+                    if attempt == BATCH_MAX_RETRIES:
+                        raise
+                    backoff_s = 2 ** attempt
+                    print(f"⚠️ Lote: error del LLM ({e}), reintento en {backoff_s} s")
+                    time.sleep(backoff_s)
+        except Exception as e:
+            print(f"❌ Lote: error en '{query[:50]}': {e}")
+            return {"error": str(e)}
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _read_input(path: str) -> List:
+    raw_items = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            raw_items.append(json.loads(line) if line.startswith("{") else line)
+    return raw_items
+
+
+def _run_remote(url: str, payload: Dict, output):
+    """Envía el lote a /chat/batch de un backend en ejecución y copia el JSONL recibido."""
+    import urllib.request
+
+    request = urllib.request.Request(
+        url.rstrip("/") + "/chat/batch",
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request) as response:
+        for line in response:
+            output.write(line.decode("utf-8"))
+            output.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Respuesta masiva de preguntas (JSONL)")
+    parser.add_argument("--input", required=True, help="Archivo con una pregunta (o JSON con id/query) por línea")
+    parser.add_argument("--output", help="Archivo JSONL de salida (por defecto, stdout)")
+    parser.add_argument("--url", help="Backend en ejecución (usa /chat/batch en vez de procesar localmente)")
+    parser.add_argument("--two-vectors", action="store_true", help="Buscar también en el vector de resumen")
+    parser.add_argument("--retrieval-only", action="store_true", help="Solo fuentes, sin generar respuestas")
+    args = parser.parse_args(argv)
+
+    raw_items = _read_input(args.input)
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+
+    try:
+        if args.url:
+            _run_remote(args.url, {"queries": raw_items, "use_two_vectors": args.two_vectors,
+                                   "retrieval_only": args.retrieval_only}, output)
+            return
+
+        from .rag_service import RAGService
+
+        runner = BatchRunner(RAGService())
+        try:
+            for result in runner.run(parse_items(raw_items), args.two_vectors, args.retrieval_only):
+                output.write(json.dumps(result, ensure_ascii=False) + "\n")
+                output.flush()
+        finally:
+            runner.close()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
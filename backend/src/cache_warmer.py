@@ -0,0 +1,167 @@
+# backend/src/cache_warmer.py
+
+"""
+Warm-up de cachés en segundo plano con las consultas frecuentes y los dictámenes nuevos.
+
+Las cachés son por worker y parten vacías tras cada despliegue o escalamiento. Cada ciclo
+(WARM_CACHE_INTERVAL_SECONDS) de cada worker:
+1. Carga en la caché de documentos los dictámenes con fecha desde el ciclo anterior
+   (el primero mira WARM_CACHE_NEW_DOCS_DAYS días atrás); las entradas existentes se refrescan
+2. Toma las consultas semilla (WARM_CACHE_SEED_PATH) y las WARM_CACHE_TOP_N más frecuentes
+   de las últimas WARM_CACHE_HISTORY_HOURS horas del historial en Cosmos DB
+3. Calcula sus embeddings en lotes (caché de embeddings)
+4. Ejecuta su búsqueda: llena la caché de documentos, la de puntajes del cross-encoder local y
+   las ventanas de latencia del planificador
+
+Solo las respuestas precomputadas (GENERAL_CGR / CONVERSACIONAL) son reutilizables entre
+usuarios: las consultas que coinciden exactamente con una pregunta semilla se omiten en la
+búsqueda (sin clasificación de intención, una paráfrasis podría ser una consulta específica),
+y la coincidencia por paráfrasis en /chat queda servida desde la caché de embeddings. Las
+demás respuestas dependen del historial de la sesión y no se precalculan.
+
+Para no competir con el tráfico en vivo, cada llamada externa pasa por un limitador
+(WARM_CACHE_REQUESTS_PER_MINUTE) y el ciclo se pausa mientras el worker atiende más de
+WARM_CACHE_MAX_ACTIVE_REQUESTS peticiones de /chat.
+"""
+
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+from typing import Dict, List
+
+from .answer_store import normalize_query
+from .batch import RateLimiter
+from .config import BATCH_EMBED_SIZE, LATENCY_BUDGET_DEFAULT_MS
+from .config import WARM_CACHE_INTERVAL_SECONDS, WARM_CACHE_TOP_N, WARM_CACHE_SEED_PATH
+from .config import WARM_CACHE_HISTORY_HOURS, WARM_CACHE_HISTORY_MAX_MESSAGES
+from .config import WARM_CACHE_REQUESTS_PER_MINUTE, WARM_CACHE_MAX_ACTIVE_REQUESTS
+from .config import WARM_CACHE_NEW_DOCS_DAYS, WARM_CACHE_NEW_DOCS_LIMIT
+from .rag_service import cosmos_db_manager
+from . import traffic
+from .utils import get_embeddings
+
+# Frecuencia con que se revisa si terminó el tráfico en vivo
+IDLE_POLL_SECONDS = 0.5
+
+
+def load_seed_queries(path: str) -> List[str]:
+    """Consultas semilla, una por línea (se ignoran las vacías y las que empiezan con '#')."""
+    if not path:
+        return []
+    try:
+        with open(path, encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    except OSError as e:
+        print(f"⚠️ No se pudo leer la lista semilla {path}: {e}")
+        return []
+
+
+class CacheWarmer:
+    """Hilo de fondo que precarga las cachés de un RAGService."""
+
+    def __init__(self, rag_service):
+        self.rag_service = rag_service
+        self.seed_queries = load_seed_queries(WARM_CACHE_SEED_PATH)
+        self.limiter = RateLimiter(WARM_CACHE_REQUESTS_PER_MINUTE, 0)
+        self._documents_since = (date.today() - timedelta(days=WARM_CACHE_NEW_DOCS_DAYS)).isoformat()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="cache-warmer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"⚠️ Warm-up de cachés falló: {e}")
+            self._stop.wait(WARM_CACHE_INTERVAL_SECONDS)
+
+    def _wait_turn(self) -> bool:
+        """
+        Espera cupo en el limitador y que el worker no esté atendiendo tráfico.
+
+        Returns:
+            False si el warm-up se detuvo mientras esperaba
+        """
+        self.limiter.acquire(0)
+        while traffic.active_requests() > WARM_CACHE_MAX_ACTIVE_REQUESTS:
+            if self._stop.wait(IDLE_POLL_SECONDS):
+                return False
+        return not self._stop.is_set()
+
+    def popular_queries(self) -> List[str]:
+        """Consultas semilla más las WARM_CACHE_TOP_N más frecuentes del historial reciente."""
+        history = []
+        if cosmos_db_manager.enabled and self._wait_turn():
+            history = cosmos_db_manager.get_recent_user_queries(
+                WARM_CACHE_HISTORY_HOURS, WARM_CACHE_HISTORY_MAX_MESSAGES
+            )
+
+        # Se agrupa por consulta normalizada y se usa la forma literal más frecuente
+        forms: Dict[str, Counter] = {}
+        for query in history:
+            normalized = normalize_query(query)
+            if normalized:
+                forms.setdefault(normalized, Counter())[query.strip()] += 1
+
+        queries = {normalize_query(query): query for query in self.seed_queries}
+        ranked = sorted(forms.items(), key=lambda item: sum(item[1].values()), reverse=True)
+        for normalized, counter in ranked[:WARM_CACHE_TOP_N]:
+            queries.setdefault(normalized, counter.most_common(1)[0][0])
+        return list(queries.values())
+
+    def run_once(self) -> Dict:
+        """Ejecuta un ciclo de warm-up y devuelve sus estadísticas."""
+        start = time.perf_counter()
+        stats = {"queries": 0, "canned": 0, "searched": 0, "new_documents": 0}
+        service = self.rag_service
+        retriever = service.retriever
+
+        # 1. Dictámenes nuevos a la caché de documentos
+        if retriever.document_cache and self._wait_turn():
+            try:
+                documents = retriever.cache_recent_documents(self._documents_since, WARM_CACHE_NEW_DOCS_LIMIT)
+                stats["new_documents"] = len(documents)
+                newest = max((str(doc.get("fecha") or "")[:10] for doc in documents), default="")
+                self._documents_since = max(self._documents_since, newest)
+            except Exception as e:
+                print(f"⚠️ Warm-up: error al cargar dictámenes nuevos: {e}")
+
+        # 2 y 3. Consultas frecuentes y sus embeddings en lotes
+        queries = self.popular_queries()
+        stats["queries"] = len(queries)
+        for offset in range(0, len(queries), BATCH_EMBED_SIZE):
+            if not self._wait_turn():
+                return stats
+            get_embeddings(queries[offset:offset + BATCH_EMBED_SIZE])
+
+        # 4. Búsqueda de cada consulta (las precomputadas exactas no se buscan)
+        for query in queries:
+            if service.answer_store and service.answer_store.lookup(query):
+                stats["canned"] += 1
+                continue
+            if not self._wait_turn():
+                return stats
+            try:
+                if service._detect_search_type(query) == "LEGAL_LIST":
+                    retriever.run_legal_list_search(query, limit=3)
+                else:
+                    retriever.run_hybrid_search(query, latency_budget_ms=LATENCY_BUDGET_DEFAULT_MS or None)
+                stats["searched"] += 1
+            except Exception as e:
+                print(f"⚠️ Warm-up: error al buscar '{query[:50]}': {e}")
+
+        print(
+            f"🔥 Warm-up de cachés: {stats['queries']} consultas ({stats['canned']} precomputadas, "
+            f"{stats['searched']} búsquedas), {stats['new_documents']} dictámenes recientes en caché, "
+            f"{time.perf_counter() - start:.1f} s"
+        )
+        return stats
@@ -26,3 +26,152 @@ COSMOS_CONTAINER_NAME = os.getenv("COSMOS_CONTAINER_NAME", "chat_history")
 
 # Flag para habilitar/deshabilitar Cosmos DB
 USE_COSMOS_DB = os.getenv("USE_COSMOS_DB", "false").lower() == "true"
+
+# Respuestas precomputadas (GENERAL_CGR / CONVERSACIONAL)
+USE_CANNED_ANSWERS = os.getenv("USE_CANNED_ANSWERS", "true").lower() == "true"
+CANNED_ANSWERS_PATH = os.getenv(
+    "CANNED_ANSWERS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "canned_answers.json")
+)
+CANNED_ANSWERS_SIMILARITY_THRESHOLD = float(os.getenv("CANNED_ANSWERS_SIMILARITY_THRESHOLD", "0.92"))
+# Solo se calcula embedding para consultas cortas (las preguntas precomputadas lo son)
+CANNED_ANSWERS_MAX_QUERY_WORDS = int(os.getenv("CANNED_ANSWERS_MAX_QUERY_WORDS", "12"))
+
+# Reordenamiento local de candidatos (sin reranker semántico)
+# off: desactivado | fallback: solo si la búsqueda semántica no está disponible | always: siempre
+RERANK_MODE = os.getenv("RERANK_MODE", "fallback").lower()
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "50"))
+# Presupuesto, lotes y caché de puntajes aplican al cross-encoder ONNX (el puntuador NumPy
+# puntúa todos los candidatos en una pasada)
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "150"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "10000"))
+RERANK_ONNX_MODEL_PATH = os.getenv("RERANK_ONNX_MODEL_PATH")
+# Recuperar el campo 'embedding' de los candidatos para coseno exacto (más payload); sin ellos se
+# usa el puntaje híbrido de Azure, que ya incluye la similitud vectorial
+RERANK_FETCH_VECTORS = os.getenv("RERANK_FETCH_VECTORS", "false").lower() == "true"
+
+# Modo de recuperación: single | multi_query | hyde
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "single").lower()
+MULTI_QUERY_VARIANTS = int(os.getenv("MULTI_QUERY_VARIANTS", "3"))
+MULTI_QUERY_BRANCH_TOP = int(os.getenv("MULTI_QUERY_BRANCH_TOP", "10"))
+# Tiempo máximo para generar las variantes y ejecutar las ramas extra; las más lentas se
+# descartan (la rama de la consulta original siempre se espera)
+MULTI_QUERY_BUDGET_MS = float(os.getenv("MULTI_QUERY_BUDGET_MS", "2500"))
+# Peticiones simultáneas por worker que el pool de ramas debe atender sin encolar
+MULTI_QUERY_CONCURRENT_REQUESTS = int(os.getenv("MULTI_QUERY_CONCURRENT_REQUESTS", "8"))
+# Por defecto: (variantes + consulta original + llamada de expansión) x peticiones simultáneas
+MULTI_QUERY_MAX_WORKERS = int(os.getenv(
+    "MULTI_QUERY_MAX_WORKERS", str((MULTI_QUERY_VARIANTS + 2) * MULTI_QUERY_CONCURRENT_REQUESTS)
+))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Caché de documentos calientes (el ranking devuelve solo chunk_id y puntajes)
+HOT_DOC_CACHE_ENABLED = os.getenv("HOT_DOC_CACHE_ENABLED", "false").lower() == "true"
+HOT_DOC_CACHE_MAX_ENTRIES = int(os.getenv("HOT_DOC_CACHE_MAX_ENTRIES", "5000"))
+# Etiqueta de versión del índice: cambiarla al reindexar invalida la caché
+SEARCH_INDEX_VERSION = os.getenv("SEARCH_INDEX_VERSION")
+
+# Expiración de sesiones en Cosmos DB (0 = sin TTL)
+COSMOS_SESSION_TTL_SECONDS = int(os.getenv("COSMOS_SESSION_TTL_SECONDS", "0"))
+# Frecuencia máxima de renovación del TTL de una sesión activa
+COSMOS_TTL_REFRESH_INTERVAL_SECONDS = int(os.getenv("COSMOS_TTL_REFRESH_INTERVAL_SECONDS", "3600"))
+COSMOS_DELETE_PAGE_SIZE = int(os.getenv("COSMOS_DELETE_PAGE_SIZE", "100"))
+
+# Warm-up al iniciar cada worker: pre-abre conexiones antes de declararse listo (/readyz)
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
+
+# Compresión de respuestas (gzip/brotli negociado con Accept-Encoding)
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "5"))
+
+# Resultado de LEGAL_LIST: structured (filas JSON para el frontend) | markdown (tabla en el servidor)
+LEGAL_LIST_RESULT_MODE = os.getenv("LEGAL_LIST_RESULT_MODE", "structured").lower()
+
+# Exportación de listados de dictámenes (trabajos en segundo plano)
+EXPORT_DIR = os.getenv("EXPORT_DIR", "/tmp/exports")
+EXPORT_MAX_CONCURRENT_JOBS = int(os.getenv("EXPORT_MAX_CONCURRENT_JOBS", "2"))
+EXPORT_MAX_ROWS = int(os.getenv("EXPORT_MAX_ROWS", "100000"))
+EXPORT_RETENTION_SECONDS = int(os.getenv("EXPORT_RETENTION_SECONDS", "86400"))
+
+# Presupuesto de latencia de la búsqueda (ms): el retriever elige kNN, vector de resumen y
+# reranker semántico según las latencias recientes. 0 = parámetros fijos (la petición puede
+# enviar su propio latency_budget_ms)
+LATENCY_BUDGET_DEFAULT_MS = float(os.getenv("LATENCY_BUDGET_DEFAULT_MS", "0"))
+LATENCY_BUDGET_PERCENTILE = float(os.getenv("LATENCY_BUDGET_PERCENTILE", "95"))
+LATENCY_WINDOW_SIZE = int(os.getenv("LATENCY_WINDOW_SIZE", "200"))
+# Las observaciones más antiguas expiran para volver a probar perfiles descartados
+LATENCY_WINDOW_SECONDS = float(os.getenv("LATENCY_WINDOW_SECONDS", "300"))
+LATENCY_MIN_SAMPLES = int(os.getenv("LATENCY_MIN_SAMPLES", "5"))
+
+# Pool de implementaciones de Azure OpenAI (JSON; ver llm_pool.load_deployment_configs).
+# Vacío = una sola implementación con AZURE_OPENAI_ENDPOINT
+AZURE_OPENAI_DEPLOYMENTS = os.getenv("AZURE_OPENAI_DEPLOYMENTS", "").strip()
+LLM_REQUEST_TIMEOUT_SECONDS = float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "60"))
+# Reintentos dentro de una misma implementación (el pool hace failover a las demás)
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2" if not AZURE_OPENAI_DEPLOYMENTS else "0"))
+LLM_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "3"))
+LLM_CIRCUIT_COOLDOWN_SECONDS = float(os.getenv("LLM_CIRCUIT_COOLDOWN_SECONDS", "30"))
+# Hedging: copia de la petición en otra implementación si la primera supera su p95
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+LLM_HEDGE_MIN_DELAY_MS = float(os.getenv("LLM_HEDGE_MIN_DELAY_MS", "1500"))
+# Retardo mientras no hay latencias suficientes para estimar el p95
+LLM_HEDGE_DEFAULT_DELAY_MS = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY_MS", "8000"))
+LLM_POOL_MAX_WORKERS = int(os.getenv("LLM_POOL_MAX_WORKERS", "16"))
+
+# Plazo de la generación de la respuesta (s). Al excederlo, o con los circuitos del LLM
+# abiertos, /chat responde solo con las fuentes recuperadas (0 = sin plazo)
+ANSWER_DEADLINE_SECONDS = float(os.getenv("ANSWER_DEADLINE_SECONDS", "25"))
+# La generación sigue en segundo plano y se consulta en GET /chat/pending/<answer_id>
+DEGRADED_CONTINUE_IN_BACKGROUND = os.getenv("DEGRADED_CONTINUE_IN_BACKGROUND", "true").lower() == "true"
+GENERATION_MAX_WORKERS = int(os.getenv("GENERATION_MAX_WORKERS", "16"))
+PENDING_ANSWERS_DIR = os.getenv("PENDING_ANSWERS_DIR", "/tmp/pending_answers")
+PENDING_ANSWERS_RETENTION_SECONDS = int(os.getenv("PENDING_ANSWERS_RETENTION_SECONDS", "3600"))
+# Plazo de la clasificación y la reescritura de la consulta (s). Al excederlo se usa la
+# clasificación por reglas / la consulta original (0 = sin plazo)
+AUX_LLM_DEADLINE_SECONDS = float(os.getenv("AUX_LLM_DEADLINE_SECONDS", "8"))
+
+# Respuesta masiva (/chat/batch y python -m src.batch)
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "1000"))
+BATCH_EMBED_SIZE = int(os.getenv("BATCH_EMBED_SIZE", "16"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+BATCH_MAX_RETRIES = int(os.getenv("BATCH_MAX_RETRIES", "2"))
+# Cuota de Azure OpenAI asignada a los lotes, por proceso (0 = sin límite)
+BATCH_LLM_REQUESTS_PER_MINUTE = int(os.getenv("BATCH_LLM_REQUESTS_PER_MINUTE", "0"))
+BATCH_LLM_TOKENS_PER_MINUTE = int(os.getenv("BATCH_LLM_TOKENS_PER_MINUTE", "0"))
+
+# Grabación anonimizada del tráfico de /chat (ver traffic.py y python -m src.replay)
+TRAFFIC_RECORD_ENABLED = os.getenv("TRAFFIC_RECORD_ENABLED", "false").lower() == "true"
+TRAFFIC_RECORD_DIR = os.getenv("TRAFFIC_RECORD_DIR", "/tmp/traffic")
+# Consultas en el log: hash (solo huella) | redacted (texto sin RUT/correos/teléfonos) | full.
+# Guardar el texto de las consultas debe habilitarse explícitamente
+TRAFFIC_RECORD_QUERIES = os.getenv("TRAFFIC_RECORD_QUERIES", "hash").lower()
+# Sal de los hashes de sesión y consulta. Vacía = aleatoria, guardada en TRAFFIC_RECORD_DIR/.salt
+# (configúrala si varias réplicas graban en directorios distintos y se comparan sus logs)
+TRAFFIC_RECORD_SALT = os.getenv("TRAFFIC_RECORD_SALT", "")
+TRAFFIC_RECORD_MAX_BYTES = int(os.getenv("TRAFFIC_RECORD_MAX_BYTES", str(100 * 1024 * 1024)))
+# Devuelve el resumen de la traza en el encabezado X-Request-Trace (solo para pruebas)
+TRAFFIC_EXPOSE_TRACE = os.getenv("TRAFFIC_EXPOSE_TRACE", "false").lower() == "true"
+
+# Sustitutos locales de Azure AI Search / Azure OpenAI para reproducir tráfico (ver standins.py)
+STANDIN_MODE = os.getenv("STANDIN_MODE", "false").lower() == "true"
+STANDIN_CORPUS_PATH = os.getenv("STANDIN_CORPUS_PATH", "")
+STANDIN_LATENCY_SCALE = float(os.getenv("STANDIN_LATENCY_SCALE", "1.0"))
+
+# Caché de embeddings de consultas por worker (LRU; 0 = desactivada)
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "2000"))
+
+# Warm-up de cachés en segundo plano con las consultas frecuentes (ver cache_warmer.py)
+WARM_CACHE_ENABLED = os.getenv("WARM_CACHE_ENABLED", "false").lower() == "true"
+WARM_CACHE_INTERVAL_SECONDS = float(os.getenv("WARM_CACHE_INTERVAL_SECONDS", "900"))
+WARM_CACHE_TOP_N = int(os.getenv("WARM_CACHE_TOP_N", "50"))
+WARM_CACHE_HISTORY_HOURS = int(os.getenv("WARM_CACHE_HISTORY_HOURS", "24"))
+WARM_CACHE_HISTORY_MAX_MESSAGES = int(os.getenv("WARM_CACHE_HISTORY_MAX_MESSAGES", "5000"))
+# Archivo con consultas semilla (una por línea), siempre incluidas
+WARM_CACHE_SEED_PATH = os.getenv("WARM_CACHE_SEED_PATH", "")
+# Llamadas externas por minuto del warm-up, por worker; se pausa con tráfico en vivo
+WARM_CACHE_REQUESTS_PER_MINUTE = int(os.getenv("WARM_CACHE_REQUESTS_PER_MINUTE", "30"))
+WARM_CACHE_MAX_ACTIVE_REQUESTS = int(os.getenv("WARM_CACHE_MAX_ACTIVE_REQUESTS", "0"))
+# Dictámenes nuevos que se cargan en la caché de documentos (el primer ciclo mira N días atrás)
+WARM_CACHE_NEW_DOCS_DAYS = int(os.getenv("WARM_CACHE_NEW_DOCS_DAYS", "7"))
+WARM_CACHE_NEW_DOCS_LIMIT = int(os.getenv("WARM_CACHE_NEW_DOCS_LIMIT", "200"))
@@ -1,7 +1,11 @@
 # backend/src/cosmos_manager.py
 
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterator
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import threading
+import time
 import uuid
 
 try:
@@ -12,6 +16,37 @@ except ImportError:
     print("⚠️ azure-cosmos no está instalado. Instala con: pip install azure-cosmos")
 
 from .config import COSMOS_ENDPOINT, COSMOS_KEY, COSMOS_DATABASE_NAME, COSMOS_CONTAINER_NAME, USE_COSMOS_DB
+from .config import COSMOS_SESSION_TTL_SECONDS, COSMOS_TTL_REFRESH_INTERVAL_SECONDS, COSMOS_DELETE_PAGE_SIZE
+
+# Máximo de operaciones por batch transaccional de Cosmos DB
+MAX_BATCH_OPERATIONS = 100
+
+# Partición lógica que contiene un ítem resumen por sesión (índice de sesiones)
+SESSION_INDEX_PARTITION = "__session_index__"
+SESSION_TITLE_MAX_LENGTH = 80
+
+# Sesiones cuya última renovación de TTL se recuerda (LRU, por proceso)
+TTL_TRACKED_SESSIONS_MAX = 10000
+
+
+def is_reserved_session_id(session_id: str) -> bool:
+    """Los clientes no pueden usar la partición del índice de sesiones como session_id."""
+    return session_id == SESSION_INDEX_PARTITION
+
+
+class RequestCharge:
+    """
+    Acumula las RU de las operaciones a las que se pasa como `raw_response_hook`.
+    
+    Lee el encabezado de cada respuesta HTTP en vez de `last_response_headers` del cliente,
+    que es compartido y se sobrescribe desde otros hilos.
+    """
+    
+    def __init__(self):
+        self.total = 0.0
+    
+    def __call__(self, pipeline_response):
+        self.total += float(pipeline_response.http_response.headers.get("x-ms-request-charge") or 0.0)
 
 
 class CosmosDBManager:
@@ -21,15 +56,42 @@ class CosmosDBManager:
     Características:
     - Guarda mensajes de usuario y asistente con timestamp
     - Recupera historial completo por session_id
-    - Limpia historial antiguo
+    - Mantiene un índice de sesiones (un resumen por sesión en una sola partición)
+    - Expiración por TTL del contenedor, renovada por sesión con cada actividad
+    - Eliminación masiva por partición con batches transaccionales
+    - Limpia historial antiguo reportando progreso y RU consumidas
     - Manejo robusto de errores
     """
     
-    def __init__(self):
+    def __init__(self, lazy: bool = False):
+        """
+        Args:
+            lazy: Si es True, no se conecta hasta llamar a `initialize()` (hook de inicio de la app)
+        """
         self.enabled = False
+        self.initialized = False
         self.client = None
         self.database = None
         self.container = None
+        self.ttl_enabled = COSMOS_SESSION_TTL_SECONDS > 0
+        # Última renovación de TTL por sesión (LRU acotada, por proceso); la renovación
+        # corre en un hilo propio, fuera del camino de las peticiones de chat
+        self._ttl_refreshed_at: "OrderedDict[str, float]" = OrderedDict()
+        self._ttl_lock = threading.Lock()
+        self._ttl_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cosmos-ttl")
+        
+        if not lazy:
+            self.initialize()
+    
+    def initialize(self):
+        """
+        Conecta con Cosmos DB (round trips de creación de base de datos y contenedor).
+        
+        Es idempotente: las llamadas posteriores no hacen nada.
+        """
+        if self.initialized:
+            return
+        self.initialized = True
         
         # Solo inicializar si está habilitado y las credenciales están disponibles
         if not USE_COSMOS_DB:
@@ -68,13 +130,181 @@ class CosmosDBManager:
         
         # Crear contenedor si no existe (particionado por session_id para mejor rendimiento)
         # Sin especificar throughput - compatible con cuentas Serverless
+        # Con TTL habilitado, cada ítem expira COSMOS_SESSION_TTL_SECONDS después de su última escritura.
+        # En un contenedor existente el TTL no se aplica al iniciar (ver enable_container_ttl)
+        container_kwargs = {"default_ttl": COSMOS_SESSION_TTL_SECONDS} if self.ttl_enabled else {}
         self.container = self.database.create_container_if_not_exists(
             id=COSMOS_CONTAINER_NAME,
-            partition_key=PartitionKey(path="/session_id")
+            partition_key=PartitionKey(path="/session_id"),
+            **container_kwargs
         )
         
+        if self.ttl_enabled:
+            self._check_container_ttl()
+        
         print(f"🔧 Cosmos DB configurado: {COSMOS_DATABASE_NAME}/{COSMOS_CONTAINER_NAME}")
 
+    def _check_container_ttl(self):
+        """
+        Avisa si el contenedor existente no tiene el TTL configurado.
+        
+        No lo modifica: activar el TTL en un contenedor con datos elimina de inmediato los
+        ítems más antiguos que el TTL, por lo que es una migración explícita (`enable-ttl`).
+        """
+        properties = self.container.read()
+        if properties.get("defaultTtl") != COSMOS_SESSION_TTL_SECONDS:
+            print(
+                f"⚠️ El contenedor tiene defaultTtl={properties.get('defaultTtl')} y se configuró "
+                f"{COSMOS_SESSION_TTL_SECONDS}: los mensajes no expiran hasta ejecutar "
+                f"'python -m src.cosmos_manager enable-ttl'"
+            )
+
+    def enable_container_ttl(self, confirm: bool = False) -> Dict:
+        """
+        Migración: aplica COSMOS_SESSION_TTL_SECONDS como TTL por defecto del contenedor.
+        
+        Al aplicarse, Cosmos DB elimina en segundo plano todos los ítems cuya última
+        escritura es más antigua que el TTL. Sin `confirm` solo informa cuántos serían.
+        Se conservan la política de indexación y la de resolución de conflictos (el
+        reemplazo del contenedor es un PUT completo).
+        
+        Returns:
+            TTL actual, TTL configurado, ítems que expirarían y si se aplicó
+        """
+        if not self.enabled or not self.ttl_enabled:
+            raise RuntimeError("Cosmos DB deshabilitado o COSMOS_SESSION_TTL_SECONDS=0")
+        
+        properties = self.container.read()
+        cutoff_ts = int(time.time()) - COSMOS_SESSION_TTL_SECONDS
+        expiring = next(iter(self.container.query_items(
+            query="SELECT VALUE COUNT(1) FROM c WHERE c._ts < @cutoff_ts",
+            parameters=[{"name": "@cutoff_ts", "value": cutoff_ts}],
+            enable_cross_partition_query=True
+        )), 0)
+        result = {
+            "current_ttl": properties.get("defaultTtl"),
+            "configured_ttl": COSMOS_SESSION_TTL_SECONDS,
+            "expiring_items": expiring,
+            "applied": False
+        }
+        print(f"⏳ TTL actual: {result['current_ttl']}, configurado: {COSMOS_SESSION_TTL_SECONDS} s; "
+              f"{expiring} ítems expirarían al aplicarlo")
+        
+        if not confirm or properties.get("defaultTtl") == COSMOS_SESSION_TTL_SECONDS:
+            return result
+        
+        self.container = self.database.replace_container(
+            self.container,
+            partition_key=PartitionKey(path="/session_id"),
+            indexing_policy=properties.get("indexingPolicy"),
+            conflict_resolution_policy=properties.get("conflictResolutionPolicy"),
+            default_ttl=COSMOS_SESSION_TTL_SECONDS
+        )
+        result["applied"] = True
+        print(f"⏳ TTL del contenedor configurado en {COSMOS_SESSION_TTL_SECONDS} segundos")
+        return result
+
+    def _iter_session_item_pages(self, session_id: str, charge: RequestCharge,
+                                 older_than_ts: Optional[int] = None) -> Iterator[List[str]]:
+        """
+        Recorre los ids de una sesión por páginas (continuación), sin cargarlos todos en memoria.
+        
+        Args:
+            older_than_ts: Si se entrega, solo los ítems con última escritura anterior (_ts)
+        """
+        query, parameters = "SELECT c.id FROM c", []
+        if older_than_ts is not None:
+            query += " WHERE c._ts < @older_than_ts"
+            parameters.append({"name": "@older_than_ts", "value": older_than_ts})
+        
+        pages = self.container.query_items(
+            query=query,
+            parameters=parameters,
+            partition_key=session_id,
+            max_item_count=COSMOS_DELETE_PAGE_SIZE,
+            raw_response_hook=charge
+        ).by_page()
+        
+        for page in pages:
+            ids = [item["id"] for item in page]
+            if ids:
+                yield ids
+
+    def _execute_partition_batches(self, session_id: str, operations: List[tuple], charge: RequestCharge):
+        """
+        Ejecuta operaciones en batches transaccionales de una partición (RU en `charge`).
+        
+        Si un batch falla (p. ej. un ítem ya expiró por TTL), se reintentan sus operaciones
+        una a una ignorando los ítems inexistentes.
+        """
+        for start in range(0, len(operations), MAX_BATCH_OPERATIONS):
+            chunk = operations[start:start + MAX_BATCH_OPERATIONS]
+            try:
+                self.container.execute_item_batch(
+                    batch_operations=chunk, partition_key=session_id, raw_response_hook=charge
+                )
+            except exceptions.CosmosBatchOperationError:
+                for operation, args in chunk:
+                    try:
+                        if operation == "delete":
+                            self.container.delete_item(
+                                item=args[0], partition_key=session_id, raw_response_hook=charge
+                            )
+                        elif operation == "patch":
+                            self.container.patch_item(
+                                item=args[0], partition_key=session_id, patch_operations=args[1],
+                                raw_response_hook=charge
+                            )
+                    except exceptions.CosmosResourceNotFoundError:
+                        pass
+
+    def schedule_ttl_refresh(self, session_id: str):
+        """
+        Encola la renovación del TTL de una sesión activa (como máximo una vez cada
+        COSMOS_TTL_REFRESH_INTERVAL_SECONDS por sesión y proceso).
+        
+        La primera actividad de una sesión en el proceso también renueva: la sesión pudo
+        estar inactiva (o atendida por otro proceso) y sus ítems antiguos estar por expirar.
+        """
+        if not self.enabled or not self.ttl_enabled:
+            return
+        
+        now = time.monotonic()
+        with self._ttl_lock:
+            last_refresh = self._ttl_refreshed_at.get(session_id)
+            if last_refresh is not None and now - last_refresh < COSMOS_TTL_REFRESH_INTERVAL_SECONDS:
+                self._ttl_refreshed_at.move_to_end(session_id)
+                return
+            self._ttl_refreshed_at[session_id] = now
+            self._ttl_refreshed_at.move_to_end(session_id)
+            while len(self._ttl_refreshed_at) > TTL_TRACKED_SESSIONS_MAX:
+                self._ttl_refreshed_at.popitem(last=False)
+        
+        self._ttl_executor.submit(self.refresh_session_ttl, session_id)
+
+    def refresh_session_ttl(self, session_id: str):
+        """
+        Renueva el TTL de los ítems de una sesión que ya consumieron la mitad de su TTL.
+        
+        El TTL de Cosmos DB es por ítem y se reinicia con cada escritura, por lo que sin
+        renovación los mensajes antiguos de una sesión activa expirarían antes que la sesión.
+        Cada ítem se parcha a lo sumo una vez por medio TTL, no en cada renovación.
+        """
+        if not self.enabled or not self.ttl_enabled:
+            return
+        
+        try:
+            patch = [{"op": "set", "path": "/ttl", "value": COSMOS_SESSION_TTL_SECONDS}]
+            older_than_ts = int(time.time()) - COSMOS_SESSION_TTL_SECONDS // 2
+            charge, refreshed = RequestCharge(), 0
+            for ids in self._iter_session_item_pages(session_id, charge, older_than_ts=older_than_ts):
+                self._execute_partition_batches(session_id, [("patch", (item_id, patch)) for item_id in ids], charge)
+                refreshed += len(ids)
+            if refreshed:
+                print(f"⏳ TTL renovado para sesión {session_id}: {refreshed} ítems ({charge.total:.1f} RU)")
+        except Exception as e:
+            print(f"❌ Error al renovar TTL de sesión: {e}")
+
     def save_message(self, session_id: str, role: str, content: str, sources: Optional[List[Dict]] = None):
         """
         Guarda un mensaje individual en Cosmos DB.
@@ -88,6 +318,10 @@ class CosmosDBManager:
         if not self.enabled:
             return  # Silenciosamente no hace nada si no está habilitado
         
+        if is_reserved_session_id(session_id):
+            print(f"⚠️ session_id reservado, mensaje no guardado: {session_id}")
+            return
+        
         try:
             message_id = str(uuid.uuid4())
             timestamp = datetime.utcnow().isoformat()
@@ -102,12 +336,64 @@ class CosmosDBManager:
                 "type": "message"
             }
             
+            if self.ttl_enabled:
+                item["ttl"] = COSMOS_SESSION_TTL_SECONDS
+            
             self.container.create_item(body=item)
             print(f"💾 Mensaje guardado en Cosmos DB: {session_id} - {role}")
             
+            # Actividad en la sesión: actualizar el índice y renovar (en segundo plano) la expiración
+            self._update_session_index(session_id, role, content, timestamp)
+            self.schedule_ttl_refresh(session_id)
+            
         except Exception as e:
             print(f"❌ Error al guardar mensaje en Cosmos DB: {e}")
 
+    def _update_session_index(self, session_id: str, role: str, content: str, timestamp: str):
+        """
+        Actualiza el resumen de la sesión en el índice de sesiones.
+        
+        Se aplica un patch (última actividad y contador de mensajes); si el resumen no existe,
+        se crea usando el primer mensaje del usuario como título.
+        """
+        patch = [
+            {"op": "set", "path": "/last_activity", "value": timestamp},
+            {"op": "incr", "path": "/message_count", "value": 1},
+        ]
+        if self.ttl_enabled:
+            patch.append({"op": "set", "path": "/ttl", "value": COSMOS_SESSION_TTL_SECONDS})
+        
+        try:
+            try:
+                self.container.patch_item(
+                    item=session_id, partition_key=SESSION_INDEX_PARTITION, patch_operations=patch
+                )
+                return
+            except exceptions.CosmosResourceNotFoundError:
+                pass
+            
+            summary = {
+                "id": session_id,
+                "session_id": SESSION_INDEX_PARTITION,
+                "type": "session_summary",
+                "title": content[:SESSION_TITLE_MAX_LENGTH] if role == "user" else None,
+                "created_at": timestamp,
+                "last_activity": timestamp,
+                "message_count": 1
+            }
+            if self.ttl_enabled:
+                summary["ttl"] = COSMOS_SESSION_TTL_SECONDS
+            
+            try:
+                self.container.create_item(body=summary)
+            except exceptions.CosmosResourceExistsError:
+                # Otro worker lo creó entre medio
+                self.container.patch_item(
+                    item=session_id, partition_key=SESSION_INDEX_PARTITION, patch_operations=patch
+                )
+        except Exception as e:
+            print(f"❌ Error al actualizar índice de sesiones: {e}")
+
     def get_chat_history(self, session_id: str, limit: Optional[int] = None) -> List[Dict]:
         """
         Recupera el historial completo de una sesión desde Cosmos DB.
@@ -154,106 +440,325 @@ class CosmosDBManager:
             print(f"❌ Error al recuperar historial de Cosmos DB: {e}")
             return []
     
-    def delete_session(self, session_id: str):
+    def delete_session(self, session_id: str) -> Dict:
         """
-        Elimina todos los mensajes de una sesión.
+        Elimina todos los ítems de una sesión con batches transaccionales por partición.
+        
+        Los ids se recorren por páginas de continuación, sin leer el historial completo.
         
         Args:
             session_id: ID de la sesión a eliminar
+            
+        Returns:
+            Estadísticas: ítems eliminados y RU consumidas
         """
+        stats = {"deleted": 0, "request_charge": 0.0}
         if not self.enabled:
-            return
+            return stats
+        
+        if is_reserved_session_id(session_id):
+            print(f"⚠️ session_id reservado, no se elimina: {session_id}")
+            return stats
         
+        charge = RequestCharge()
         try:
-            items = self.get_chat_history(session_id)
+            for ids in self._iter_session_item_pages(session_id, charge):
+                self._execute_partition_batches(session_id, [("delete", (item_id,)) for item_id in ids], charge)
+                stats["deleted"] += len(ids)
             
-            for item in items:
+            try:
                 self.container.delete_item(
-                    item=item['id'],
-                    partition_key=session_id
+                    item=session_id, partition_key=SESSION_INDEX_PARTITION, raw_response_hook=charge
                 )
+            except exceptions.CosmosResourceNotFoundError:
+                pass
             
-            print(f"🗑️ Sesión eliminada: {session_id} ({len(items)} mensajes)")
+            with self._ttl_lock:
+                self._ttl_refreshed_at.pop(session_id, None)
+            stats["request_charge"] = charge.total
+            print(f"🗑️ Sesión eliminada: {session_id} ({stats['deleted']} ítems, {stats['request_charge']:.1f} RU)")
             
         except Exception as e:
             print(f"❌ Error al eliminar sesión: {e}")
+        
+        return stats
     
-    def get_all_sessions(self, limit: int = 50) -> List[str]:
+    def list_sessions(self, limit: int = 50, continuation_token: Optional[str] = None) -> Dict:
         """
-        Obtiene una lista de todos los session_id únicos.
+        Lista las sesiones más recientes desde el índice de sesiones.
+        
+        Es una consulta paginada sobre una sola partición, sin GROUP BY entre particiones.
         
         Args:
-            limit: Número máximo de sesiones a retornar
+            limit: Tamaño de página
+            continuation_token: Token devuelto por la página anterior
             
         Returns:
-            Lista de session_ids
+            Diccionario con 'sessions' (id, título, última actividad, cantidad de mensajes)
+            y 'continuation_token' para la página siguiente (None si no hay más)
         """
         if not self.enabled:
-            return []
+            return {"sessions": [], "continuation_token": None}
         
         try:
             query = """
-                SELECT DISTINCT c.session_id, MAX(c.timestamp) as last_message
-                FROM c 
-                WHERE c.type = 'message'
-                GROUP BY c.session_id
-                ORDER BY MAX(c.timestamp) DESC
-                OFFSET 0 LIMIT @limit
+                SELECT c.id, c.title, c.created_at, c.last_activity, c.message_count
+                FROM c
+                WHERE c.type = 'session_summary'
+                ORDER BY c.last_activity DESC
             """
             
-            parameters = [{"name": "@limit", "value": limit}]
-            
-            items = list(self.container.query_items(
+            pages = self.container.query_items(
                 query=query,
-                parameters=parameters,
-                enable_cross_partition_query=True
-            ))
+                partition_key=SESSION_INDEX_PARTITION,
+                max_item_count=limit
+            ).by_page(continuation_token)
             
-            session_ids = [item['session_id'] for item in items]
-            print(f"📋 Encontradas {len(session_ids)} sesiones activas")
-            return session_ids
+            items = list(next(pages, []))
+            sessions = [{
+                "session_id": item["id"],
+                "title": item.get("title"),
+                "created_at": item.get("created_at"),
+                "last_activity": item.get("last_activity"),
+                "message_count": item.get("message_count", 0)
+            } for item in items]
+            
+            print(f"📋 Encontradas {len(sessions)} sesiones en el índice")
+            return {"sessions": sessions, "continuation_token": pages.continuation_token}
             
         except Exception as e:
             print(f"❌ Error al obtener lista de sesiones: {e}")
-            return []
+            return {"sessions": [], "continuation_token": None}
     
-    def cleanup_old_sessions(self, days_old: int = 30):
+    def get_recent_user_queries(self, hours: int = 24, max_items: int = 5000) -> List[str]:
         """
-        Elimina sesiones más antiguas que X días.
+        Recupera los mensajes de usuario de las últimas `hours` horas (para el warm-up de cachés).
+
+        Es una consulta entre particiones: se usa en segundo plano y con un tope de ítems.
+
+        Args:
+            hours: Antigüedad máxima de los mensajes
+            max_items: Número máximo de mensajes a leer
+
+        Returns:
+            Lista con el texto de los mensajes
+        """
+        if not self.enabled:
+            return []
+
+        try:
+            since_ts = int(time.time()) - hours * 3600
+            items = self.container.query_items(
+                query="""
+                    SELECT c.content FROM c
+                    WHERE c.type = 'message' AND c.role = 'user' AND c._ts >= @since_ts
+                """,
+                parameters=[{"name": "@since_ts", "value": since_ts}],
+                enable_cross_partition_query=True,
+                max_item_count=min(max_items, 1000)
+            )
+
+            queries = []
+            for item in items:
+                queries.append(item["content"])
+                if len(queries) >= max_items:
+                    break
+
+            print(f"📥 Recuperadas {len(queries)} consultas de las últimas {hours} h desde Cosmos DB")
+            return queries
+
+        except Exception as e:
+            print(f"❌ Error al recuperar consultas recientes de Cosmos DB: {e}")
+            return []
+
+    def get_all_sessions(self, limit: int = 50) -> List[str]:
+        """
+        Obtiene una lista de los session_id más recientes.
         
         Args:
-            days_old: Número de días de antigüedad para considerar una sesión como "vieja"
+            limit: Número máximo de sesiones a retornar
+            
+        Returns:
+            Lista de session_ids
+        """
+        return [session["session_id"] for session in self.list_sessions(limit)["sessions"]]
+    
+    def rebuild_session_index(self) -> int:
+        """
+        Reconstruye el índice de sesiones a partir de los mensajes existentes.
+        
+        Ejecuta una única vez la agregación entre particiones (p. ej. al migrar datos
+        anteriores al índice). Los resúmenes existentes se actualizan con un patch, sin
+        perder su título; los que faltan se crean sin título.
+        
+        Returns:
+            Número de sesiones indexadas
         """
         if not self.enabled:
-            return
+            return 0
         
+        query = """
+            SELECT c.session_id, MIN(c.timestamp) AS created_at,
+                   MAX(c.timestamp) AS last_activity, COUNT(1) AS message_count
+            FROM c
+            WHERE c.type = 'message'
+            GROUP BY c.session_id
+        """
+        
+        indexed = 0
         try:
-            from datetime import timedelta
-            cutoff_date = (datetime.utcnow() - timedelta(days=days_old)).isoformat()
+            for item in self.container.query_items(query=query, enable_cross_partition_query=True):
+                if is_reserved_session_id(item["session_id"]):
+                    continue
+                
+                patch = [
+                    {"op": "set", "path": "/created_at", "value": item["created_at"]},
+                    {"op": "set", "path": "/last_activity", "value": item["last_activity"]},
+                    {"op": "set", "path": "/message_count", "value": item["message_count"]},
+                ]
+                try:
+                    self.container.patch_item(
+                        item=item["session_id"], partition_key=SESSION_INDEX_PARTITION, patch_operations=patch
+                    )
+                except exceptions.CosmosResourceNotFoundError:
+                    summary = {
+                        "id": item["session_id"],
+                        "session_id": SESSION_INDEX_PARTITION,
+                        "type": "session_summary",
+                        "title": None,
+                        "created_at": item["created_at"],
+                        "last_activity": item["last_activity"],
+                        "message_count": item["message_count"]
+                    }
+                    if self.ttl_enabled:
+                        summary["ttl"] = COSMOS_SESSION_TTL_SECONDS
+                    self.container.create_item(body=summary)
+                indexed += 1
             
-            query = """
-                SELECT c.id, c.session_id FROM c 
-                WHERE c.timestamp < @cutoff_date 
-                AND c.type = 'message'
-            """
+            print(f"📇 Índice de sesiones reconstruido: {indexed} sesiones")
+        except Exception as e:
+            print(f"❌ Error al reconstruir índice de sesiones: {e}")
+        
+        return indexed
+    
+    def cleanup_old_sessions(self, days_old: int = 30, max_ru_per_second: Optional[float] = None) -> Dict:
+        """
+        Elimina los mensajes más antiguos que X días y los resúmenes de las sesiones sin
+        actividad desde entonces.
+        
+        Con TTL habilitado la expiración la hace Cosmos DB en segundo plano (con RU
+        sobrantes); este método queda para limpiezas explícitas. Recorre la consulta por
+        páginas de continuación, agrupa por partición y elimina con batches transaccionales.
+        
+        Args:
+            days_old: Número de días de antigüedad para considerar un ítem como "viejo"
+            max_ru_per_second: Límite de RU/s para no competir con el tráfico del chat
             
-            parameters = [{"name": "@cutoff_date", "value": cutoff_date}]
+        Returns:
+            Estadísticas: ítems eliminados, páginas procesadas, RU consumidas y duración
+        """
+        stats = {"deleted": 0, "pages": 0, "request_charge": 0.0, "elapsed_seconds": 0.0}
+        if not self.enabled:
+            return stats
+        
+        start = time.monotonic()
+        charge = RequestCharge()
+        try:
+            cutoff_ts = int(time.time()) - days_old * 24 * 3600
             
-            items = list(self.container.query_items(
-                query=query,
-                parameters=parameters,
-                enable_cross_partition_query=True
-            ))
+            message_pages = self.container.query_items(
+                query="SELECT c.id, c.session_id FROM c WHERE c.type = 'message' AND c._ts < @cutoff_ts",
+                parameters=[{"name": "@cutoff_ts", "value": cutoff_ts}],
+                enable_cross_partition_query=True,
+                max_item_count=COSMOS_DELETE_PAGE_SIZE,
+                raw_response_hook=charge
+            ).by_page()
             
-            deleted_count = 0
-            for item in items:
-                self.container.delete_item(
-                    item=item['id'],
-                    partition_key=item['session_id']
+            # Resúmenes del índice: por última actividad, no por _ts (cada mensaje los parcha)
+            summary_pages = self.container.query_items(
+                query="SELECT c.id, c.session_id FROM c WHERE c.type = 'session_summary' AND c.last_activity < @cutoff",
+                parameters=[{"name": "@cutoff", "value": datetime.utcfromtimestamp(cutoff_ts).isoformat()}],
+                partition_key=SESSION_INDEX_PARTITION,
+                max_item_count=COSMOS_DELETE_PAGE_SIZE,
+                raw_response_hook=charge
+            ).by_page()
+            
+            for page in (page for pages in (message_pages, summary_pages) for page in pages):
+                by_session: Dict[str, List[str]] = {}
+                for item in page:
+                    by_session.setdefault(item["session_id"], []).append(item["id"])
+                
+                for session_id, ids in by_session.items():
+                    self._execute_partition_batches(session_id, [("delete", (item_id,)) for item_id in ids], charge)
+                    stats["deleted"] += len(ids)
+                
+                stats["request_charge"] = charge.total
+                stats["pages"] += 1
+                elapsed = time.monotonic() - start
+                print(
+                    f"🧹 Limpieza: página {stats['pages']}, {stats['deleted']} ítems eliminados, "
+                    f"{stats['request_charge']:.1f} RU, {elapsed:.1f} s"
                 )
-                deleted_count += 1
+                
+                # Limitar la tasa de RU para no provocar throttling en el tráfico en vivo
+                if max_ru_per_second:
+                    min_elapsed = stats["request_charge"] / max_ru_per_second
+                    if min_elapsed > elapsed:
+                        time.sleep(min_elapsed - elapsed)
             
-            print(f"🧹 Limpieza completada: {deleted_count} mensajes antiguos eliminados")
+            stats["elapsed_seconds"] = time.monotonic() - start
+            print(
+                f"🧹 Limpieza completada: {stats['deleted']} ítems antiguos eliminados "
+                f"({stats['request_charge']:.1f} RU, {stats['elapsed_seconds']:.1f} s)"
+            )
             
         except Exception as e:
             print(f"❌ Error en limpieza de sesiones antiguas: {e}")
+        
+        return stats
+
+    def close(self):
+        """Cierra las conexiones del cliente de Cosmos DB."""
+        self._ttl_executor.shutdown(wait=False, cancel_futures=True)
+        if self.client:
+            # Cierra el pipeline HTTP del cliente (protocolo de context manager)
+            self.client.__exit__(None, None, None)
+            self.client = None
+        self.enabled = False
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Mantenimiento del historial en Cosmos DB")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    subparsers.add_parser("rebuild-index", help="Reconstruye el índice de sesiones desde los mensajes")
+    
+    ttl_parser = subparsers.add_parser(
+        "enable-ttl", help="Aplica COSMOS_SESSION_TTL_SECONDS al contenedor (elimina los ítems más antiguos)"
+    )
+    ttl_parser.add_argument("--confirm", action="store_true", help="Aplicar (sin esto solo informa)")
+    
+    list_parser = subparsers.add_parser("list-sessions", help="Lista las sesiones más recientes")
+    list_parser.add_argument("--limit", type=int, default=20)
+    
+    cleanup_parser = subparsers.add_parser("cleanup", help="Elimina ítems antiguos")
+    cleanup_parser.add_argument("--days", type=int, default=30)
+    cleanup_parser.add_argument("--max-ru-per-second", type=float, default=None)
+    
+    args = parser.parse_args()
+    manager = CosmosDBManager()
+    
+    if args.command == "rebuild-index":
+        manager.rebuild_session_index()
+    elif args.command == "enable-ttl":
+        manager.enable_container_ttl(confirm=args.confirm)
+        if not args.confirm:
+            print("ℹ️ Sin cambios. Repite con --confirm para aplicar el TTL.")
+    elif args.command == "list-sessions":
+        for session in manager.list_sessions(limit=args.limit)["sessions"]:
+            print(f"{session['last_activity']}  {session['session_id']}  "
+                  f"({session['message_count']} mensajes)  {session['title'] or ''}")
+    elif args.command == "cleanup":
+        manager.cleanup_old_sessions(days_old=args.days, max_ru_per_second=args.max_ru_per_second)
@@ -0,0 +1,85 @@
+# backend/src/document_cache.py
+
+"""
+Caché local acotada de documentos (chunks de dictámenes) recuperados desde Azure AI Search.
+
+Las llamadas de ranking piden solo `chunk_id` y puntajes; el contenido se completa desde
+esta caché y solo los faltantes se buscan en una consulta masiva. Las entradas se etiquetan
+con la versión del índice para que una reindexación no sirva contenido obsoleto.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class DocumentCache:
+    """
+    Caché LRU de campos de documentos por (versión de índice, chunk_id).
+
+    Una entrada solo es un acierto si contiene todos los campos pedidos; los campos que
+    se obtienen en distintas consultas (chat y listados) se acumulan en la misma entrada.
+    """
+
+    def __init__(self, max_entries: int, index_version: str):
+        self.max_entries = max_entries
+        self.index_version = index_version
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[Tuple[str, str], Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, chunk_ids: Iterable[str], fields: List[str]) -> Tuple[Dict[str, Dict], List[str]]:
+        """
+        Busca varios documentos en la caché.
+
+        Returns:
+            Tupla (documentos encontrados por chunk_id, chunk_ids faltantes)
+        """
+        found, missing = {}, []
+        with self._lock:
+            for chunk_id in chunk_ids:
+                key = (self.index_version, chunk_id)
+                entry = self._items.get(key)
+                if entry is not None and all(field in entry for field in fields):
+                    self._items.move_to_end(key)
+                    found[chunk_id] = entry
+                else:
+                    missing.append(chunk_id)
+            self.hits += len(found)
+            self.misses += len(missing)
+        return found, missing
+
+    def put_many(self, documents: Iterable[Dict]):
+        """Guarda (o completa) documentos que incluyen su `chunk_id`."""
+        with self._lock:
+            for doc in documents:
+                chunk_id = doc.get("chunk_id")
+                if not chunk_id:
+                    continue
+                key = (self.index_version, chunk_id)
+                entry = self._items.get(key, {})
+                entry.update({k: v for k, v in doc.items() if not k.startswith("@search.")})
+                self._items[key] = entry
+                self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def get(self, chunk_id: str, fields: List[str]) -> Optional[Dict]:
+        found, _ = self.get_many([chunk_id], fields)
+        return found.get(chunk_id)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._items),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "index_version": self.index_version
+            }
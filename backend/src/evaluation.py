@@ -0,0 +1,209 @@
+# backend/src/evaluation.py
+
+"""
+Evaluación offline de calidad vs. latencia de la recuperación sobre un conjunto dorado.
+
+Ejecuta cada consulta del conjunto dorado con `AzureHybridSearchRetriever` (o con un
+sustituto local basado en BM25 sobre un corpus JSONL) bajo una grilla de configuraciones
+y reporta recall@k, MRR y nDCG@k junto a latencia p50/p95 y tamaño del payload.
+
+Formato del conjunto dorado (JSONL, una consulta por línea):
+    {"query": "licencias médicas rechazadas por la COMPIN", "expected": ["E123456N24", "E654321N23"]}
+
+Formato de la grilla (JSON, producto cartesiano de los valores):
+    {"use_two_vectors": [false, true], "k_nearest_neighbors": [20, 50],
+     "exhaustive": [false], "use_semantic": [true, false]}
+
+Uso (desde backend/):
+    python -m src.evaluation --golden eval/golden.jsonl [--grid grid.json] [--k 5]
+                             [--repeat 3] [--standin corpus.jsonl] [--output reporte.json]
+"""
+
+import argparse
+import itertools
+import json
+import math
+import statistics
+import time
+from typing import Dict, List, Optional
+
+DEFAULT_GRID = {
+    "use_two_vectors": [False, True],
+    "k_nearest_neighbors": [20, 50],
+    "summary_k_nearest_neighbors": [25],
+    "exhaustive": [False, True],
+    "use_semantic": [True, False],
+}
+
+
+def load_golden(path: str) -> List[Dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def expand_grid(grid: Dict[str, List]) -> List[Dict]:
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+
+def ranked_dictamenes(documents) -> List[str]:
+    """Números de dictamen en orden de ranking, sin repetir (varios chunks por dictamen)."""
+    return list(dict.fromkeys(doc.metadata.get("source") for doc in documents if doc.metadata.get("source")))
+
+
+def recall_at_k(ranked: List[str], expected: List[str], k: int) -> float:
+    if not expected:
+        return 0.0
+    return len(set(ranked[:k]) & set(expected)) / len(set(expected))
+
+
+def reciprocal_rank(ranked: List[str], expected: List[str]) -> float:
+    for position, numero in enumerate(ranked, 1):
+        if numero in expected:
+            return 1.0 / position
+    return 0.0
+
+
+def ndcg_at_k(ranked: List[str], expected: List[str], k: int) -> float:
+    dcg = sum(1.0 / math.log2(position + 1) for position, numero in enumerate(ranked[:k], 1) if numero in expected)
+    ideal = sum(1.0 / math.log2(position + 1) for position in range(1, min(len(set(expected)), k) + 1))
+    return dcg / ideal if ideal else 0.0
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentil por rango más cercano (también lo usa replay.py, para que los reportes coincidan)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class LocalStandInRetriever:
+    """
+    Sustituto local del retriever: BM25 sobre un corpus JSONL con los campos del índice
+    (chunk_id, numero_dictamen, embedding_text, ai_summary, url). Ignora los parámetros
+    vectoriales; sirve para probar el harness y comparar contra una línea base léxica.
+    """
+
+    def __init__(self, corpus_path: str):
+        from langchain_core.documents import Document
+        from .reranker import bm25_scores
+
+        self._bm25 = bm25_scores
+        with open(corpus_path, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        self.documents = [
+            Document(
+                page_content=row.get("embedding_text", ""),
+                metadata={
+                    "chunk_id": row.get("chunk_id", ""),
+                    "source": row.get("numero_dictamen", "N/A"),
+                    "url": row.get("url", ""),
+                    "summary_match": row.get("ai_summary", "")
+                }
+            )
+            for row in rows
+        ]
+        self.texts = [f"{doc.page_content} {doc.metadata['summary_match']}" for doc in self.documents]
+        self.last_search_stats = {}
+
+    def run_hybrid_search(self, query_text: str, use_two_vectors: bool = False, top: int = 5, **params):
+        from .serialization import dumps
+
+        start = time.perf_counter()
+        scores = self._bm25(query_text, self.texts)
+        ranked = sorted(range(len(self.documents)), key=lambda i: scores[i], reverse=True)[:top]
+        documents = [self.documents[i] for i in ranked]
+        self.last_search_stats = {
+            "search_ms": (time.perf_counter() - start) * 1000,
+            "payload_bytes": len(dumps([{"page_content": d.page_content, **d.metadata} for d in documents])),
+            "results": len(documents),
+            "semantic_used": False
+        }
+        return documents
+
+
+def evaluate(retriever, golden: List[Dict], configs: List[Dict], k: int, repeat: int) -> List[Dict]:
+    """Ejecuta la grilla y devuelve una fila de métricas por configuración."""
+    report = []
+    for config in configs:
+        recalls, rrs, ndcgs, latencies, payloads = [], [], [], [], []
+
+        for item in golden:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                documents = retriever.run_hybrid_search(item["query"], top=k, **config)
+                latencies.append((time.perf_counter() - start) * 1000)
+                payloads.append(retriever.last_search_stats.get("payload_bytes", 0))
+
+            ranked = ranked_dictamenes(documents)
+            recalls.append(recall_at_k(ranked, item["expected"], k))
+            rrs.append(reciprocal_rank(ranked, item["expected"]))
+            ndcgs.append(ndcg_at_k(ranked, item["expected"], k))
+
+        row = {
+            "config": config,
+            f"recall@{k}": statistics.mean(recalls),
+            "mrr": statistics.mean(rrs),
+            f"ndcg@{k}": statistics.mean(ndcgs),
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "payload_bytes": statistics.mean(payloads),
+        }
+        report.append(row)
+        print(_format_row(row, k))
+    return report
+
+
+def _format_config(config: Dict) -> str:
+    short = {"use_two_vectors": "2vec", "k_nearest_neighbors": "k", "summary_k_nearest_neighbors": "ks",
+             "exhaustive": "exh", "use_semantic": "sem"}
+    return " ".join(f"{short.get(key, key)}={value}" for key, value in config.items())
+
+
+def _format_row(row: Dict, k: int) -> str:
+    return (
+        f"{_format_config(row['config']):<48}"
+        f"{row[f'recall@{k}']:>10.3f}{row['mrr']:>8.3f}{row[f'ndcg@{k}']:>9.3f}"
+        f"{row['p50_ms']:>9.0f}{row['p95_ms']:>9.0f}{row['payload_bytes']:>10.0f}"
+    )
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Evaluación de recuperación: calidad vs. latencia")
+    parser.add_argument("--golden", required=True, help="Conjunto dorado JSONL")
+    parser.add_argument("--grid", help="Grilla de configuraciones JSON (por defecto, DEFAULT_GRID)")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=1, help="Repeticiones por consulta para la latencia")
+    parser.add_argument("--standin", help="Corpus JSONL para usar el sustituto local en vez de Azure")
+    parser.add_argument("--output", help="Ruta para guardar el reporte JSON")
+    args = parser.parse_args(argv)
+
+    golden = load_golden(args.golden)
+    grid = DEFAULT_GRID
+    if args.grid:
+        with open(args.grid, encoding="utf-8") as f:
+            grid = json.load(f)
+    configs = expand_grid(grid)
+
+    if args.standin:
+        retriever = LocalStandInRetriever(args.standin)
+    else:
+        from .search_retriever import AzureHybridSearchRetriever
+        retriever = AzureHybridSearchRetriever()
+        retriever.measure_payload = True
+
+    print(f"📏 {len(golden)} consultas x {len(configs)} configuraciones x {args.repeat} repeticiones")
+    print(f"{'configuración':<48}{'recall@' + str(args.k):>10}{'MRR':>8}{'nDCG@' + str(args.k):>9}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'bytes':>10}")
+    report = evaluate(retriever, golden, configs, args.k, args.repeat)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"k": args.k, "queries": len(golden), "results": report}, f, ensure_ascii=False, indent=2)
+        print(f"💾 Reporte guardado en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
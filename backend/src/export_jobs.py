@@ -0,0 +1,242 @@
+# backend/src/export_jobs.py
+
+"""
+Exportación de listados completos de dictámenes (CSV / JSONL) como trabajos en segundo plano.
+
+Los trabajos corren en un pool de hilos propio (acotado por EXPORT_MAX_CONCURRENT_JOBS),
+fuera del event loop y del pool usado por /chat, y escriben fila a fila en EXPORT_DIR con
+memoria acotada. El estado de cada trabajo se guarda como JSON junto al archivo, de modo
+que cualquier worker del mismo contenedor puede responder el polling de progreso.
+"""
+
+import asyncio
+import csv
+import json
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from typing import Dict, Optional
+
+from .config import EXPORT_DIR, EXPORT_MAX_CONCURRENT_JOBS, EXPORT_MAX_ROWS, EXPORT_RETENTION_SECONDS
+from .latency_budget import classify_query
+from .serialization import dumps
+
+EXPORT_FORMATS = ("csv", "jsonl")
+
+EXPORT_COLUMNS = [
+    "numero_dictamen", "fecha", "ano", "resumen", "leyes_aplicadas",
+    "dictamenes_aplicados", "descriptores", "accion", "url"
+]
+
+# Frecuencia (en filas) con que se persiste el progreso
+PROGRESS_EVERY_ROWS = 500
+
+# "ley 21.643", "Ley N° 18834", "ley nº 19.880"
+LAW_NUMBER_PATTERN = re.compile(r"\bley(?:es)?\s+(?:n(?:[°º.]|ro\.?|úmero|umero)?\s*)?(\d{1,2})\.?(\d{3})\b", re.IGNORECASE)
+
+
+def export_row(doc: Dict) -> Dict:
+    """Fila exportable a partir de un documento de Azure AI Search."""
+    return {
+        "numero_dictamen": doc.get("numero_dictamen"),
+        "fecha": doc.get("fecha"),
+        "ano": doc.get("ano"),
+        "resumen": doc.get("ai_summary"),
+        "leyes_aplicadas": doc.get("fuentes_legales"),
+        "dictamenes_aplicados": doc.get("dictamenes_aplicados"),
+        "descriptores": doc.get("descriptores"),
+        "accion": doc.get("accion"),
+        "url": doc.get("url")
+    }
+
+
+def _flatten(row: Dict) -> Dict:
+    """Las colecciones se unen con '; ' para que quepan en una celda CSV."""
+    return {k: "; ".join(map(str, v)) if isinstance(v, list) else v for k, v in row.items()}
+
+
+def extract_law_number(query: str) -> Optional[str]:
+    """Número de ley mencionado en la consulta, con punto de miles ("21.643"), o None."""
+    match = LAW_NUMBER_PATTERN.search(query)
+    return f"{match.group(1)}.{match.group(2)}" if match else None
+
+
+def build_filter(since: Optional[str], law_number: Optional[str] = None) -> Optional[str]:
+    """
+    Filtro OData por fecha mínima (YYYY-MM-DD) y por ley citada en 'fuentes_legales'.
+
+    Raises:
+        ValueError: fecha inválida
+    """
+    clauses = []
+    if since:
+        clauses.append(f"fecha ge {date.fromisoformat(since).isoformat()}T00:00:00Z")
+    if law_number:
+        # El analizador indexa "21.643" y "21643" como términos distintos
+        clauses.append(
+            f"search.ismatch('\"{law_number}\" | \"{law_number.replace('.', '')}\"', 'fuentes_legales')"
+        )
+    return " and ".join(clauses) or None
+
+
+def parse_max_rows(max_rows) -> int:
+    """
+    Límite de filas de la exportación, acotado por EXPORT_MAX_ROWS.
+
+    Raises:
+        ValueError: si no es un entero positivo
+    """
+    if max_rows is None:
+        return EXPORT_MAX_ROWS
+    if isinstance(max_rows, bool) or not isinstance(max_rows, int) or max_rows <= 0:
+        raise ValueError("max_rows debe ser un entero positivo")
+    return min(max_rows, EXPORT_MAX_ROWS)
+
+
+class ExportJobManager:
+    """
+    Crea, ejecuta y consulta trabajos de exportación.
+
+    Estados: pending -> running -> completed | failed
+    """
+
+    def __init__(self, retriever):
+        self.retriever = retriever
+        self._executor = ThreadPoolExecutor(max_workers=EXPORT_MAX_CONCURRENT_JOBS, thread_name_prefix="export")
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+
+    def _status_path(self, job_id: str) -> str:
+        return os.path.join(EXPORT_DIR, f"{job_id}.json")
+
+    def _save_status(self, job: Dict):
+        tmp_path = self._status_path(job["job_id"]) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(job, f, ensure_ascii=False)
+        os.replace(tmp_path, self._status_path(job["job_id"]))
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Estado del trabajo (o None si no existe)."""
+        try:
+            uuid.UUID(job_id)
+            with open(self._status_path(job_id), encoding="utf-8") as f:
+                return json.load(f)
+        except (ValueError, FileNotFoundError):
+            return None
+
+    def output_path(self, job: Dict) -> str:
+        return os.path.join(EXPORT_DIR, f"{job['job_id']}.{job['format']}")
+
+    def start(self, query: str, export_format: str, since: Optional[str] = None,
+              max_rows: Optional[int] = None) -> Dict:
+        """
+        Registra un trabajo y lo lanza en segundo plano.
+
+        Si la consulta menciona una ley ("dictámenes de la ley 21.643"), se exportan los
+        dictámenes que la citan en 'fuentes_legales'. Si no, las consultas con identificadores
+        exactos (número de dictamen, artículo) exigen todos los términos, y las de texto libre
+        cualquiera de ellos, como la búsqueda por palabras clave de /chat.
+
+        Raises:
+            ValueError: consulta, formato, fecha o max_rows inválidos
+        """
+        if not isinstance(query, str):
+            raise ValueError("query debe ser un texto")
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Formato no soportado: {export_format}. Usa {', '.join(EXPORT_FORMATS)}")
+        if since is not None and not isinstance(since, str):
+            raise ValueError("since debe ser una fecha YYYY-MM-DD")
+
+        law_number = extract_law_number(query)
+        job = {
+            "job_id": str(uuid.uuid4()),
+            "query": query,
+            "format": export_format,
+            "law_number": law_number,
+            "search_mode": "all" if classify_query(query) == "identifier" else "any",
+            "filter": build_filter(since, law_number),
+            "max_rows": parse_max_rows(max_rows),
+            "status": "pending",
+            "rows_written": 0,
+            "total_estimated": None,
+            "created_at": datetime.utcnow().isoformat(),
+            "finished_at": None,
+            "error": None
+        }
+        self._save_status(job)
+        self._purge_expired()
+
+        loop = asyncio.get_running_loop()
+        loop.run_in_executor(self._executor, self._run, job)
+        print(f"📤 Exportación {job['job_id']} encolada: '{query}' ({export_format})")
+        return job
+
+    def _run(self, job: Dict):
+        """Ejecuta la exportación (en un hilo del pool de exportación)."""
+        job["status"] = "running"
+        self._save_status(job)
+
+        output_path = self.output_path(job)
+        partial_path = output_path + ".part"
+        start = time.monotonic()
+
+        def on_total(total):
+            job["total_estimated"] = total
+            self._save_status(job)
+
+        try:
+            rows = self.retriever.iter_legal_list(
+                # Con ley identificada, el filtro define el conjunto completo
+                "*" if job.get("law_number") else job["query"],
+                filter_expression=job["filter"],
+                search_mode=job.get("search_mode", "any"),
+                max_results=job["max_rows"],
+                progress=on_total
+            )
+
+            if job["format"] == "csv":
+                with open(partial_path, "w", encoding="utf-8", newline="") as f:
+                    writer = csv.DictWriter(f, fieldnames=EXPORT_COLUMNS)
+                    writer.writeheader()
+                    self._write_rows(job, rows, lambda row: writer.writerow(_flatten(row)))
+            else:
+                with open(partial_path, "wb") as f:
+                    self._write_rows(job, rows, lambda row: f.write(dumps(row) + b"\n"))
+
+            os.replace(partial_path, output_path)
+            job["status"] = "completed"
+            print(f"✅ Exportación {job['job_id']}: {job['rows_written']} filas en {time.monotonic() - start:.1f} s")
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = str(e)
+            print(f"❌ Error en exportación {job['job_id']}: {e}")
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+        finally:
+            job["finished_at"] = datetime.utcnow().isoformat()
+            self._save_status(job)
+
+    def _write_rows(self, job: Dict, docs, write):
+        for doc in docs:
+            if job["rows_written"] >= job["max_rows"]:
+                break
+            write(export_row(doc))
+            job["rows_written"] += 1
+            if job["rows_written"] % PROGRESS_EVERY_ROWS == 0:
+                self._save_status(job)
+
+    def _purge_expired(self):
+        """Elimina archivos de exportaciones más antiguos que EXPORT_RETENTION_SECONDS."""
+        cutoff = time.time() - EXPORT_RETENTION_SECONDS
+        for name in os.listdir(EXPORT_DIR):
+            path = os.path.join(EXPORT_DIR, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,130 @@
+# backend/src/latency_budget.py
+
+"""
+Selección adaptativa de parámetros de búsqueda según un presupuesto de latencia.
+
+Cada combinación de parámetros (perfil) tiene una ventana móvil de latencias observadas.
+Dado el presupuesto de la petición, el planificador elige el perfil más completo cuya
+latencia p95 reciente cabe en el presupuesto; bajo carga se degrada a perfiles más
+baratos (menos vecinos, sin vector de resumen, sin reranker semántico) en vez de exceder
+el tiempo. Las observaciones expiran, de modo que los perfiles descartados se vuelven a
+probar cuando la carga baja.
+"""
+
+import re
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+# Consultas con identificadores exactos (número de dictamen, ley, artículo): las palabras
+# clave ya las resuelven bien y el reranker semántico aporta poco
+IDENTIFIER_PATTERN = re.compile(
+    r"\b[Ee]\d{4,}|\b\d{4,}\s*/\s*\d{2,4}\b|\bley\s+(n[°º.]?\s*)?\d{1,2}\.?\d{3}\b|\bdfl\b|\bart(ículo|iculo|\.)\s*\d+",
+    re.IGNORECASE
+)
+
+# Perfiles del más completo al más barato, por clase de consulta
+PLAN_LADDERS = {
+    # Preguntas en lenguaje natural: el reranker semántico es lo último que se sacrifica
+    "natural": [
+        {"k_nearest_neighbors": 50, "use_two_vectors": True, "use_semantic": True},
+        {"k_nearest_neighbors": 50, "use_two_vectors": False, "use_semantic": True},
+        {"k_nearest_neighbors": 20, "use_two_vectors": False, "use_semantic": True},
+        {"k_nearest_neighbors": 20, "use_two_vectors": False, "use_semantic": False},
+    ],
+    # Identificadores exactos: primero se descarta el reranker semántico
+    "identifier": [
+        {"k_nearest_neighbors": 50, "use_two_vectors": True, "use_semantic": True},
+        {"k_nearest_neighbors": 50, "use_two_vectors": True, "use_semantic": False},
+        {"k_nearest_neighbors": 20, "use_two_vectors": False, "use_semantic": False},
+    ],
+}
+
+
+def classify_query(query: str) -> str:
+    """Clase de la consulta para el planificador: 'identifier' o 'natural'."""
+    return "identifier" if IDENTIFIER_PATTERN.search(query or "") else "natural"
+
+
+def profile_key(plan: Dict) -> str:
+    return (f"k{plan['k_nearest_neighbors']}"
+            f"_{'2v' if plan['use_two_vectors'] else '1v'}"
+            f"_{'sem' if plan['use_semantic'] else 'nosem'}")
+
+
+class LatencyTracker:
+    """Ventana móvil de latencias por perfil, con expiración por antigüedad."""
+
+    def __init__(self, window_size: int, max_age_seconds: float, min_samples: int):
+        self.window_size = window_size
+        self.max_age_seconds = max_age_seconds
+        self.min_samples = min_samples
+        self._samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, profile: str, latency_ms: float):
+        with self._lock:
+            samples = self._samples.setdefault(profile, deque(maxlen=self.window_size))
+            samples.append((time.monotonic(), latency_ms))
+
+    def estimate(self, profile: str, percentile: float = 95) -> Optional[float]:
+        """Percentil de las latencias recientes del perfil, o None si no hay datos suficientes."""
+        cutoff = time.monotonic() - self.max_age_seconds
+        with self._lock:
+            samples = self._samples.get(profile)
+            if not samples:
+                return None
+            while samples and samples[0][0] < cutoff:
+                samples.popleft()
+            values = sorted(latency for _, latency in samples)
+        if len(values) < self.min_samples:
+            return None
+        index = min(len(values) - 1, int(len(values) * percentile / 100))
+        return values[index]
+
+
+class LatencyBudgetPlanner:
+    """Elige los parámetros de búsqueda para un presupuesto de latencia."""
+
+    def __init__(self, tracker: LatencyTracker, percentile: float = 95):
+        self.tracker = tracker
+        self.percentile = percentile
+
+    def plan(self, budget_ms: float, query: str, use_two_vectors: bool = True) -> Dict:
+        """
+        Devuelve el perfil elegido con la estimación que lo justificó.
+
+        Un perfil sin observaciones recientes se considera dentro del presupuesto (se explora);
+        si ninguno cabe, se usa el más barato. Si el cliente no pidió el vector de resumen,
+        ningún perfil lo usa.
+
+        Returns:
+            Dict con k_nearest_neighbors, use_two_vectors, use_semantic, profile,
+            query_class, budget_ms, estimated_ms y degraded
+        """
+        query_class = classify_query(query)
+        ladder = []
+        for plan in PLAN_LADDERS[query_class]:
+            plan = {**plan, "use_two_vectors": plan["use_two_vectors"] and use_two_vectors}
+            if plan not in ladder:
+                ladder.append(plan)
+
+        chosen, estimated = ladder[-1], None
+        for candidate in ladder:
+            estimated = self.tracker.estimate(profile_key(candidate), self.percentile)
+            if estimated is None or estimated <= budget_ms:
+                chosen = candidate
+                break
+
+        return {
+            **chosen,
+            "profile": profile_key(chosen),
+            "query_class": query_class,
+            "budget_ms": budget_ms,
+            "estimated_ms": estimated,
+            "degraded": chosen is not ladder[0]
+        }
+
+    def observe(self, plan: Dict, latency_ms: float):
+        self.tracker.observe(profile_key(plan), latency_ms)
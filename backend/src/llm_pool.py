@@ -0,0 +1,403 @@
+# backend/src/llm_pool.py
+
+"""
+Pool de implementaciones (deployments) de Azure OpenAI con balanceo, circuit breakers y
+peticiones con cobertura (hedging).
+
+Cada rol (chat, classification) se atiende con varias implementaciones, posiblemente en
+distintos endpoints/regiones (AZURE_OPENAI_DEPLOYMENTS). Las peticiones se envían a la
+implementación disponible con menor latencia esperada; las que fallan seguido abren su
+circuito durante un tiempo y las que responden 429 quedan en pausa según `Retry-After`.
+Con hedging activo, si la primera implementación no respondió al cumplirse su p95, se
+lanza la misma petición en otra y se usa la primera respuesta.
+
+`LLMPool.invoke` tiene la misma interfaz que `AzureChatOpenAI.invoke`.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+
+import openai
+from langchain_openai import AzureChatOpenAI
+
+from .config import AZURE_OPENAI_DEPLOYMENTS, AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_KEY
+from .config import AZURE_OPENAI_CHAT_DEPLOYMENT, AZURE_OPENAI_CLASSIFICATION_DEPLOYMENT
+from .config import LLM_REQUEST_TIMEOUT_SECONDS, LLM_MAX_RETRIES, LLM_CIRCUIT_FAILURE_THRESHOLD
+from .config import LLM_CIRCUIT_COOLDOWN_SECONDS, LLM_HEDGE_ENABLED, LLM_HEDGE_MIN_DELAY_MS
+from .config import LLM_HEDGE_DEFAULT_DELAY_MS, LLM_POOL_MAX_WORKERS, STANDIN_MODE
+from . import traffic
+
+# Latencias recientes por implementación (para el ruteo y el retardo del hedging)
+LATENCY_WINDOW = 100
+MIN_LATENCY_SAMPLES = 5
+# Pausa ante un 429 sin encabezado Retry-After
+DEFAULT_THROTTLE_SECONDS = 10.0
+
+
+class LLMUnavailableError(RuntimeError):
+    """Ninguna implementación del pool está disponible (circuitos abiertos o en pausa por cuota)."""
+
+
+def load_deployment_configs() -> List[Dict]:
+    """
+    Implementaciones configuradas en AZURE_OPENAI_DEPLOYMENTS (JSON), por ejemplo:
+
+        [{"name": "eastus2", "endpoint": "https://a.openai.azure.com/", "api_key_env": "AOAI_KEY_EASTUS2",
+          "chat_deployment": "gpt-4", "classification_deployment": "gpt-4.1-mini"},
+         {"name": "swedencentral", "endpoint": "https://b.openai.azure.com/", "api_key": "...",
+          "chat_deployment": "gpt-4"}]
+
+    Sin esa variable, se usa una sola implementación con AZURE_OPENAI_ENDPOINT y las
+    implementaciones de chat/clasificación de siempre.
+    """
+    if not AZURE_OPENAI_DEPLOYMENTS:
+        return [{
+            "name": "default",
+            "endpoint": AZURE_OPENAI_ENDPOINT,
+            "api_key": AZURE_OPENAI_API_KEY,
+            "chat_deployment": AZURE_OPENAI_CHAT_DEPLOYMENT,
+            "classification_deployment": AZURE_OPENAI_CLASSIFICATION_DEPLOYMENT
+        }]
+
+    configs = json.loads(AZURE_OPENAI_DEPLOYMENTS)
+    for i, config in enumerate(configs):
+        config.setdefault("name", f"deployment-{i}")
+        if "api_key_env" in config:
+            config["api_key"] = os.getenv(config["api_key_env"])
+        config.setdefault("api_key", AZURE_OPENAI_API_KEY)
+    return configs
+
+
+def is_client_error(error: Exception) -> bool:
+    """
+    Error de la petición (400, filtro de contenido, contexto excedido, autenticación): se
+    repetiría igual en cualquier implementación, así que no se cuenta como falla ni hay failover.
+    """
+    return (
+        isinstance(error, openai.APIStatusError)
+        and 400 <= error.status_code < 500
+        and error.status_code not in (408, 409, 429)
+    )
+
+
+def is_deployment_failure(error: Exception) -> bool:
+    """Falla atribuible a la implementación (timeout, conexión, 5xx): cuenta para el circuito."""
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and (
+        error.status_code >= 500 or error.status_code in (408, 409)
+    )
+
+
+class CircuitBreaker:
+    """
+    Circuito por implementación: se abre tras `failure_threshold` fallos consecutivos y,
+    pasado `cooldown_seconds`, deja pasar una sola petición de prueba (semiabierto).
+    """
+
+    def __init__(self, failure_threshold: int, cooldown_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self.opened_at is not None and (
+                self._trial_in_flight or time.monotonic() - self.opened_at < self.cooldown_seconds
+            )
+
+    def allow(self) -> bool:
+        """Reserva el paso de una petición (la de prueba si el circuito está semiabierto)."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self._trial_in_flight or time.monotonic() - self.opened_at < self.cooldown_seconds:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> bool:
+        """Registra un éxito. Devuelve True si el circuito estaba abierto y se cerró."""
+        with self._lock:
+            was_open = self.opened_at is not None
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+            return was_open
+
+    def release_trial(self):
+        """Libera la reserva de la petición de prueba sin cambiar el estado del circuito."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> bool:
+        """Registra un fallo. Devuelve True si el circuito se abrió con este fallo."""
+        with self._lock:
+            self.consecutive_failures += 1
+            if self._trial_in_flight or (
+                self.opened_at is None and self.consecutive_failures >= self.failure_threshold
+            ):
+                self.opened_at = time.monotonic()
+                self._trial_in_flight = False
+                return True
+            return False
+
+
+class PoolMember:
+    """Una implementación del pool: cliente, latencias, circuito y pausa por cuota."""
+
+    def __init__(self, name: str, client: AzureChatOpenAI):
+        self.name = name
+        self.client = client
+        self.circuit = CircuitBreaker(LLM_CIRCUIT_FAILURE_THRESHOLD, LLM_CIRCUIT_COOLDOWN_SECONDS)
+        self.throttled_until = 0.0
+        self.inflight = 0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        with self._lock:
+            values = sorted(self._latencies)
+        if len(values) < MIN_LATENCY_SAMPLES:
+            return None
+        return values[min(len(values) - 1, int(len(values) * percentile / 100))]
+
+    def expected_cost(self) -> float:
+        """Latencia mediana esperada, penalizada por las peticiones en curso (0 si no hay datos)."""
+        median = self.latency_percentile(50) or 0.0
+        return median * (1 + self.inflight)
+
+    def available(self) -> bool:
+        return time.monotonic() >= self.throttled_until and not self.circuit.is_open
+
+    def track_inflight(self, delta: int):
+        with self._lock:
+            self.inflight += delta
+
+    def record_latency(self, latency_ms: float):
+        with self._lock:
+            self._latencies.append(latency_ms)
+
+
+class LLMPool:
+    """Pool de implementaciones para un rol ('chat' o 'classification')."""
+
+    def __init__(self, role: str, temperature: float, configs: Optional[List[Dict]] = None,
+                 hedge: bool = LLM_HEDGE_ENABLED):
+        self.role = role
+        self.hedge = hedge
+        self.members: List[PoolMember] = []
+        # Modelos del pool (sin región), p. ej. para versionar respuestas generadas con ellos
+        self.deployments: List[str] = []
+
+        for config in configs or load_deployment_configs():
+            deployment = config.get(f"{role}_deployment")
+            if not deployment:
+                continue
+            if deployment not in self.deployments:
+                self.deployments.append(deployment)
+            if STANDIN_MODE:
+                from .standins import StandInChatModel
+                self.members.append(PoolMember(f"{config['name']}/{deployment}", StandInChatModel(role)))
+                continue
+            client = AzureChatOpenAI(
+                azure_deployment=deployment,
+                openai_api_version=config.get("api_version", "2024-02-01"),
+                azure_endpoint=config["endpoint"],
+                openai_api_key=config["api_key"],
+                temperature=temperature,
+                request_timeout=LLM_REQUEST_TIMEOUT_SECONDS,
+                # Con varias implementaciones, el pool reintenta en otra en vez de insistir en la misma
+                max_retries=LLM_MAX_RETRIES
+            )
+            self.members.append(PoolMember(f"{config['name']}/{deployment}", client))
+
+        if not self.members:
+            raise ValueError(f"No hay implementaciones configuradas para el rol '{role}'")
+        self.deployments.sort()
+
+        self._executor = None
+        if self.hedge and len(self.members) > 1:
+            self._executor = ThreadPoolExecutor(max_workers=LLM_POOL_MAX_WORKERS, thread_name_prefix=f"llm-{role}")
+
+        print(f"✅ Pool LLM '{role}': {', '.join(member.name for member in self.members)}"
+              f"{' (hedging activo)' if self._executor else ''}")
+
+    @property
+    def available(self) -> bool:
+        """True si al menos una implementación acepta peticiones."""
+        return any(member.available() for member in self.members)
+
+    def _select(self, exclude=()) -> Optional[PoolMember]:
+        """Implementación disponible con menor costo esperado, reservando su circuito."""
+        candidates = sorted(
+            (member for member in self.members if member not in exclude and member.available()),
+            key=PoolMember.expected_cost
+        )
+        for member in candidates:
+            if member.circuit.allow():
+                return member
+        return None
+
+    def _call(self, member: PoolMember, messages):
+        """
+        Ejecuta la petición en una implementación y actualiza sus estadísticas.
+        
+        Usa `generate` en vez de `invoke` para conservar el uso de tokens.
+        
+        Returns:
+            Tupla (mensaje de respuesta, uso de tokens)
+        """
+        member.track_inflight(1)
+        start = time.perf_counter()
+        try:
+            llm_result = member.client.generate([messages])
+        except openai.RateLimitError as e:
+            retry_after = e.response.headers.get("retry-after") if e.response is not None else None
+            try:
+                pause = float(retry_after) if retry_after else DEFAULT_THROTTLE_SECONDS
+            except ValueError:
+                pause = DEFAULT_THROTTLE_SECONDS
+            member.throttled_until = time.monotonic() + pause
+            # La cuota agotada no es éxito ni falla de la implementación: el circuito queda
+            # como estaba y solo se libera la reserva de prueba (si era la petición de prueba)
+            member.circuit.release_trial()
+            print(f"🚦 {self.role}: {member.name} sin cuota (429), en pausa {pause:.0f} s")
+            raise
+        except Exception as e:
+            if not is_deployment_failure(e):
+                # Error de la petición o inesperado: el circuito queda como estaba
+                member.circuit.release_trial()
+            elif member.circuit.record_failure():
+                print(f"🔌 {self.role}: circuito abierto para {member.name} por {LLM_CIRCUIT_COOLDOWN_SECONDS:.0f} s")
+            raise
+        finally:
+            member.track_inflight(-1)
+
+        member.record_latency((time.perf_counter() - start) * 1000)
+        if member.circuit.record_success():
+            print(f"🔌 {self.role}: circuito cerrado para {member.name}")
+        return llm_result.generations[0][0].message, (llm_result.llm_output or {}).get("token_usage") or {}
+
+    def _submit(self, member: PoolMember, messages):
+        """
+        Encola `_call` en el pool de hedging. Si la tarea se cancela antes de empezar, nunca
+        entra a `_call`: se libera aquí la reserva de prueba que tomó `_select`.
+        """
+        future = self._executor.submit(self._call, member, messages)
+        future.add_done_callback(lambda done: member.circuit.release_trial() if done.cancelled() else None)
+        return future
+
+    def _hedge_delay_s(self, member: PoolMember) -> float:
+        p95 = member.latency_percentile(95) or LLM_HEDGE_DEFAULT_DELAY_MS
+        return max(p95, LLM_HEDGE_MIN_DELAY_MS) / 1000
+
+    def invoke(self, messages):
+        """
+        Envía los mensajes a la mejor implementación disponible, con failover y hedging.
+
+        Raises:
+            LLMUnavailableError: si ninguna implementación está disponible
+            Exception: el último error si todas las implementaciones intentadas fallaron, o
+                el error de la petición (4xx) sin probar las demás
+        """
+        if self._executor:
+            message, usage = self._invoke_hedged(messages)
+        else:
+            message, usage = self._invoke_with_failover(messages)
+        
+        traffic.count(f"{self.role}_prompt_tokens", usage.get("prompt_tokens", 0))
+        traffic.count(f"{self.role}_completion_tokens", usage.get("completion_tokens", 0))
+        return message
+
+    def _invoke_with_failover(self, messages):
+        """Prueba las implementaciones en orden de costo esperado hasta que una responda."""
+        tried, last_error = [], None
+        while True:
+            member = self._select(exclude=tried)
+            if member is None:
+                break
+            tried.append(member)
+            traffic.count(f"{self.role}_calls")
+            try:
+                return self._call(member, messages)
+            except Exception as e:
+                if is_client_error(e):
+                    raise
+                last_error = e
+                print(f"⚠️ {self.role}: error en {member.name}: {e}")
+
+        raise last_error or LLMUnavailableError(f"Sin implementaciones disponibles para '{self.role}'")
+
+    def _invoke_hedged(self, messages):
+        """
+        Lanza la petición en la mejor implementación y, si no respondió al cumplirse su p95,
+        una copia en la siguiente; gana la primera respuesta exitosa.
+
+        El cliente síncrono no permite interrumpir la petición perdedora: se cancela si aún
+        no empezó y, si ya está en curso, su resultado se descarta (su latencia sí se registra).
+        """
+        first = self._select()
+        if first is None:
+            raise LLMUnavailableError(f"Sin implementaciones disponibles para '{self.role}'")
+
+        tried = [first]
+        traffic.count(f"{self.role}_calls")
+        pending = {self._submit(first, messages): first}
+        hedged, last_error = False, None
+
+        while pending:
+            timeout = None if hedged else self._hedge_delay_s(first)
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                # Venció el retardo de cobertura: copia en la siguiente implementación
+                hedged = True
+                backup = self._select(exclude=tried)
+                if backup:
+                    tried.append(backup)
+                    traffic.count(f"{self.role}_calls")
+                    traffic.count(f"{self.role}_hedged")
+                    pending[self._submit(backup, messages)] = backup
+                    print(f"🛡️ {self.role}: {first.name} supera {timeout * 1000:.0f} ms, cobertura en {backup.name}")
+                continue
+
+            for future in done:
+                member = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    if is_client_error(e):
+                        for loser in pending:
+                            loser.cancel()
+                        raise
+                    last_error = e
+                    print(f"⚠️ {self.role}: error en {member.name}: {e}")
+                    continue
+                for loser in pending:
+                    loser.cancel()
+                return result
+
+            # Todas las peticiones en curso fallaron: failover a la siguiente implementación
+            if not pending:
+                hedged = True
+                fallback = self._select(exclude=tried)
+                if fallback:
+                    tried.append(fallback)
+                    traffic.count(f"{self.role}_calls")
+                    pending[self._submit(fallback, messages)] = fallback
+
+        raise last_error or LLMUnavailableError(f"Sin implementaciones disponibles para '{self.role}'")
+
+    def close(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,86 @@
+# backend/src/pending_answers.py
+
+"""
+Respuestas del LLM que siguen generándose en segundo plano tras una respuesta degradada.
+
+Cuando la generación supera ANSWER_DEADLINE_SECONDS, /chat responde de inmediato con las
+fuentes recuperadas y la generación continúa; el resultado se guarda aquí para consultarlo
+después (GET /chat/pending/<answer_id>). Como en las exportaciones, cada respuesta se
+guarda como JSON en un directorio local, de modo que cualquier worker del mismo
+contenedor puede responder la consulta.
+"""
+
+import json
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Optional
+
+
+class PendingAnswerStore:
+    """
+    Estados: pending -> completed | failed
+    """
+
+    def __init__(self, directory: str, retention_seconds: int):
+        self.directory = directory
+        self.retention_seconds = retention_seconds
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, answer_id: str) -> str:
+        return os.path.join(self.directory, f"{answer_id}.json")
+
+    def _save(self, entry: Dict):
+        tmp_path = self._path(entry["answer_id"]) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, self._path(entry["answer_id"]))
+
+    def create(self, session_id: str) -> str:
+        """Registra una respuesta pendiente y devuelve su identificador."""
+        self._purge_expired()
+        entry = {
+            "answer_id": str(uuid.uuid4()),
+            "session_id": session_id,
+            "status": "pending",
+            "response": None,
+            "sources": [],
+            "created_at": datetime.utcnow().isoformat(),
+            "finished_at": None
+        }
+        self._save(entry)
+        return entry["answer_id"]
+
+    def complete(self, answer_id: str, response: str, sources: list):
+        entry = self.get(answer_id)
+        if entry:
+            entry.update(status="completed", response=response, sources=sources,
+                         finished_at=datetime.utcnow().isoformat())
+            self._save(entry)
+
+    def fail(self, answer_id: str, error: str):
+        entry = self.get(answer_id)
+        if entry:
+            entry.update(status="failed", error=error, finished_at=datetime.utcnow().isoformat())
+            self._save(entry)
+
+    def get(self, answer_id: str) -> Optional[Dict]:
+        """Estado de la respuesta (o None si no existe o expiró)."""
+        try:
+            uuid.UUID(answer_id)
+            with open(self._path(answer_id), encoding="utf-8") as f:
+                return json.load(f)
+        except (ValueError, FileNotFoundError):
+            return None
+
+    def _purge_expired(self):
+        """Elimina respuestas más antiguas que la retención configurada."""
+        cutoff = time.time() - self.retention_seconds
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,198 @@
+# backend/src/prompts.py
+
+"""
+Registro de prompts compilados una sola vez al iniciar el proceso.
+
+Cada prompt comienza con un mensaje de sistema estático (idéntico byte a byte entre
+peticiones) para que el prompt caching de Azure OpenAI pueda reutilizar el prefijo.
+Las partes variables (contexto recuperado, consulta) van siempre al final.
+
+Al modificar el texto de un prompt, incrementar PROMPT_VERSION.
+"""
+
+from typing import Dict, Optional, Tuple
+
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain.schema import SystemMessage
+
+PROMPT_VERSION = "v2"
+
+# Palabras clave como contexto para el LLM clasificador
+CONVERSATIONAL_KEYWORDS = [
+    'hola', 'hello', 'hi', 'buenos días', 'buenas tardes', 'buenas noches',
+    'chao', 'adiós', 'hasta luego', 'nos vemos', 'bye',
+    'cómo estás', 'como estas', 'qué tal', 'que tal',
+    'gracias', 'muchas gracias', 'ok', 'vale', 'entendido',
+    'quién eres', 'quien eres', 'qué haces', 'que haces',
+    'ayuda', 'help'
+]
+
+GENERAL_CGR_KEYWORDS = [
+    'qué es un dictamen', 'que es un dictamen', 'qué es dictamen', 'que es dictamen',
+    'qué es la contraloría', 'que es la contraloria', 'qué es cgr', 'que es cgr',
+    'qué hace la contraloría', 'que hace la contraloria', 'función de la contraloría',
+    'función de la contraloria', 'para qué sirve la contraloría', 'para que sirve la contraloria',
+    'qué es contraloría general', 'que es contraloria general', 'definición de dictamen',
+    'definicion de dictamen', 'concepto de dictamen', 'significado de dictamen',
+    'qué significa dictamen', 'que significa dictamen', 'tipos de dictamen',
+    'clases de dictamen', 'categorías de dictamen', 'categorias de dictamen'
+]
+
+SPECIFIC_SEARCH_KEYWORDS = [
+    'caso específico', 'caso especifico', 'ejemplo concreto',
+    'dictamen número', 'dictamen numero',
+    'normativa específica',
+    'normativa especifica', 'artículo específico', 'articulo especifico',
+    'busca información sobre', 'encuentra información', 'consulta específica',
+    'consulta especifica', 'documento específico', 'documento especifico',
+    'dictamen de fecha',
+    'normativa de', 'reglamento de', 'ley de'
+]
+
+SPECIFIC_LEGAL_KEYWORDS = [
+    'cuáles son los dictámenes de la ley', 'cuales son los dictamenes de la ley',
+    'dictámenes de la ley', 'dictamenes de la ley', 'ley número', 'ley numero',
+    'últimos dictámenes de', 'ultimos dictamenes de', 'dictámenes más recientes',
+    'dictamenes mas recientes', 'dictámenes asociados a', 'dictamenes asociados a',
+    'concepto jurídico', 'concepto juridico', 'ley karin', 'licencias médicas',
+    'licencias medicas', 'contratación pública', 'contratacion publica',
+    'compras públicas', 'compras publicas', 'normativa de', 'reglamento de',
+    'cuáles son los dictámenes', 'cuales son los dictamenes', 'listado de dictámenes',
+    'listado de dictamenes', 'dictámenes sobre', 'dictamenes sobre'
+]
+
+RAG_SYSTEM_PROMPT = (
+    "Eres un asistente legal experto en dictámenes de la Contraloría General de la República. "
+    "Responde a la pregunta basándote **únicamente** en el contexto extraído. "
+    "Si no puedes encontrar la respuesta en el contexto, indica que la información no está disponible. "
+    "Cita las fuentes relevantes al final de la respuesta, haciendo referencia al 'numero_dictamen'."
+)
+
+# Su huella versiona las respuestas precomputadas (ver answer_store.py)
+CONVERSATIONAL_SYSTEM_PROMPT = (
+    "Eres un asistente especializado en dictámenes de la Contraloría General de la República de Chile. "
+    "Tu función es responder preguntas generales sobre la CGR y sus dictámenes usando tus conocimientos generales. "
+    "\n\nInstrucciones específicas:"
+    "\n- Para preguntas como '¿Qué es un dictamen CGR?', explica el concepto general de dictamen en el contexto de la CGR"
+    "\n- Para preguntas sobre la función de la CGR, explica su rol como órgano contralor del Estado"
+    "\n- Para preguntas sobre tipos de dictámenes, menciona las categorías principales (preventivos, reparos, etc.)"
+    "\n- Siempre mantén un tono institucional pero accesible"
+    "\n- Si la pregunta es muy específica sobre un caso particular, sugiere que se formule de manera más específica"
+    "\n- Enfócate siempre en el contexto de la Contraloría General de la República de Chile"
+)
+
+CLASSIFICATION_SYSTEM_PROMPT = (
+    "Eres un clasificador de intenciones especializado en consultas sobre dictámenes de la Contraloría General de la República de Chile. "
+    "Tu tarea es determinar si una consulta requiere búsqueda específica en la base de conocimiento o puede responderse con conocimientos generales. "
+    "\n\nRevisa toda la conversación y la consulta del usuario y determina si la pregunta del usuario ya fue respondida o no: "
+    "\n\nSi la pregunta ya fue respondida en la conversación, se refiere a un saludo, responde como una conversación general, pero vuelve a insistir en qué puedes ayudar sobre dictámenes. "
+    "Si la pregunta implica **SUMAR** o **contar** dictámenes o conceptos sobre los dictámenes, responde que no puedes realizar estas operaciones, sólo búsqueda semántica. "
+    "Si la pregunta no fue respondida previamente, responde lo mismo que antes. No importa si sabes cómo responder la pregunta con tu propio conocimiento; simplemente verifica si la pregunta específica ya fue respondida. "
+    "NO JUZGUES EN BASE A TU CONOCIMIENTO ACTUAL. Cualquier cosa que no haya sido respondida previamente debe responderse con la base de datos. "
+    "\n\nCategorías de clasificación:"
+    "\n1. CONVERSACIONAL: Saludos, despedidas, preguntas sobre el asistente, preguntas ya respondidas"
+    "\n2. GENERAL_CGR: Preguntas conceptuales sobre la CGR, definiciones, funciones generales"
+    "\n3. ESPECIFICA: Consultas que requieren información específica de dictámenes, preguntas no respondidas previamente"
+    "\n4. LEGAL_LIST: Consultas sobre listado de dictámenes asociados a leyes específicas o conceptos jurídicos (ej: 'cuáles son los dictámenes de la ley X', 'últimos dictámenes sobre licencias médicas')"
+    "\n\nPalabras clave de referencia:"
+    f"\n- Conversacional: {', '.join(CONVERSATIONAL_KEYWORDS[:10])}..."
+    f"\n- General CGR: {', '.join(GENERAL_CGR_KEYWORDS[:10])}..."
+    f"\n- Específica: {', '.join(SPECIFIC_SEARCH_KEYWORDS[:10])}..."
+    f"\n- Legal List: {', '.join(SPECIFIC_LEGAL_KEYWORDS[:10])}..."
+    "\n\nResponde ÚNICAMENTE con una de estas opciones: CONVERSACIONAL, GENERAL_CGR, ESPECIFICA, o LEGAL_LIST"
+)
+
+REWRITE_SYSTEM_PROMPT = (
+    "Eres un asistente experto en reformular preguntas sobre dictámenes de la Contraloría General de la República. "
+    "Tu tarea es reescribir la pregunta del usuario para que sea una consulta standalone "
+    "(que se entienda sin contexto previo) y optimizada para búsqueda semántica. "
+    "\n\nInstrucciones:"
+    "\n- Incorpora el contexto relevante del historial de conversación"
+    "\n- Haz que la pregunta sea clara y específica"
+    "\n- Mantén los términos legales y técnicos importantes"
+    "\n- Si la pregunta se refiere a algo mencionado anteriormente, inclúyelo explícitamente"
+    "\n- Responde SOLO con la pregunta reescrita, sin explicaciones adicionales"
+)
+
+MULTI_QUERY_SYSTEM_PROMPT = (
+    "Eres un asistente experto en búsqueda de dictámenes de la Contraloría General de la República. "
+    "Genera formulaciones alternativas de la consulta del usuario para mejorar la búsqueda semántica. "
+    "\n\nInstrucciones:"
+    "\n- Usa sinónimos y la terminología jurídica y administrativa que usaría un dictamen"
+    "\n- Mantén el sentido de la consulta original"
+    "\n- Responde SOLO con una variante por línea, sin numeración ni explicaciones"
+)
+
+HYDE_SYSTEM_PROMPT = (
+    "Eres un asistente legal experto en dictámenes de la Contraloría General de la República. "
+    "Redacta un párrafo breve, con el estilo de un dictamen de la CGR, que responda la consulta del usuario. "
+    "No es necesario que sea exacto: se usará solo para buscar dictámenes similares."
+)
+
+
+class PromptRegistry:
+    """
+    Plantillas de prompt compiladas, indexadas por (nombre, versión).
+
+    Las plantillas se construyen una vez; por petición solo se llama a `format_messages`.
+    """
+
+    def __init__(self, default_version: str):
+        self.default_version = default_version
+        self._templates: Dict[Tuple[str, str], ChatPromptTemplate] = {}
+
+    def register(self, name: str, template: ChatPromptTemplate, version: Optional[str] = None):
+        self._templates[(name, version or self.default_version)] = template
+
+    def get(self, name: str, version: Optional[str] = None) -> ChatPromptTemplate:
+        return self._templates[(name, version or self.default_version)]
+
+    def names(self):
+        return sorted({name for name, _ in self._templates})
+
+
+def build_registry(version: str = PROMPT_VERSION) -> PromptRegistry:
+    """Compila todas las plantillas de prompt del servicio."""
+    registry = PromptRegistry(version)
+
+    # El contexto va después del historial para que el prefijo (sistema + historial) sea estable
+    registry.register("rag_answer", ChatPromptTemplate.from_messages([
+        SystemMessage(content=RAG_SYSTEM_PROMPT),
+        MessagesPlaceholder(variable_name="chat_history"),
+        ("system", "Contexto recuperado: {context}"),
+        ("human", "{query}"),
+    ]))
+
+    registry.register("conversational", ChatPromptTemplate.from_messages([
+        SystemMessage(content=CONVERSATIONAL_SYSTEM_PROMPT),
+        MessagesPlaceholder(variable_name="chat_history"),
+        ("human", "{query}"),
+    ]))
+
+    registry.register("classification", ChatPromptTemplate.from_messages([
+        SystemMessage(content=CLASSIFICATION_SYSTEM_PROMPT),
+        MessagesPlaceholder(variable_name="chat_history"),
+        ("human", "# User question:\n# user:\n{query}"),
+    ]))
+
+    registry.register("rewrite", ChatPromptTemplate.from_messages([
+        SystemMessage(content=REWRITE_SYSTEM_PROMPT),
+        MessagesPlaceholder(variable_name="chat_history"),
+        ("human", "Pregunta original del usuario: {original_query}\n\nPregunta reescrita:"),
+    ]))
+
+    registry.register("multi_query", ChatPromptTemplate.from_messages([
+        SystemMessage(content=MULTI_QUERY_SYSTEM_PROMPT),
+        ("human", "Genera {n_variants} variantes de la consulta: {query}"),
+    ]))
+
+    registry.register("hyde", ChatPromptTemplate.from_messages([
+        SystemMessage(content=HYDE_SYSTEM_PROMPT),
+        ("human", "{query}"),
+    ]))
+
+    return registry
+
+
+# Registro global compilado al importar el módulo
+PROMPTS = build_registry()
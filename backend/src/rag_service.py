@@ -1,18 +1,48 @@
-from typing import List, Dict
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from datetime import datetime
+from typing import List, Dict, Optional
 from langchain_core.documents import Document
-from langchain_openai import AzureChatOpenAI
-from langchain.schema import SystemMessage, HumanMessage, AIMessage
+from langchain.schema import HumanMessage, AIMessage
 from langchain.memory import ConversationBufferWindowMemory
 from .search_retriever import AzureHybridSearchRetriever
-from .config import AZURE_OPENAI_CHAT_DEPLOYMENT, AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_KEY, USE_COSMOS_DB, AZURE_OPENAI_CLASSIFICATION_DEPLOYMENT
+from .config import USE_COSMOS_DB
+from .config import RETRIEVAL_MODE, MULTI_QUERY_VARIANTS, LEGAL_LIST_RESULT_MODE, LATENCY_BUDGET_DEFAULT_MS
+from .config import ANSWER_DEADLINE_SECONDS, AUX_LLM_DEADLINE_SECONDS, DEGRADED_CONTINUE_IN_BACKGROUND, GENERATION_MAX_WORKERS
+from .config import PENDING_ANSWERS_DIR, PENDING_ANSWERS_RETENTION_SECONDS
+from .config import USE_CANNED_ANSWERS, CANNED_ANSWERS_PATH, CANNED_ANSWERS_SIMILARITY_THRESHOLD, CANNED_ANSWERS_MAX_QUERY_WORDS
 from .cosmos_manager import CosmosDBManager
+from .answer_store import CannedAnswerStore, prompt_fingerprint
+from .llm_pool import LLMPool
+from .pending_answers import PendingAnswerStore
+from .prompts import PROMPTS, CONVERSATIONAL_SYSTEM_PROMPT
+from .utils import get_embedding
+from . import traffic
+
+# Largo máximo del resumen de cada dictamen en la respuesta degradada
+DEGRADED_SNIPPET_CHARS = 300
+
+# Respuesta conversacional cuando el LLM falla o excede el plazo
+CONVERSATIONAL_FALLBACK_RESPONSE = (
+    "En este momento no puedo responder. Intenta nuevamente en unos minutos o formula "
+    "una consulta sobre dictámenes específicos."
+)
 
 # CLAVE: Diccionario para almacenar la memoria en RAM (fallback)
 session_memories: Dict[str, ConversationBufferWindowMemory] = {}
 
-# Instancia global de Cosmos DB Manager
-cosmos_db_manager = CosmosDBManager()
+# Instancia global de Cosmos DB Manager (se conecta en RAGService.startup)
+cosmos_db_manager = CosmosDBManager(lazy=True)
+
+# Indicadores de consultas de listado de dictámenes
+LEGAL_LIST_INDICATORS = (
+    'cuáles son los dictámenes', 'cuales son los dictamenes',
+    'últimos dictámenes', 'ultimos dictamenes', 'dictámenes más recientes',
+    'dictamenes mas recientes', 'dictámenes de la ley', 'dictamenes de la ley',
+    'ley número', 'ley numero', 'concepto jurídico', 'concepto juridico',
+    'listado de dictámenes', 'listado de dictamenes', 'dictámenes sobre',
+    'dictamenes sobre', 'dictámenes asociados a', 'dictamenes asociados a'
+)
 
 def get_session_memory(session_id: str) -> ConversationBufferWindowMemory:
     """Devuelve o crea una nueva memoria de chat para el ID de sesión."""
@@ -29,56 +59,66 @@ class RAGService:
     def __init__(self):
         self.retriever = AzureHybridSearchRetriever()
         
-        # LLM principal para respuestas
-        self.llm = AzureChatOpenAI(
-            azure_deployment=AZURE_OPENAI_CHAT_DEPLOYMENT,
-            openai_api_version="2024-02-01",
-            azure_endpoint=AZURE_OPENAI_ENDPOINT,
-            openai_api_key=AZURE_OPENAI_API_KEY,
-            temperature=0.1
-        )
+        # LLM principal para respuestas (pool de implementaciones, ver llm_pool.py)
+        self.llm = LLMPool("chat", temperature=0.1)
         
         # LLM más pequeño para clasificación (opcional)
-        self.classification_llm = AzureChatOpenAI(
-            azure_deployment=AZURE_OPENAI_CLASSIFICATION_DEPLOYMENT,
-            openai_api_version="2024-02-01",
-            azure_endpoint=AZURE_OPENAI_ENDPOINT,
-            openai_api_key=AZURE_OPENAI_API_KEY,
-            temperature=0.0  # Temperatura más baja para clasificación
-        )
+        self.classification_llm = LLMPool("classification", temperature=0.0)  # Temperatura más baja para clasificación
+        
+        # Generación con plazo: si se excede, se responde solo con las fuentes (modo degradado)
+        self._generation_executor = ThreadPoolExecutor(max_workers=GENERATION_MAX_WORKERS, thread_name_prefix="generation")
+        self.pending_answers = PendingAnswerStore(PENDING_ANSWERS_DIR, PENDING_ANSWERS_RETENTION_SECONDS)
         
-        self.prompt = ChatPromptTemplate.from_messages([
-            SystemMessage(
-                content=(
-                    "Eres un asistente legal experto en dictámenes de la Contraloría General de la República. "
-                    "Responde a la pregunta basándote **únicamente** en el contexto extraído. "
-                    "Si no puedes encontrar la respuesta en el contexto, indica que la información no está disponible. "
-                    "Cita las fuentes relevantes al final de la respuesta, haciendo referencia al 'numero_dictamen'. "
-                    "Contexto recuperado: {context}"
-                )
-            ),
-            MessagesPlaceholder(variable_name="chat_history"), 
-            ("human", "{query}"),
-        ])
-        
-        # Prompt para conversaciones generales (sin búsqueda)
-        self.conversational_prompt = ChatPromptTemplate.from_messages([
-            SystemMessage(
-                content=(
-                    "Eres un asistente especializado en dictámenes de la Contraloría General de la República de Chile. "
-                    "Tu función es responder preguntas generales sobre la CGR y sus dictámenes usando tus conocimientos generales. "
-                    "\n\nInstrucciones específicas:"
-                    "\n- Para preguntas como '¿Qué es un dictamen CGR?', explica el concepto general de dictamen en el contexto de la CGR"
-                    "\n- Para preguntas sobre la función de la CGR, explica su rol como órgano contralor del Estado"
-                    "\n- Para preguntas sobre tipos de dictámenes, menciona las categorías principales (preventivos, reparos, etc.)"
-                    "\n- Siempre mantén un tono institucional pero accesible"
-                    "\n- Si la pregunta es muy específica sobre un caso particular, sugiere que se formule de manera más específica"
-                    "\n- Enfócate siempre en el contexto de la Contraloría General de la República de Chile"
-                )
-            ),
-            MessagesPlaceholder(variable_name="chat_history"),
-            ("human", "{query}"),
-        ])
+        # Prompts compilados una sola vez (ver prompts.py)
+        self.prompt = PROMPTS.get("rag_answer")
+        self.conversational_prompt = PROMPTS.get("conversational")
+        self.classification_prompt = PROMPTS.get("classification")
+        self.rewrite_prompt = PROMPTS.get("rewrite")
+        self.multi_query_prompt = PROMPTS.get("multi_query")
+        self.hyde_prompt = PROMPTS.get("hyde")
+        
+        # Respuestas precomputadas, versionadas con la huella del prompt conversacional
+        self.conversational_fingerprint = prompt_fingerprint(
+            CONVERSATIONAL_SYSTEM_PROMPT, ",".join(self.llm.deployments)
+        )
+        self.answer_store = None
+        if USE_CANNED_ANSWERS:
+            self.answer_store = CannedAnswerStore.load(
+                CANNED_ANSWERS_PATH,
+                expected_fingerprint=self.conversational_fingerprint,
+                similarity_threshold=CANNED_ANSWERS_SIMILARITY_THRESHOLD,
+                max_query_words=CANNED_ANSWERS_MAX_QUERY_WORDS
+            )
+
+    def startup(self):
+        """Hook de inicio: conecta los clientes que requieren round trips (Cosmos DB)."""
+        cosmos_db_manager.initialize()
+
+    def warmup(self):
+        """
+        Pre-abre las conexiones HTTP (embeddings, búsqueda, Cosmos DB) para que la primera
+        consulta no pague el costo de conexión. Los errores se registran sin interrumpir.
+        """
+        steps = [
+            ("embeddings", lambda: get_embedding("dictamen")),
+            ("búsqueda", self.retriever.warmup),
+            ("cosmos", lambda: cosmos_db_manager.list_sessions(limit=1) if cosmos_db_manager.enabled else None),
+        ]
+        for name, step in steps:
+            start = time.perf_counter()
+            try:
+                step()
+                print(f"🔥 Warm-up {name}: {(time.perf_counter() - start) * 1000:.0f} ms")
+            except Exception as e:
+                print(f"⚠️ Warm-up {name} falló: {e}")
+
+    def shutdown(self):
+        """Hook de cierre: libera conexiones y pools de hilos."""
+        self.retriever.close()
+        self.llm.close()
+        self.classification_llm.close()
+        self._generation_executor.shutdown(wait=False, cancel_futures=True)
+        cosmos_db_manager.close()
 
     def _needs_search(self, query: str, session_id: str) -> bool:
         """
@@ -96,87 +136,18 @@ class RAGService:
                 memory = get_session_memory(session_id)
                 history_messages = memory.load_memory_variables({})['chat_history']
             
-            # Palabras clave como contexto para el LLM clasificador
-            conversational_keywords = [
-                'hola', 'hello', 'hi', 'buenos días', 'buenas tardes', 'buenas noches',
-                'chao', 'adiós', 'hasta luego', 'nos vemos', 'bye',
-                'cómo estás', 'como estas', 'qué tal', 'que tal',
-                'gracias', 'muchas gracias', 'ok', 'vale', 'entendido',
-                'quién eres', 'quien eres', 'qué haces', 'que haces',
-                'ayuda', 'help'
-            ]
-            
-            general_cgr_keywords = [
-                'qué es un dictamen', 'que es un dictamen', 'qué es dictamen', 'que es dictamen',
-                'qué es la contraloría', 'que es la contraloria', 'qué es cgr', 'que es cgr',
-                'qué hace la contraloría', 'que hace la contraloria', 'función de la contraloría',
-                'función de la contraloria', 'para qué sirve la contraloría', 'para que sirve la contraloria',
-                'qué es contraloría general', 'que es contraloria general', 'definición de dictamen',
-                'definicion de dictamen', 'concepto de dictamen', 'significado de dictamen',
-                'qué significa dictamen', 'que significa dictamen', 'tipos de dictamen',
-                'clases de dictamen', 'categorías de dictamen', 'categorias de dictamen'
-            ]
-            
-            specific_search_keywords = [
-                'caso específico', 'caso especifico', 'ejemplo concreto',
-                'dictamen número', 'dictamen numero',
-                'normativa específica',
-                'normativa especifica', 'artículo específico', 'articulo especifico',
-                'busca información sobre', 'encuentra información', 'consulta específica',
-                'consulta especifica', 'documento específico', 'documento especifico',
-                'dictamen de fecha',
-                'normativa de', 'reglamento de', 'ley de'
-            ]
-            
-            specific_legal_keywords = [
-                'cuáles son los dictámenes de la ley', 'cuales son los dictamenes de la ley',
-                'dictámenes de la ley', 'dictamenes de la ley', 'ley número', 'ley numero',
-                'últimos dictámenes de', 'ultimos dictamenes de', 'dictámenes más recientes',
-                'dictamenes mas recientes', 'dictámenes asociados a', 'dictamenes asociados a',
-                'concepto jurídico', 'concepto juridico', 'ley karin', 'licencias médicas',
-                'licencias medicas', 'contratación pública', 'contratacion publica',
-                'compras públicas', 'compras publicas', 'normativa de', 'reglamento de',
-                'cuáles son los dictámenes', 'cuales son los dictamenes', 'listado de dictámenes',
-                'listado de dictamenes', 'dictámenes sobre', 'dictamenes sobre'
-            ]
-            
-            # Prompt para el LLM clasificador con historial
-            classification_prompt = ChatPromptTemplate.from_messages([
-                SystemMessage(
-                    content=(
-                        "Eres un clasificador de intenciones especializado en consultas sobre dictámenes de la Contraloría General de la República de Chile. "
-                        "Tu tarea es determinar si una consulta requiere búsqueda específica en la base de conocimiento o puede responderse con conocimientos generales. "
-                        "\n\nRevisa toda la conversación y la consulta del usuario y determina si la pregunta del usuario ya fue respondida o no: "
-                        "\n\nSi la pregunta ya fue respondida en la conversación, se refiere a un saludo, responde como una conversación general, pero vuelve a insistir en qué puedes ayudar sobre dictámenes. "
-                        "Si la pregunta implica **SUMAR** o **contar** dictámenes o conceptos sobre los dictámenes, responde que no puedes realizar estas operaciones, sólo búsqueda semántica. "
-                        "Si la pregunta no fue respondida previamente, responde lo mismo que antes. No importa si sabes cómo responder la pregunta con tu propio conocimiento; simplemente verifica si la pregunta específica ya fue respondida. "
-                        "NO JUZGUES EN BASE A TU CONOCIMIENTO ACTUAL. Cualquier cosa que no haya sido respondida previamente debe responderse con la base de datos. "
-                        "\n\nCategorías de clasificación:"
-                        "\n1. CONVERSACIONAL: Saludos, despedidas, preguntas sobre el asistente, preguntas ya respondidas"
-                        "\n2. GENERAL_CGR: Preguntas conceptuales sobre la CGR, definiciones, funciones generales"
-                        "\n3. ESPECIFICA: Consultas que requieren información específica de dictámenes, preguntas no respondidas previamente"
-                        "\n4. LEGAL_LIST: Consultas sobre listado de dictámenes asociados a leyes específicas o conceptos jurídicos (ej: 'cuáles son los dictámenes de la ley X', 'últimos dictámenes sobre licencias médicas')"
-                        "\n\nPalabras clave de referencia:"
-                        f"\n- Conversacional: {', '.join(conversational_keywords[:10])}..."
-                        f"\n- General CGR: {', '.join(general_cgr_keywords[:10])}..."
-                        f"\n- Específica: {', '.join(specific_search_keywords[:10])}..."
-                        f"\n- Legal List: {', '.join(specific_legal_keywords[:10])}..."
-                        "\n\nResponde ÚNICAMENTE con una de estas opciones: CONVERSACIONAL, GENERAL_CGR, ESPECIFICA, o LEGAL_LIST"
-                    )
-                ),
-                MessagesPlaceholder(variable_name="chat_history"),
-                ("human", f"# User question:\n# user:\n{query}")
-            ])
-            
             # Usar un modelo más pequeño para clasificación
             classification_llm = self.classification_llm
             
             # Clasificar la consulta con historial
-            formatted_prompt = classification_prompt.format_messages(
+            formatted_prompt = self.classification_prompt.format_messages(
                 chat_history=history_messages,
                 query=query
             )
-            classification_result = classification_llm.invoke(formatted_prompt).content.strip().upper()
+            classification_result = self._invoke_with_deadline(
+                classification_llm, formatted_prompt, AUX_LLM_DEADLINE_SECONDS
+            ).content.strip().upper()
+            traffic.annotate(intent=classification_result)
             
             print(f"🤖 Clasificación LLM para '{query}': {classification_result}")
             
@@ -198,6 +169,9 @@ class RAGService:
                 print(f"⚠️ Clasificación inesperada '{classification_result}' para '{query}' - Usando lógica de respaldo")
                 return self._fallback_classification(query)
                 
+        except FuturesTimeoutError:
+            print(f"⏱️ Clasificación LLM supera {AUX_LLM_DEADLINE_SECONDS:.0f} s para '{query}' - Usando lógica de respaldo")
+            return self._fallback_classification(query)
         except Exception as e:
             print(f"⚠️ Error en clasificación LLM para '{query}': {e} - Usando lógica de respaldo")
             return self._fallback_classification(query)
@@ -206,75 +180,96 @@ class RAGService:
         """
         Detecta el tipo específico de búsqueda requerida.
         """
-        legal_list_indicators = [
-            'cuáles son los dictámenes', 'cuales son los dictamenes',
-            'últimos dictámenes', 'ultimos dictamenes', 'dictámenes más recientes',
-            'dictamenes mas recientes', 'dictámenes de la ley', 'dictamenes de la ley',
-            'ley número', 'ley numero', 'concepto jurídico', 'concepto juridico',
-            'listado de dictámenes', 'listado de dictamenes', 'dictámenes sobre',
-            'dictamenes sobre', 'dictámenes asociados a', 'dictamenes asociados a'
-        ]
-        
         query_lower = query.lower()
-        for indicator in legal_list_indicators:
+        for indicator in LEGAL_LIST_INDICATORS:
             if indicator in query_lower:
                 return "LEGAL_LIST"
         
         return "STANDARD"
     
-    def _generate_legal_list_table(self, documents: List[Document], query: str) -> str:
+    def _build_legal_list_rows(self, documents: List[Document]) -> List[Dict]:
         """
-        Genera una tabla estructurada con los dictámenes encontrados.
+        Convierte los dictámenes encontrados en filas tipadas y compactas para el frontend.
         """
-        table_rows = []
-        
-        for i, doc in enumerate(documents, 1):
+        rows = []
+        for doc in documents:
             metadata = doc.metadata
             
+            # Fecha en formato ISO (YYYY-MM-DD); el frontend la formatea
+            fecha = metadata.get("fecha")
+            if isinstance(fecha, str) and fecha not in ("", "N/A"):
+                try:
+                    fecha = datetime.fromisoformat(fecha.replace('Z', '+00:00')).date().isoformat()
+                except ValueError:
+                    pass
+            else:
+                fecha = None
+            
+            rows.append({
+                "numero_dictamen": metadata.get("numero_dictamen", "N/A"),
+                "ano": metadata.get("ano"),
+                "fecha": fecha,
+                "resumen": metadata.get("resumen") or "",
+                "leyes_aplicadas": metadata.get("leyes_aplicadas") or "",
+                "dictamenes_aplicados": metadata.get("dictamenes_aplicados") or "",
+                "url": metadata.get("url") or ""
+            })
+        
+        return rows
+    
+    @staticmethod
+    def _legal_list_reference(rows: List[Dict]) -> str:
+        """Referencia compacta del listado para el historial (no infla los prompts siguientes)."""
+        numeros = ", ".join(str(row["numero_dictamen"]) for row in rows)
+        return f"[Listado de {len(rows)} dictámenes: {numeros}]"
+    
+    def _generate_legal_list_table(self, rows: List[Dict], query: str) -> str:
+        """
+        Genera una tabla markdown con los dictámenes encontrados (LEGAL_LIST_RESULT_MODE=markdown).
+        """
+        table_rows = []
+        
+        for i, row in enumerate(rows, 1):
             # Formatear fecha
-            fecha = metadata.get("fecha", "N/A")
-            if fecha != "N/A" and isinstance(fecha, str):
+            if row["fecha"]:
                 try:
-                    from datetime import datetime
-                    fecha_obj = datetime.fromisoformat(fecha.replace('Z', '+00:00'))
-                    fecha_formatted = fecha_obj.strftime("%d/%m/%Y")
-                except:
-                    fecha_formatted = fecha
+                    fecha_formatted = datetime.fromisoformat(row["fecha"]).strftime("%d/%m/%Y")
+                except ValueError:
+                    fecha_formatted = row["fecha"]
             else:
-                fecha_formatted = metadata.get("ano", "N/A")
+                fecha_formatted = row["ano"] or "N/A"
             
             # Truncar resumen si es muy largo
-            resumen = metadata.get("resumen", "Resumen no disponible")
+            resumen = row["resumen"] or "Resumen no disponible"
             if len(resumen) > 150:
                 resumen = resumen[:147] + "..."
             
             # Formatear leyes aplicadas
-            leyes = metadata.get("leyes_aplicadas", "N/A")
+            leyes = row["leyes_aplicadas"] or "N/A"
             if len(leyes) > 100:
                 leyes = leyes[:97] + "..."
             
             # Formatear dictámenes aplicados
-            dictamenes = metadata.get("dictamenes_aplicados", "N/A")
+            dictamenes = row["dictamenes_aplicados"] or "N/A"
             if len(dictamenes) > 100:
                 dictamenes = dictamenes[:97] + "..."
             
             # Crear fila de tabla
-            row = f"""
-**{i}. Dictamen {metadata.get('numero_dictamen', 'N/A')}**
+            table_rows.append(f"""
+**{i}. Dictamen {row['numero_dictamen']}**
 
 | Campo | Información |
 |-------|-------------|
-| **Número** | {metadata.get('numero_dictamen', 'N/A')} |
-| **Año** | {metadata.get('ano', 'N/A')} |
+| **Número** | {row['numero_dictamen']} |
+| **Año** | {row['ano'] or 'N/A'} |
 | **Fecha** | {fecha_formatted} |
 | **Resumen** | {resumen} |
 | **Leyes Aplicadas** | {leyes} |
 | **Dictámenes Aplicados** | {dictamenes} |
-| **URL** | [{metadata.get('url', 'N/A')}]({metadata.get('url', '#')}) |
+| **URL** | [{row['url'] or 'N/A'}]({row['url'] or '#'}) |
 
 ---
-"""
-            table_rows.append(row)
+""")
         
         # Crear respuesta completa
         response = f"""
@@ -282,7 +277,7 @@ class RAGService:
 
 Basado en tu consulta: *"{query}"*
 
-Se encontraron {len(documents)} dictámenes relacionados:
+Se encontraron {len(rows)} dictámenes relacionados:
 
 {''.join(table_rows)}
 
@@ -323,42 +318,87 @@ Se encontraron {len(documents)} dictámenes relacionados:
             print(f"📝 Sin historial previo. Usando query original: '{original_query}'")
             return original_query
         
-        # Prompt para reescribir la query
-        rewrite_prompt = ChatPromptTemplate.from_messages([
-            SystemMessage(
-                content=(
-                    "Eres un asistente experto en reformular preguntas sobre dictámenes de la Contraloría General de la República. "
-                    "Tu tarea es reescribir la pregunta del usuario para que sea una consulta standalone "
-                    "(que se entienda sin contexto previo) y optimizada para búsqueda semántica. "
-                    "\n\nInstrucciones:"
-                    "\n- Incorpora el contexto relevante del historial de conversación"
-                    "\n- Haz que la pregunta sea clara y específica"
-                    "\n- Mantén los términos legales y técnicos importantes"
-                    "\n- Si la pregunta se refiere a algo mencionado anteriormente, inclúyelo explícitamente"
-                    "\n- Responde SOLO con la pregunta reescrita, sin explicaciones adicionales"
-                )
-            ),
-            MessagesPlaceholder(variable_name="chat_history"),
-            ("human", "Pregunta original del usuario: {original_query}\n\nPregunta reescrita:")
-        ])
-        
         try:
-            formatted_prompt = rewrite_prompt.format_messages(
+            formatted_prompt = self.rewrite_prompt.format_messages(
                 chat_history=history_messages,
                 original_query=original_query
             )
             
-            rewritten_query = self.llm.invoke(formatted_prompt).content.strip()
+            rewritten_query = self._invoke_with_deadline(
+                self.llm, formatted_prompt, AUX_LLM_DEADLINE_SECONDS
+            ).content.strip()
             print(f"📝 Query Original: '{original_query}'")
             print(f"✨ Query Reescrita: '{rewritten_query}'")
             
             return rewritten_query
         
+        except FuturesTimeoutError:
+            print(f"⏱️ Reescritura supera {AUX_LLM_DEADLINE_SECONDS:.0f} s. Usando query original.")
+            return original_query
         except Exception as e:
             print(f"⚠️ Error al reescribir query: {e}. Usando query original.")
             return original_query
 
-    def generate_response(self, session_id: str, query: str, use_two_vectors: bool) -> Dict:
+    def _generate_query_variants(self, query: str) -> List[str]:
+        """Genera variantes de la consulta para la búsqueda multi-consulta usando el LLM pequeño."""
+        try:
+            formatted_prompt = self.multi_query_prompt.format_messages(
+                query=query,
+                n_variants=MULTI_QUERY_VARIANTS
+            )
+            content = self.classification_llm.invoke(formatted_prompt).content
+            variants = [line.strip(" -•0123456789.").strip() for line in content.splitlines()]
+            return [variant for variant in variants if variant][:MULTI_QUERY_VARIANTS]
+        except Exception as e:
+            print(f"⚠️ Error al generar variantes de la consulta: {e}")
+            return []
+
+    def _generate_hypothetical_answer(self, query: str) -> str:
+        """Genera una respuesta hipotética (HyDE) cuyo embedding se usa como vector de búsqueda."""
+        try:
+            formatted_prompt = self.hyde_prompt.format_messages(query=query)
+            return self.classification_llm.invoke(formatted_prompt).content.strip()
+        except Exception as e:
+            print(f"⚠️ Error al generar respuesta hipotética: {e}")
+            return ""
+
+    def _retrieve(self, query: str, use_two_vectors: bool, latency_budget_ms: Optional[float] = None) -> List[Document]:
+        """
+        Recupera el contexto según RETRIEVAL_MODE (single, multi_query o hyde).
+        
+        Con `latency_budget_ms`, el retriever ajusta sus parámetros al presupuesto y
+        `use_two_vectors` pasa a ser el máximo permitido, no una obligación.
+        """
+        if RETRIEVAL_MODE == "multi_query":
+            def expand():
+                variants = self._generate_query_variants(query)
+                print(f"🧩 Variantes de búsqueda: {variants}")
+                return variants, None
+            return self.retriever.run_multi_query_search(
+                query, expand, use_two_vectors=use_two_vectors, latency_budget_ms=latency_budget_ms
+            )
+        
+        if RETRIEVAL_MODE == "hyde":
+            return self.retriever.run_multi_query_search(
+                query, lambda: ([], self._generate_hypothetical_answer(query)),
+                use_two_vectors=use_two_vectors, latency_budget_ms=latency_budget_ms, max_extra_branches=1
+            )
+        
+        return self.retriever.run_hybrid_search(
+            query_text=query, 
+            use_two_vectors=use_two_vectors,
+            latency_budget_ms=latency_budget_ms
+        )
+
+    def generate_response(self, session_id: str, query: str, use_two_vectors: bool,
+                          latency_budget_ms: Optional[float] = None) -> Dict:
+        """
+        Args:
+            latency_budget_ms: Presupuesto de latencia para la búsqueda (por defecto
+                LATENCY_BUDGET_DEFAULT_MS; 0 o None usa los parámetros fijos)
+        """
+        if latency_budget_ms is None:
+            latency_budget_ms = LATENCY_BUDGET_DEFAULT_MS or None
         
         # Cargar historial
         if cosmos_db_manager.enabled:
@@ -368,9 +408,26 @@ Se encontraron {len(documents)} dictámenes relacionados:
             history_messages = memory.load_memory_variables({})['chat_history']
         
         # 1. Detectar si la consulta necesita búsqueda
-        needs_search = self._needs_search(query, session_id)
+        with traffic.stage("classification"):
+            needs_search = self._needs_search(query, session_id)
         
         if not needs_search:
+            # Respuesta precomputada (GENERAL_CGR / CONVERSACIONAL) sin llamar al LLM. Solo tras
+            # la clasificación: una consulta específica parecida a una semilla no debe recibirla
+            with traffic.stage("canned_lookup"):
+                canned = self.answer_store.lookup(query, embed=get_embedding) if self.answer_store else None
+            traffic.annotate(canned_hit=bool(canned))
+            if canned:
+                print(f"⚡ Respuesta precomputada '{canned['id']}' ({canned['intent']}) para: '{query}'")
+                llm_response = canned["answer"]
+                
+                self._save_interaction(session_id, query, llm_response, [])
+                
+                return {
+                    "response": llm_response,
+                    "sources": []
+                }
+            
             # FLUJO CONVERSACIONAL: Sin búsqueda, sin fuentes
             print(f"💬 Respuesta conversacional directa para: '{query}'")
             
@@ -379,15 +436,20 @@ Se encontraron {len(documents)} dictámenes relacionados:
                 query=query
             )
             
-            llm_response = self.llm.invoke(formatted_prompt).content
+            try:
+                with traffic.stage("generation"):
+                    llm_response = self._invoke_with_deadline(
+                        self.llm, formatted_prompt, ANSWER_DEADLINE_SECONDS
+                    ).content
+            except FuturesTimeoutError:
+                print(f"⏱️ Respuesta conversacional supera {ANSWER_DEADLINE_SECONDS:.0f} s: respuesta de respaldo")
+                return self._conversational_fallback(session_id, query)
+            except Exception as e:
+                print(f"❌ Error del LLM en respuesta conversacional: {e} - Respuesta de respaldo")
+                return self._conversational_fallback(session_id, query)
             
             # Guardar en historial (sin fuentes)
-            if cosmos_db_manager.enabled:
-                cosmos_db_manager.save_message(session_id, "user", query)
-                cosmos_db_manager.save_message(session_id, "assistant", llm_response, [])
-            else:
-                memory = get_session_memory(session_id)
-                memory.save_context({"input": query}, {"output": llm_response})
+            self._save_interaction(session_id, query, llm_response, [])
             
             return {
                 "response": llm_response,
@@ -396,64 +458,67 @@ Se encontraron {len(documents)} dictámenes relacionados:
         
         # 2. Detectar tipo de búsqueda específica
         search_type = self._detect_search_type(query)
+        traffic.annotate(search_type=search_type, retrieval_mode=RETRIEVAL_MODE)
         
         if search_type == "LEGAL_LIST":
             # FLUJO ESPECIALIZADO: Listado de dictámenes por ley/concepto
             print(f"📋 Búsqueda especializada para listado de dictámenes: '{query}'")
             
             # Realizar búsqueda especializada
-            documents = self.search_retriever.run_legal_list_search(query, limit=3)
+            with traffic.stage("retrieval"):
+                documents = self.retriever.run_legal_list_search(query, limit=3)
             
             if not documents:
                 llm_response = "No se encontraron dictámenes relacionados con tu consulta."
                 
                 # Guardar en historial
-                if cosmos_db_manager.enabled:
-                    cosmos_db_manager.save_message(session_id, "user", query)
-                    cosmos_db_manager.save_message(session_id, "assistant", llm_response, [])
-                else:
-                    memory = get_session_memory(session_id)
-                    memory.save_context({"input": query}, {"output": llm_response})
+                self._save_interaction(session_id, query, llm_response, [])
                 
                 return {
                     "response": llm_response,
                     "sources": []
                 }
             
-            # Generar tabla estructurada
-            table_response = self._generate_legal_list_table(documents, query)
-            
-            # Guardar en historial
-            sources = [{"numero_dictamen": doc.metadata.get("numero_dictamen"), 
-                       "url": doc.metadata.get("url")} for doc in documents]
+            rows = self._build_legal_list_rows(documents)
+            sources = [{"numero_dictamen": row["numero_dictamen"], "url": row["url"]} for row in rows]
             
-            if cosmos_db_manager.enabled:
-                cosmos_db_manager.save_message(session_id, "user", query)
-                cosmos_db_manager.save_message(session_id, "assistant", table_response, sources)
+            if LEGAL_LIST_RESULT_MODE == "markdown":
+                # Tabla markdown renderizada en el servidor (modo anterior)
+                table_response = self._generate_legal_list_table(rows, query)
+                history_content = table_response
+                result_payload = {}
             else:
-                memory = get_session_memory(session_id)
-                memory.save_context({"input": query}, {"output": table_response})
+                # Filas tipadas que renderiza el frontend; el historial guarda solo una referencia
+                table_response = f"Se encontraron {len(rows)} dictámenes relacionados con tu consulta."
+                history_content = self._legal_list_reference(rows)
+                result_payload = {"result_type": "legal_list", "rows": rows}
+            
+            # Guardar en historial
+            self._save_interaction(session_id, query, history_content, sources)
             
             return {
                 "response": table_response,
-                "sources": sources
+                "sources": sources,
+                **result_payload
             }
         
         # FLUJO RAG ESTÁNDAR: Para consultas específicas sobre dictámenes
         print(f"🔍 Respuesta con búsqueda RAG estándar para: '{query}'")
         
         # 3. Query Rewriting: Reescribir la consulta usando el historial
-        rewritten_query = self._rewrite_query(query, history_messages)
+        with traffic.stage("rewrite"):
+            rewritten_query = self._rewrite_query(query, history_messages)
         
         # 4. Búsqueda de Contexto (usando la query reescrita)
-        retrieved_documents = self.retriever.run_hybrid_search(
-            query_text=rewritten_query, 
-            use_two_vectors=use_two_vectors
-        )
+        with traffic.stage("retrieval"):
+            retrieved_documents = self._retrieve(rewritten_query, use_two_vectors, latency_budget_ms)
+        # En multi_query/hyde las ramas corren en otros hilos; su plan solo queda en el log
+        retrieval_plan = None
+        if latency_budget_ms and RETRIEVAL_MODE == "single":
+            retrieval_plan = self.retriever.last_search_stats.get("plan")
         
         # 4. Formato del Contexto
-        context_text = "\n---\n".join([f"Fuente: {doc.metadata.get('source', 'N/A')}\nContenido: {doc.page_content}" 
-                                      for doc in retrieved_documents])
+        context_text = self._format_context(retrieved_documents)
         
         # 5. Formatear Prompt con el historial (usando la query original para la respuesta)
         formatted_prompt = self.prompt.format_messages(
@@ -462,28 +527,190 @@ Se encontraron {len(documents)} dictámenes relacionados:
             query=query  # Usamos la query original para que el LLM responda a lo que el usuario preguntó
         )
         
-        # 6. Llamada al LLM
-        llm_response = self.llm.invoke(formatted_prompt).content
+        # 6. Formato de las fuentes
+        sources_list = self._format_sources(retrieved_documents)
+        
+        # 7. Llamada al LLM (con plazo: si se excede, respuesta degradada con las fuentes)
+        with traffic.stage("generation"):
+            llm_response, degraded_result = self._generate_with_deadline(
+                session_id, query, formatted_prompt, retrieved_documents, sources_list
+            )
+        if degraded_result:
+            if retrieval_plan:
+                degraded_result["retrieval_plan"] = retrieval_plan
+            return degraded_result
         
-        # 7. Formato de las fuentes
-        sources_list = [{
+        # 8. Guardar la interacción
+        self._save_interaction(session_id, query, llm_response, sources_list)
+
+        result = {
+            "response": llm_response,
+            "sources": sources_list
+        }
+        if retrieval_plan:
+            result["retrieval_plan"] = retrieval_plan
+        return result
+    
+    @staticmethod
+    def _format_context(documents: List[Document]) -> str:
+        """Contexto para el prompt RAG a partir de los documentos recuperados."""
+        return "\n---\n".join([f"Fuente: {doc.metadata.get('source', 'N/A')}\nContenido: {doc.page_content}" 
+                               for doc in documents])
+    
+    @staticmethod
+    def _format_sources(documents: List[Document]) -> List[Dict]:
+        """Fuentes en el formato que recibe el frontend."""
+        return [{
             "source": doc.metadata.get("source", "N/A"),
             "url": doc.metadata.get("url", ""),
             "score": doc.metadata.get("score", 0.0)
-        } for doc in retrieved_documents]
-        
-        # 8. Guardar la interacción
+        } for doc in documents]
+    
+    def _save_interaction(self, session_id: str, query: str, response: str, sources: List[Dict]):
+        """Guarda la pregunta y la respuesta en el historial (Cosmos DB o memoria RAM)."""
         if cosmos_db_manager.enabled:
             cosmos_db_manager.save_message(session_id, "user", query)
-            cosmos_db_manager.save_message(session_id, "assistant", llm_response, sources_list)
+            cosmos_db_manager.save_message(session_id, "assistant", response, sources)
         else:
             memory = get_session_memory(session_id)
-            memory.save_context({"input": query}, {"output": llm_response})
-
-        return {
-            "response": llm_response,
-            "sources": sources_list
-        }
+            memory.save_context({"input": query}, {"output": response})
+    
+    def _invoke_with_deadline(self, llm: LLMPool, formatted_prompt, timeout: float):
+        """
+        Invoca el LLM en el pool de generación y espera a lo más `timeout` segundos (0 = sin plazo).
+        
+        Al expirar el plazo la llamada no se interrumpe: sigue en su hilo hasta terminar o
+        hasta agotar LLM_REQUEST_TIMEOUT_SECONDS y su resultado se descarta. Los hilos
+        ocupados así están acotados por GENERATION_MAX_WORKERS.
+        
+        Raises:
+            FuturesTimeoutError: si se excede el plazo (o la excepción del LLM)
+        """
+        if not timeout:
+            return llm.invoke(formatted_prompt)
+        
+        future = self._generation_executor.submit(traffic.bind(llm.invoke), formatted_prompt)
+        try:
+            return future.result(timeout=timeout)
+        except FuturesTimeoutError:
+            # Solo tiene efecto si la llamada aún esperaba cupo en el pool
+            future.cancel()
+            raise
+    
+    def _conversational_fallback(self, session_id: str, query: str) -> Dict:
+        """Respuesta conversacional fija cuando el LLM falla o excede el plazo."""
+        self._save_interaction(session_id, query, CONVERSATIONAL_FALLBACK_RESPONSE, [])
+        traffic.annotate(degraded=True)
+        return {"response": CONVERSATIONAL_FALLBACK_RESPONSE, "sources": [], "degraded": True}
+    
+    def _generate_with_deadline(self, session_id: str, query: str, formatted_prompt, 
+                                retrieved_documents: List[Document], sources_list: List[Dict]):
+        """
+        Genera la respuesta del LLM dentro de ANSWER_DEADLINE_SECONDS.
+        
+        Si el LLM no está disponible (circuitos abiertos), falla o excede el plazo, se arma
+        una respuesta degradada con las fuentes y sus resúmenes. Si excedió el plazo y
+        DEGRADED_CONTINUE_IN_BACKGROUND está activo, la generación sigue en segundo plano
+        y su resultado queda en `pending_answers` (el historial se guarda al terminar).
+        Si no, la llamada en curso igual termina en su hilo (ver `_invoke_with_deadline`)
+        y su resultado se descarta.
+        
+        Returns:
+            Tupla (texto de la respuesta, None) o (None, resultado degradado)
+        """
+        if not self.llm.available:
+            print("🔌 LLM no disponible (circuitos abiertos): respuesta solo con fuentes")
+            return None, self._degraded_result(session_id, query, retrieved_documents, sources_list)
+        
+        if not ANSWER_DEADLINE_SECONDS:
+            try:
+                return self.llm.invoke(formatted_prompt).content, None
+            except Exception as e:
+                print(f"❌ Error del LLM al generar la respuesta: {e} - Respuesta solo con fuentes")
+                return None, self._degraded_result(session_id, query, retrieved_documents, sources_list)
+        
+        future = self._generation_executor.submit(traffic.bind(self.llm.invoke), formatted_prompt)
+        try:
+            return future.result(timeout=ANSWER_DEADLINE_SECONDS).content, None
+        except FuturesTimeoutError:
+            print(f"⏱️ Generación supera {ANSWER_DEADLINE_SECONDS:.0f} s: respuesta solo con fuentes")
+        except Exception as e:
+            print(f"❌ Error del LLM al generar la respuesta: {e} - Respuesta solo con fuentes")
+            return None, self._degraded_result(session_id, query, retrieved_documents, sources_list)
+        
+        if not DEGRADED_CONTINUE_IN_BACKGROUND:
+            # Solo tiene efecto si la llamada aún esperaba cupo en el pool
+            future.cancel()
+            return None, self._degraded_result(session_id, query, retrieved_documents, sources_list)
+        
+        answer_id = self.pending_answers.create(session_id)
+        result = self._degraded_result(session_id, query, retrieved_documents, sources_list, answer_id)
+        future.add_done_callback(
+            lambda done: self._finish_pending_answer(done, answer_id, session_id, query, result["response"], sources_list)
+        )
+        return None, result
+    
+    def _finish_pending_answer(self, future, answer_id: str, session_id: str, query: str,
+                               degraded_response: str, sources_list: List[Dict]):
+        """Guarda el resultado de una generación que continuó en segundo plano."""
+        try:
+            llm_response = future.result().content
+        except Exception as e:
+            print(f"❌ Generación en segundo plano {answer_id} falló: {e}")
+            self.pending_answers.fail(answer_id, str(e))
+            self._save_interaction(session_id, query, degraded_response, sources_list)
+            return
+        
+        print(f"✅ Generación en segundo plano {answer_id} completada")
+        self.pending_answers.complete(answer_id, llm_response, sources_list)
+        self._save_interaction(session_id, query, llm_response, sources_list)
+    
+    def _degraded_result(self, session_id: str, query: str, retrieved_documents: List[Document],
+                         sources_list: List[Dict], answer_id: Optional[str] = None) -> Dict:
+        """
+        Respuesta solo con los dictámenes recuperados y sus resúmenes (sin LLM).
+        
+        Si la generación sigue en segundo plano (`answer_id`), el historial se guarda al
+        terminar; si no, se guarda aquí la respuesta degradada.
+        """
+        summaries = {}
+        for doc in retrieved_documents:
+            source = doc.metadata.get("source", "N/A")
+            if source not in summaries:
+                summary = (doc.metadata.get("summary_match") or doc.page_content or "").strip()
+                if len(summary) > DEGRADED_SNIPPET_CHARS:
+                    summary = summary[:DEGRADED_SNIPPET_CHARS - 3] + "..."
+                summaries[source] = (summary, doc.metadata.get("url", ""))
+        
+        items = []
+        for i, (source, (summary, url)) in enumerate(summaries.items(), 1):
+            link = f" ([ver dictamen]({url}))" if url else ""
+            items.append(f"**{i}. Dictamen {source}**{link}\n{summary}")
+        
+        if answer_id:
+            closing = "La respuesta completa se mostrará apenas esté lista."
+        else:
+            closing = "Intenta nuevamente en unos minutos para obtener una respuesta detallada."
+        
+        if items:
+            response = ("La respuesta detallada está tardando más de lo habitual. Mientras tanto, "
+                        "estos son los dictámenes más relevantes para tu consulta:\n\n"
+                        + "\n\n".join(items) + f"\n\n{closing}")
+        else:
+            response = f"La respuesta detallada está tardando más de lo habitual. {closing}"
+        
+        if not answer_id:
+            self._save_interaction(session_id, query, response, sources_list)
+        
+        sources = [
+            {**source, "summary": summaries.get(source["source"], ("", ""))[0]}
+            for source in sources_list
+        ]
+        result = {"response": response, "sources": sources, "degraded": True}
+        traffic.annotate(degraded=True)
+        if answer_id:
+            result["pending_answer_id"] = answer_id
+        return result
     
     def _load_history_from_cosmos(self, session_id: str, limit: int = 10) -> List:
         """Carga el historial desde Cosmos DB y lo convierte al formato LangChain."""
@@ -0,0 +1,212 @@
+# backend/src/replay.py
+
+"""
+Reproducción de tráfico grabado (ver traffic.py) contra una instancia del backend.
+
+Reproduce las peticiones de /chat con los tiempos originales (a 1x o Nx de velocidad),
+respetando el orden de los turnos de cada sesión, y resume latencia, tasa de aciertos de
+caché y llamadas a servicios externos por petición. Para obtener las métricas internas, el
+backend debe correr con TRAFFIC_EXPOSE_TRACE=true; para aislarlo de Azure, con
+STANDIN_MODE=true y STANDIN_CORPUS_PATH (ver standins.py).
+
+Uso (desde backend/):
+    python -m src.replay run --log /tmp/traffic/*.jsonl --target http://localhost:8000 --speed 4 --output build_a.json
+    python -m src.replay compare build_a.json build_b.json
+"""
+
+import argparse
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from .evaluation import percentile
+
+
+def load_log(paths: List[str], limit: Optional[int] = None) -> List[Dict]:
+    """Registros de /chat de uno o más logs, ordenados por tiempo."""
+    records = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            records.extend(json.loads(line) for line in f if line.strip())
+    records = sorted((r for r in records if r.get("endpoint") == "chat"), key=lambda r: r["ts"])
+    return records[:limit] if limit else records
+
+
+class Replayer:
+    """Dispara las peticiones grabadas en su instante relativo, dividido por `speed`."""
+
+    def __init__(self, target: str, speed: float, concurrency: int, timeout_s: float):
+        self.url = target.rstrip("/") + "/chat"
+        self.speed = speed
+        self.timeout_s = timeout_s
+        self.run_id = uuid.uuid4().hex[:8]
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="replay")
+        self._session_tails: Dict[str, object] = {}
+        self._results: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def _send(self, record: Dict, previous_turn) -> None:
+        # Los turnos de una misma sesión se envían en orden, como en el tráfico original
+        if previous_turn is not None:
+            previous_turn.result()
+
+        query = record.get("query") or f"consulta {record['query_hash']}"
+        body = json.dumps({
+            "query": query,
+            "session_id": f"replay-{self.run_id}-{record['session']}",
+            "use_two_vectors": True
+        }).encode("utf-8")
+        request = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+
+        start = time.perf_counter()
+        status, trace = 0, {}
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout_s) as response:
+                response.read()
+                status = response.status
+                trace = json.loads(response.headers.get("X-Request-Trace") or "{}")
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except Exception as e:
+            print(f"⚠️ Error en la petición: {e}")
+
+        with self._lock:
+            self._results.append({
+                "latency_ms": (time.perf_counter() - start) * 1000,
+                "status": status,
+                "recorded_ms": record.get("ms"),
+                "intent": record.get("intent") or trace.get("intent"),
+                "trace": trace
+            })
+
+    def run(self, records: List[Dict]) -> List[Dict]:
+        if not records:
+            return []
+        first_ts = records[0]["ts"]
+        start = time.monotonic()
+
+        for i, record in enumerate(records, 1):
+            delay = (record["ts"] - first_ts) / self.speed - (time.monotonic() - start)
+            if delay > 0:
+                time.sleep(delay)
+            previous_turn = self._session_tails.get(record["session"])
+            self._session_tails[record["session"]] = self._executor.submit(self._send, record, previous_turn)
+            if i % 100 == 0:
+                print(f"▶️ {i}/{len(records)} peticiones enviadas")
+
+        self._executor.shutdown(wait=True)
+        return self._results
+
+
+def summarize(results: List[Dict], elapsed_s: float) -> Dict:
+    """Métricas agregadas de una reproducción."""
+    latencies = [r["latency_ms"] for r in results]
+    traces = [r["trace"] for r in results if r["trace"]]
+
+    counts: Dict[str, float] = {}
+    for trace in traces:
+        for name, value in trace.get("counts", {}).items():
+            counts[name] = counts.get(name, 0) + value
+
+    doc_hits, doc_misses = counts.get("doc_cache_hits", 0), counts.get("doc_cache_misses", 0)
+    by_intent: Dict[str, List[float]] = {}
+    for r in results:
+        by_intent.setdefault(r["intent"] or "desconocida", []).append(r["latency_ms"])
+
+    return {
+        "requests": len(results),
+        "errors": sum(1 for r in results if r["status"] != 200),
+        "elapsed_s": round(elapsed_s, 1),
+        "throughput_rps": round(len(results) / elapsed_s, 2) if elapsed_s else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 1),
+            "p95": round(percentile(latencies, 95), 1),
+            "p99": round(percentile(latencies, 99), 1),
+            "mean": round(statistics.mean(latencies), 1) if latencies else 0.0,
+        },
+        "latency_p95_by_intent": {intent: round(percentile(values, 95), 1) for intent, values in by_intent.items()},
+        "traced_requests": len(traces),
+        "counts_per_request": {
+            name: round(value / len(traces), 3) for name, value in sorted(counts.items()) if traces
+        },
+        "doc_cache_hit_rate": round(doc_hits / (doc_hits + doc_misses), 3) if doc_hits + doc_misses else None,
+        "canned_hit_rate": round(sum(1 for t in traces if t.get("canned_hit")) / len(traces), 3) if traces else None,
+        "degraded_rate": round(sum(1 for t in traces if t.get("degraded")) / len(traces), 3) if traces else None,
+    }
+
+
+def _flatten(summary: Dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in summary.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(baseline: Dict, candidate: Dict):
+    """Imprime las métricas de dos reproducciones lado a lado con la variación porcentual."""
+    base, new = _flatten(baseline["summary"]), _flatten(candidate["summary"])
+    print(f"{'métrica':<48}{'base':>12}{'nuevo':>12}{'Δ %':>10}")
+    for key in sorted(set(base) | set(new)):
+        before, after = base.get(key), new.get(key)
+        delta = ""
+        if before and after is not None:
+            delta = f"{(after - before) / before * 100:+.1f}"
+        print(f"{key:<48}{before if before is not None else '-':>12}{after if after is not None else '-':>12}{delta:>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reproducción de tráfico grabado de /chat")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Reproduce un log contra un backend")
+    run_parser.add_argument("--log", nargs="+", required=True, help="Logs JSONL grabados")
+    run_parser.add_argument("--target", default="http://localhost:8000")
+    run_parser.add_argument("--speed", type=float, default=1.0, help="Multiplicador de velocidad (1 = tiempo real)")
+    run_parser.add_argument("--concurrency", type=int, default=64)
+    run_parser.add_argument("--timeout", type=float, default=120.0)
+    run_parser.add_argument("--limit", type=int, help="Reproducir solo las primeras N peticiones")
+    run_parser.add_argument("--output", help="Guarda el resumen y los resultados en JSON")
+
+    compare_parser = subparsers.add_parser("compare", help="Compara dos reproducciones")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(args.candidate, encoding="utf-8") as f:
+            candidate = json.load(f)
+        compare(baseline, candidate)
+        return
+
+    records = load_log(args.log, args.limit)
+    sessions = len({r["session"] for r in records})
+    print(f"🔁 Reproduciendo {len(records)} peticiones de {sessions} sesiones a {args.speed}x contra {args.target}")
+
+    start = time.monotonic()
+    results = Replayer(args.target, args.speed, args.concurrency, args.timeout).run(records)
+    summary = summarize(results, time.monotonic() - start)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+    if summary["requests"] and not summary["traced_requests"]:
+        print("⚠️ Sin métricas internas: inicia el backend con TRAFFIC_EXPOSE_TRACE=true")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"summary": summary, "results": results}, f, ensure_ascii=False)
+        print(f"💾 Resultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+# backend/src/reranker.py
+
+"""
+Reordenamiento local (CPU) de candidatos de búsqueda.
+
+Permite sobre-recuperar N candidatos desde Azure AI Search y quedarse con los mejores
+sin depender del reranker semántico (tier pagado). Dos puntuadores disponibles:
+
+- Cross-encoder ONNX pequeño (si `onnxruntime` y `tokenizers` están instalados y se
+  configura RERANK_ONNX_MODEL_PATH con `model.onnx` y `tokenizer.json`)
+- Puntuador vectorizado con NumPy: BM25 sobre los candidatos + el puntaje híbrido de Azure
+  (`@search.score`, que ya incluye la similitud vectorial), o coseno exacto si se
+  recuperan los vectores de los candidatos (RERANK_FETCH_VECTORS)
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .answer_store import normalize_query
+
+try:
+    import onnxruntime
+    from tokenizers import Tokenizer
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+# Pesos del puntuador por características. Sin vectores de candidatos, el puntaje híbrido
+# de Azure ocupa el peso del coseno
+COSINE_WEIGHT = 0.6
+BM25_WEIGHT = 0.3
+SEARCH_SCORE_WEIGHT = 0.1
+# Prior de rango sumado al puntaje del cross-encoder
+PRIOR_WEIGHT = 0.1
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def bm25_scores(query: str, texts: List[str]) -> np.ndarray:
+    """BM25 de los términos de la consulta, con IDF calculado sobre el lote de candidatos."""
+    query_terms = list(dict.fromkeys(normalize_query(query).split()))
+    docs_terms = [normalize_query(text).split() for text in texts]
+    if not query_terms or not docs_terms:
+        return np.zeros(len(texts), dtype=np.float32)
+
+    term_index: Dict[str, int] = {term: j for j, term in enumerate(query_terms)}
+    tf = np.zeros((len(texts), len(query_terms)), dtype=np.float32)
+    for i, terms in enumerate(docs_terms):
+        for term in terms:
+            j = term_index.get(term)
+            if j is not None:
+                tf[i, j] += 1
+
+    lengths = np.array([len(terms) for terms in docs_terms], dtype=np.float32)
+    avg_length = max(float(lengths.mean()), 1.0)
+    df = (tf > 0).sum(axis=0)
+    idf = np.log(1 + (len(texts) - df + 0.5) / (df + 0.5))
+    denom = tf + BM25_K1 * (1 - BM25_B + BM25_B * lengths[:, None] / avg_length)
+    return ((tf * (BM25_K1 + 1) / denom) * idf).sum(axis=1)
+
+
+class ScoreCache:
+    """Caché LRU acotada de puntajes por (consulta normalizada, chunk_id)."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, str]) -> Optional[float]:
+        with self._lock:
+            score = self._items.get(key)
+            if score is not None:
+                self._items.move_to_end(key)
+            return score
+
+    def put(self, key: Tuple[str, str], score: float):
+        with self._lock:
+            self._items[key] = score
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+
+class OnnxCrossEncoder:
+    """Cross-encoder ONNX (p. ej. un MiniLM exportado) que puntúa pares (consulta, pasaje)."""
+
+    def __init__(self, model_dir: str, max_length: int = 256):
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, "model.onnx"),
+            providers=["CPUExecutionProvider"]
+        )
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def score(self, query: str, passages: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch([(query, passage) for passage in passages])
+        inputs = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+        }
+        if "token_type_ids" in self.input_names:
+            inputs["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        logits = self.session.run(None, inputs)[0]
+        return logits.reshape(len(passages), -1)[:, 0]
+
+
+class LocalReranker:
+    """
+    Reordena candidatos localmente.
+
+    El cross-encoder puntúa por lotes con presupuesto de latencia y caché por (consulta,
+    chunk_id); los candidatos que no alcanzan a puntuarse conservan el orden original de
+    Azure AI Search, a continuación de los ya puntuados. El puntuador NumPy es barato y sus
+    puntajes son relativos al lote (IDF y normalizaciones), así que puntúa todos los
+    candidatos en una pasada, sin presupuesto ni caché.
+    """
+
+    def __init__(self, budget_ms: float, batch_size: int, cache_size: int,
+                 onnx_model_path: Optional[str] = None):
+        self.budget_ms = budget_ms
+        self.batch_size = batch_size
+        self.cache = ScoreCache(cache_size)
+        self.cross_encoder = None
+
+        if onnx_model_path:
+            if not ONNX_AVAILABLE:
+                print("⚠️ onnxruntime/tokenizers no instalados. Usando puntuador BM25 + puntaje de Azure.")
+            else:
+                try:
+                    self.cross_encoder = OnnxCrossEncoder(onnx_model_path)
+                    print(f"✅ Cross-encoder ONNX cargado desde {onnx_model_path}")
+                except Exception as e:
+                    print(f"❌ Error al cargar cross-encoder ONNX: {e}. Usando puntuador BM25 + puntaje de Azure.")
+
+        self.scorer_name = "cross-encoder" if self.cross_encoder else "bm25+azure"
+
+    def rerank(self, query: str, query_vector: Optional[List[float]], documents: List[Document],
+               top_n: int, vectors: Optional[List[Optional[List[float]]]] = None) -> List[Document]:
+        """
+        Reordena los documentos candidatos y devuelve los `top_n` mejores.
+
+        Args:
+            query: Consulta usada para la búsqueda
+            query_vector: Embedding de la consulta (para la característica coseno)
+            documents: Candidatos en el orden devuelto por Azure AI Search
+            top_n: Número de documentos a devolver
+            vectors: Embeddings de los candidatos, alineados con `documents` (opcional)
+        """
+        if not documents:
+            return []
+
+        start = time.perf_counter()
+        n = len(documents)
+        cache_hits = 0
+        timed_out = False
+
+        if self.cross_encoder:
+            scores, cache_hits, timed_out = self._cross_encoder_scores(query, documents, start)
+            # Prior de rango: conserva parte de la señal de Azure (BM25 + vectores + RRF)
+            keys = [
+                score + PRIOR_WEIGHT * (1.0 - i / n) if score is not None else None
+                for i, score in enumerate(scores)
+            ]
+        else:
+            scores = [float(score) for score in self._feature_scores(query, query_vector, documents, vectors)]
+            keys = scores
+
+        scored = [i for i in range(n) if keys[i] is not None]
+        unscored = [i for i in range(n) if keys[i] is None]
+        ranked = sorted(scored, key=lambda i: keys[i], reverse=True) + unscored
+
+        reranked = []
+        for i in ranked[:top_n]:
+            doc = documents[i]
+            if scores[i] is not None:
+                doc.metadata["rerank_score"] = scores[i]
+                doc.metadata["score"] = scores[i]
+            reranked.append(doc)
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(
+            f"🔀 Rerank local ({self.scorer_name}): {len(scored)}/{n} candidatos puntuados, "
+            f"{cache_hits} desde caché, {elapsed_ms:.1f} ms"
+            + (" - presupuesto agotado" if timed_out else "")
+        )
+        return reranked
+
+    def _cross_encoder_scores(self, query: str, documents: List[Document],
+                              start: float) -> Tuple[List[Optional[float]], int, bool]:
+        """
+        Puntúa con el cross-encoder por lotes hasta agotar el presupuesto.
+
+        Returns:
+            Tupla (puntajes alineados con `documents`, None si no alcanzó a puntuarse;
+            aciertos de caché; si se agotó el presupuesto)
+        """
+        normalized_query = normalize_query(query)
+        scores: List[Optional[float]] = [None] * len(documents)
+
+        pending = []
+        for i, doc in enumerate(documents):
+            cached = self.cache.get((normalized_query, doc.metadata.get("chunk_id", "")))
+            if cached is not None:
+                scores[i] = cached
+            else:
+                pending.append(i)
+
+        cache_hits = len(documents) - len(pending)
+        for batch_start in range(0, len(pending), self.batch_size):
+            if (time.perf_counter() - start) * 1000 > self.budget_ms:
+                return scores, cache_hits, True
+            batch = pending[batch_start:batch_start + self.batch_size]
+            batch_scores = self.cross_encoder.score(query, [self._document_text(documents[i]) for i in batch])
+            for i, score in zip(batch, batch_scores):
+                scores[i] = float(score)
+                self.cache.put((normalized_query, documents[i].metadata.get("chunk_id", "")), scores[i])
+        return scores, cache_hits, False
+
+    def _feature_scores(self, query: str, query_vector: Optional[List[float]], documents: List[Document],
+                        vectors: Optional[List[Optional[List[float]]]]) -> np.ndarray:
+        """BM25 + coseno (con vectores) o + puntaje híbrido de Azure, normalizados sobre el lote."""
+        n = len(documents)
+        bm25 = bm25_scores(query, [self._document_text(doc) for doc in documents])
+        if bm25.max() > 0:
+            bm25 = bm25 / bm25.max()
+
+        # Puntaje híbrido de Azure (RRF de palabras clave + vectores); sin él, prior de rango
+        search = np.array([float(doc.metadata.get("search_score") or 0.0) for doc in documents], dtype=np.float32)
+        if search.max() > 0:
+            search = search / search.max()
+        else:
+            search = 1.0 - np.arange(n, dtype=np.float32) / n
+
+        if query_vector is None or not vectors or not all(v is not None for v in vectors):
+            return (COSINE_WEIGHT + SEARCH_SCORE_WEIGHT) * search + BM25_WEIGHT * bm25
+
+        doc_matrix = np.asarray(vectors, dtype=np.float32)
+        q = np.asarray(query_vector, dtype=np.float32)
+        norms = np.linalg.norm(doc_matrix, axis=1) * np.linalg.norm(q)
+        cosine = np.divide(doc_matrix @ q, norms, out=np.zeros(n, dtype=np.float32), where=norms > 0)
+        return COSINE_WEIGHT * cosine + BM25_WEIGHT * bm25 + SEARCH_SCORE_WEIGHT * search
+
+    @staticmethod
+    def _document_text(doc: Document) -> str:
+        return f"{doc.page_content} {doc.metadata.get('summary_match', '')}"
@@ -1,10 +1,44 @@
-from typing import List
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, wait
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from azure.search.documents import SearchClient
 from azure.search.documents.models import VectorizedQuery, QueryType
 from azure.core.credentials import AzureKeyCredential
 from langchain_core.documents import Document
 from .config import AZURE_SEARCH_ENDPOINT, AZURE_SEARCH_API_KEY, AZURE_SEARCH_INDEX_NAME
-from .utils import get_embedding 
+from .config import RERANK_MODE, RERANK_CANDIDATES, RERANK_BUDGET_MS, RERANK_BATCH_SIZE, RERANK_CACHE_SIZE
+from .config import RERANK_ONNX_MODEL_PATH, RERANK_FETCH_VECTORS
+from .config import MULTI_QUERY_BRANCH_TOP, MULTI_QUERY_BUDGET_MS, MULTI_QUERY_MAX_WORKERS, MULTI_QUERY_VARIANTS, RRF_K
+from .config import HOT_DOC_CACHE_ENABLED, HOT_DOC_CACHE_MAX_ENTRIES, SEARCH_INDEX_VERSION
+from .config import STANDIN_MODE, STANDIN_CORPUS_PATH
+from .config import LATENCY_WINDOW_SIZE, LATENCY_WINDOW_SECONDS, LATENCY_MIN_SAMPLES, LATENCY_BUDGET_PERCENTILE
+from .document_cache import DocumentCache
+from .latency_budget import LatencyBudgetPlanner, LatencyTracker
+from .reranker import LocalReranker
+from .serialization import dumps
+from . import traffic
+from .utils import get_embedding, get_embeddings
+
+def reciprocal_rank_fusion(ranked_lists: List[List[Document]], k: int = 60) -> List[Document]:
+    """
+    Fusiona varias listas ordenadas con Reciprocal Rank Fusion, deduplicando por chunk_id.
+    
+    El puntaje fusionado queda en metadata['rrf_score'].
+    """
+    fused_scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    
+    for ranked in ranked_lists:
+        for rank, doc in enumerate(ranked):
+            key = doc.metadata.get("chunk_id") or doc.page_content
+            fused_scores[key] = fused_scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+            documents.setdefault(key, doc)
+    
+    ordered_keys = sorted(fused_scores, key=fused_scores.get, reverse=True)
+    for key in ordered_keys:
+        documents[key].metadata["rrf_score"] = fused_scores[key]
+    return [documents[key] for key in ordered_keys]
 
 class AzureHybridSearchRetriever:
     """
@@ -14,98 +48,446 @@ class AzureHybridSearchRetriever:
     def __init__(self):
         self.select_fields = ["chunk_id", "numero_dictamen", "embedding_text", "url", "ai_summary"] 
         
+        # Campos específicos para listados de dictámenes
+        self.legal_list_fields = [
+            "chunk_id", "numero_dictamen", "fecha", "ano", "ai_summary", 
+            "fuentes_legales", "dictamenes_aplicados", "url",
+            "accion", "referencias", "descriptores", "destinatarios"
+        ]
+        
+        # Caché de documentos calientes: el ranking solo devuelve chunk_id y puntajes
+        self.document_cache = None
+        if HOT_DOC_CACHE_ENABLED:
+            self.document_cache = DocumentCache(
+                max_entries=HOT_DOC_CACHE_MAX_ENTRIES,
+                index_version=SEARCH_INDEX_VERSION or AZURE_SEARCH_INDEX_NAME or ""
+            )
+        
+        # Estadísticas de la última búsqueda, por hilo (ver `last_search_stats`)
+        self._stats = threading.local()
+        # Medir el tamaño del payload re-serializa los resultados: solo en evaluación
+        self.measure_payload = False
+        
+        # El SearchClient se crea en el primer uso (ver propiedad `search_client`)
+        self._search_client = None
+        self._search_client_lock = threading.Lock()
+        
+        # Reordenamiento local opcional (CPU), independiente del tier semántico
+        self.reranker = None
+        if RERANK_MODE in ("fallback", "always"):
+            self.reranker = LocalReranker(
+                budget_ms=RERANK_BUDGET_MS,
+                batch_size=RERANK_BATCH_SIZE,
+                cache_size=RERANK_CACHE_SIZE,
+                onnx_model_path=RERANK_ONNX_MODEL_PATH
+            )
+        
+        # Latencias observadas por perfil de búsqueda, para el presupuesto de latencia por petición
+        self.planner = LatencyBudgetPlanner(
+            LatencyTracker(LATENCY_WINDOW_SIZE, LATENCY_WINDOW_SECONDS, LATENCY_MIN_SAMPLES),
+            percentile=LATENCY_BUDGET_PERCENTILE
+        )
+        
+        # Pool para las ramas de la búsqueda multi-consulta de todas las peticiones del worker
+        self._executor = ThreadPoolExecutor(max_workers=MULTI_QUERY_MAX_WORKERS, thread_name_prefix="search")
+
+    @property
+    def search_client(self) -> Optional[SearchClient]:
+        """Cliente de Azure AI Search, creado de forma diferida y compartido entre hilos."""
+        if self._search_client is None:
+            with self._search_client_lock:
+                if self._search_client is None:
+                    if STANDIN_MODE:
+                        from .standins import StandInSearchClient
+                        self._search_client = StandInSearchClient(STANDIN_CORPUS_PATH)
+                        return self._search_client
+                    try:
+                        self._search_client = SearchClient(
+                            endpoint=AZURE_SEARCH_ENDPOINT,
+                            index_name=AZURE_SEARCH_INDEX_NAME,
+                            credential=AzureKeyCredential(AZURE_SEARCH_API_KEY)
+                        )
+                        print("✅ SearchClient de Azure AI Search inicializado correctamente.")
+                    except Exception as e:
+                        print(f"❌ Error al inicializar SearchClient: {e}")
+                        self._search_client = False
+        return self._search_client or None
+
+    @property
+    def last_search_stats(self) -> Dict:
+        """
+        Latencia y uso del reranker semántico de la última búsqueda del hilo (más el tamaño
+        del payload si `measure_payload` está activo).
+        """
+        return getattr(self._stats, "last", {})
+
+    def warmup(self):
+        """Abre la conexión con Azure AI Search con una consulta mínima."""
+        if self.search_client:
+            list(self.search_client.search(search_text="*", select=["chunk_id"], top=1))
+
+    def cache_recent_documents(self, since: str, limit: int) -> List[Dict]:
+        """
+        Carga (o refresca) en la caché de documentos los dictámenes con fecha desde `since`
+        (YYYY-MM-DD), con los campos del chat y de los listados.
+
+        Returns:
+            Los documentos cargados, más recientes primero
+        """
+        if not self.document_cache or not self.search_client:
+            return []
+
+        fields = list(dict.fromkeys(self.select_fields + self.legal_list_fields))
+        traffic.count("search_calls")
+        results = self.search_client.search(
+            search_text="*",
+            select=fields,
+            filter=f"fecha ge {since}T00:00:00Z",
+            order_by=["fecha desc"],
+            top=limit
+        )
+        documents = [dict(doc) for doc in results]
+        self.document_cache.put_many(documents)
+        return documents
+
+    def close(self):
+        """Libera el pool de búsquedas paralelas y la conexión HTTP del SearchClient."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._search_client:
+            self._search_client.close()
+            self._search_client = None
+
+    def _search_with_fallback(self, query_text: str, vector_queries: List, select: List[str], top: int,
+                              fallback_top: Optional[int] = None, use_semantic: bool = True,
+                              **kwargs) -> Tuple[List[Dict], bool]:
+        """
+        Ejecuta la búsqueda con degradación: semántica -> híbrida simple -> solo texto.
+        
+        Los resultados se materializan dentro de cada intento, ya que el SDK ejecuta la
+        petición de forma diferida al iterar.
+        
+        Args:
+            fallback_top: Número de resultados a pedir cuando no hay reranker semántico
+            use_semantic: Si es False, se omite el intento con reranker semántico
+            kwargs: Parámetros adicionales para `search` (order_by, filter, ...)
+            
+        Returns:
+            Tupla (resultados, si se usó el reranker semántico)
+        """
+        fallback_top = fallback_top or top
+        
+        if use_semantic:
+            traffic.count("search_calls")
+            try:
+                results = self.search_client.search(
+                    search_text=query_text,
+                    vector_queries=vector_queries,
+                    query_type=QueryType.SEMANTIC, 
+                    semantic_configuration_name="my-semantic-config",
+                    select=select,
+                    top=top,
+                    **kwargs
+                )
+                return [dict(result) for result in results], True
+            except Exception:
+                print("⚠️ Búsqueda semántica no disponible. Usando búsqueda híbrida simple.")
+        
+        traffic.count("search_calls")
         try:
-            self.search_client = SearchClient(
-                endpoint=AZURE_SEARCH_ENDPOINT,
-                index_name=AZURE_SEARCH_INDEX_NAME,
-                credential=AzureKeyCredential(AZURE_SEARCH_API_KEY)
+            results = self.search_client.search(
+                search_text=query_text,
+                vector_queries=vector_queries,
+                select=select,
+                top=fallback_top,
+                **kwargs
             )
-            print("✅ SearchClient de Azure AI Search inicializado correctamente.")
+            return [dict(result) for result in results], False
         except Exception as e:
-            print(f"❌ Error al inicializar SearchClient: {e}")
-            self.search_client = None
+            print(f"Error en la búsqueda de Azure AI Search: {e}")
+        
+        # Intentar búsqueda solo por texto como último recurso
+        try:
+            print("⚠️ Intentando búsqueda solo por texto...")
+            traffic.count("search_calls")
+            results = self.search_client.search(
+                search_text=query_text,
+                select=select,
+                top=fallback_top,
+                **kwargs
+            )
+            return [dict(result) for result in results], False
+        except Exception as e:
+            print(f"❌ Error crítico en búsqueda: {e}")
+            return [], False
+
+    def _ranking_select(self, fields: List[str]) -> List[str]:
+        """Campos a pedir en la llamada de ranking: solo chunk_id si la caché de documentos está activa."""
+        return ["chunk_id"] if self.document_cache else fields
 
-    def run_hybrid_search(self, query_text: str, use_two_vectors: bool = False) -> List[Document]:
+    def _hydrate(self, results: List[Dict], fields: List[str]) -> List[Dict]:
+        """
+        Completa los resultados de ranking con los campos desde la caché de documentos.
+        
+        Los chunk_id que no están en caché se buscan en una sola consulta masiva
+        (filtro `search.in`) y se agregan a la caché.
+        """
+        if not self.document_cache or not results:
+            return results
+        
+        chunk_ids = [doc["chunk_id"] for doc in results if doc.get("chunk_id")]
+        cached, missing = self.document_cache.get_many(chunk_ids, fields)
+        traffic.count("doc_cache_hits", len(chunk_ids) - len(missing))
+        traffic.count("doc_cache_misses", len(missing))
+        
+        if missing:
+            traffic.count("search_calls")
+            id_list = ",".join(chunk_id.replace("'", "''") for chunk_id in missing)
+            try:
+                fetched = self.search_client.search(
+                    search_text="*",
+                    filter=f"search.in(chunk_id, '{id_list}', ',')",
+                    select=fields,
+                    top=len(missing)
+                )
+                fetched = [dict(doc) for doc in fetched]
+                self.document_cache.put_many(fetched)
+                cached.update({doc["chunk_id"]: doc for doc in fetched})
+            except Exception as e:
+                print(f"❌ Error al obtener documentos faltantes ({len(missing)}): {e}")
+        
+        print(f"🗃️ Caché de documentos: {len(chunk_ids) - len(missing)} aciertos, {len(missing)} faltantes")
+        
+        # Los puntajes de la llamada de ranking tienen prioridad sobre los campos cacheados
+        return [{**cached.get(doc.get("chunk_id"), {}), **doc} for doc in results]
+
+    def run_hybrid_search(self, query_text: str, use_two_vectors: bool = False, top: int = 5,
+                          query_embedding: Optional[List[float]] = None, k_nearest_neighbors: int = 50,
+                          summary_k_nearest_neighbors: int = 25, exhaustive: bool = False,
+                          use_semantic: bool = True, latency_budget_ms: Optional[float] = None) -> List[Document]:
         """
         Ejecuta la búsqueda híbrida con RRF, con opción de usar uno o dos vectores.
+        
+        Si el reordenamiento local está activo, se sobre-recuperan RERANK_CANDIDATES
+        candidatos y se reordenan en CPU para quedarse con los `top` mejores.
+        Las estadísticas de la última búsqueda del hilo quedan en `last_search_stats`.
+        
+        Args:
+            query_embedding: Embedding ya calculado (si no se entrega, se calcula de `query_text`)
+            k_nearest_neighbors: Vecinos a recuperar del vector principal ('embedding')
+            summary_k_nearest_neighbors: Vecinos a recuperar del vector de resumen
+            exhaustive: Búsqueda vectorial exacta (KNN) en vez de aproximada (HNSW)
+            use_semantic: Intentar el reranker semántico de Azure AI Search
+            latency_budget_ms: Presupuesto de la petición; si se entrega, el planificador elige
+                k_nearest_neighbors, el vector de resumen y el reranker semántico según las
+                latencias recientes (reemplaza esos argumentos; el plan queda en las estadísticas)
         """
         if not self.search_client:
             return [Document(page_content="Error: Cliente de búsqueda no disponible.")]
 
-        query_embedding = get_embedding(query_text)
+        start = time.perf_counter()
+        if query_embedding is None:
+            query_embedding = get_embedding(query_text)
         if not query_embedding: return []
+        
+        plan = None
+        if latency_budget_ms:
+            remaining_ms = latency_budget_ms - (time.perf_counter() - start) * 1000
+            plan = self.planner.plan(remaining_ms, query_text, use_two_vectors=use_two_vectors)
+            k_nearest_neighbors = plan["k_nearest_neighbors"]
+            use_two_vectors = plan["use_two_vectors"]
+            use_semantic = plan["use_semantic"]
+            estimated = f"{plan['estimated_ms']:.0f} ms" if plan["estimated_ms"] is not None else "sin datos"
+            print(f"⏱️ Plan de búsqueda {plan['profile']} ({plan['query_class']}) para {remaining_ms:.0f} ms "
+                  f"de presupuesto; p95 estimado: {estimated}{' [degradado]' if plan['degraded'] else ''}")
             
         vector_queries = []
         
         # 1. Vector principal: Búsqueda en el chunk de contenido (Campo 'embedding')
         vector_queries.append(VectorizedQuery(
             vector=query_embedding, 
-            k_nearest_neighbors=50, 
+            k_nearest_neighbors=k_nearest_neighbors, 
             fields="embedding", 
-            exhaustive=False
+            exhaustive=exhaustive
         ))
 
         # 2. Segundo Vector (Opcional): Búsqueda en el resumen (Campo 'summary_embedding')
         if use_two_vectors:
             vector_queries.append(VectorizedQuery( 
                 vector=query_embedding, 
-                k_nearest_neighbors=25, 
+                k_nearest_neighbors=summary_k_nearest_neighbors, 
                 fields="summary_embedding", 
-                exhaustive=False
+                exhaustive=exhaustive
             ))
 
+        # Profundidad de candidatos: con rerank local se sobre-recupera
+        candidate_top = max(top, RERANK_CANDIDATES) if self.reranker else top
+        select = self._ranking_select(self.select_fields)
+        if self.reranker and RERANK_FETCH_VECTORS:
+            select = select + ["embedding"]
+
         # Ejecución Híbrida: Palabras clave + Vectores + RRF
+        search_start = time.perf_counter()
+        results, semantic_used = self._search_with_fallback(
+            query_text,
+            vector_queries,
+            select=select,
+            top=candidate_top if RERANK_MODE == "always" else top,
+            fallback_top=candidate_top,
+            use_semantic=use_semantic
+        )
+        stats = {
+            "search_ms": (time.perf_counter() - search_start) * 1000,
+            "results": len(results),
+            "semantic_used": semantic_used
+        }
+        if self.measure_payload:
+            stats["payload_bytes"] = len(dumps(results))
+
+        results = self._hydrate(results, self.select_fields)
+        retrieved_documents = [self._to_document(doc) for doc in results]
+        
+        if self.reranker and (RERANK_MODE == "always" or not semantic_used):
+            vectors = [doc.get("embedding") for doc in results] if RERANK_FETCH_VECTORS else None
+            retrieved_documents = self.reranker.rerank(query_text, query_embedding, retrieved_documents, top, vectors=vectors)
+        
+        # La latencia del perfil incluye hidratación y rerank local (lo que paga la petición)
+        stats["total_ms"] = (time.perf_counter() - search_start) * 1000
+        if not exhaustive:
+            self.planner.observe(
+                {"k_nearest_neighbors": k_nearest_neighbors, "use_two_vectors": use_two_vectors,
+                 "use_semantic": use_semantic},
+                stats["total_ms"]
+            )
+        if plan:
+            stats["plan"] = plan
+        self._stats.last = stats
+        traffic.annotate(
+            search_profile=plan["profile"] if plan else None,
+            semantic_used=semantic_used,
+            search_payload_bytes=stats.get("payload_bytes")
+        )
+            
+        return retrieved_documents[:top]
+
+    def run_multi_query_search(self, query_text: str, expand: Callable[[], Tuple[List[str], Optional[str]]],
+                               use_two_vectors: bool = False, top: int = 5,
+                               latency_budget_ms: Optional[float] = None,
+                               max_extra_branches: int = MULTI_QUERY_VARIANTS) -> List[Document]:
+        """
+        Búsqueda multi-consulta / HyDE con ejecución paralela y fusión RRF en el cliente.
+        
+        La rama de la consulta original se lanza de inmediato, en paralelo con `expand` (la
+        llamada al LLM que genera las variantes o la respuesta hipotética). Cada rama extra es
+        un par (texto para palabras clave, texto a vectorizar): cada variante y la respuesta
+        hipotética (HyDE), que se vectoriza junto con el texto de la consulta original.
+        La expansión y las ramas extra deben terminar dentro de MULTI_QUERY_BUDGET_MS desde el
+        inicio o se descartan; la rama original siempre se espera, y si falla se repite la
+        búsqueda simple, por lo que el contexto nunca queda vacío por el presupuesto.
+        
+        Las tareas descartadas que ya están en ejecución no se interrumpen (ni el SDK ni el
+        LLM se pueden cancelar): terminan en su hilo y su resultado se ignora.
+        
+        Las ramas corren en paralelo contra el mismo servicio de búsqueda, así que el
+        presupuesto de la petición se reparte entre ellas: la rama original recibe su parte
+        suponiendo `max_extra_branches` ramas extra, y las ramas extra se reparten lo que
+        queda del presupuesto.
+        
+        Args:
+            query_text: Consulta principal (ya reescrita)
+            expand: Función que devuelve (variantes, respuesta hipotética o None)
+            latency_budget_ms: Presupuesto de la petición (ver `run_hybrid_search`)
+            max_extra_branches: Máximo de ramas extra que puede devolver `expand`
+        """
+        if not self.search_client:
+            return [Document(page_content="Error: Cliente de búsqueda no disponible.")]
+
+        start = time.perf_counter()
+        deadline = start + MULTI_QUERY_BUDGET_MS / 1000
+        
+        def branch_budget(concurrent_branches: int) -> Optional[float]:
+            """Parte de cada rama en lo que queda del presupuesto de la petición."""
+            if not latency_budget_ms:
+                return None
+            remaining_ms = latency_budget_ms - (time.perf_counter() - start) * 1000
+            # Nunca 0: un presupuesto agotado elige el plan más barato, no los parámetros fijos
+            return max(1.0, remaining_ms / concurrent_branches)
+        
+        primary = self._executor.submit(
+            traffic.bind(self.run_hybrid_search),
+            query_text,
+            use_two_vectors,
+            MULTI_QUERY_BRANCH_TOP,
+            latency_budget_ms=branch_budget(1 + max_extra_branches)
+        )
+        expansion = self._executor.submit(traffic.bind(expand))
+
+        branches = []
         try:
-            # Primero intentar búsqueda semántica si está configurada
-            try:
-                results = self.search_client.search(
-                    search_text=query_text,
-                    vector_queries=vector_queries,
-                    query_type=QueryType.SEMANTIC, 
-                    semantic_configuration_name="my-semantic-config",
-                    select=self.select_fields,
-                    top=5
-                )
-            except:
-                # Si falla la búsqueda semántica, usar búsqueda simple
-                print("⚠️ Búsqueda semántica no disponible. Usando búsqueda híbrida simple.")
-                results = self.search_client.search(
-                    search_text=query_text,
-                    vector_queries=vector_queries,
-                    select=self.select_fields,
-                    top=5
-                )
+            variants, hypothetical_answer = expansion.result(timeout=max(0.0, deadline - time.perf_counter()))
+            branches += [(variant, variant) for variant in variants if variant and variant != query_text]
+            if hypothetical_answer:
+                branches.append((query_text, hypothetical_answer))
+        except FuturesTimeoutError:
+            print(f"⏱️ La expansión de la consulta supera {MULTI_QUERY_BUDGET_MS:.0f} ms: solo la consulta original")
         except Exception as e:
-            print(f"Error en la búsqueda de Azure AI Search: {e}")
-            # Intentar búsqueda solo por texto como último recurso
+            print(f"⚠️ Error en la expansión de la consulta: {e}")
+
+        futures = {}
+        embeddings = get_embeddings([embed_text for _, embed_text in branches]) if branches else None
+        if embeddings:
+            # La rama original sigue en curso y cuenta en el reparto
+            extra_budget_ms = branch_budget(1 + len(branches))
+            futures = {
+                self._executor.submit(
+                    traffic.bind(self.run_hybrid_search),
+                    search_text,
+                    use_two_vectors,
+                    MULTI_QUERY_BRANCH_TOP,
+                    embedding,
+                    latency_budget_ms=extra_budget_ms
+                ): search_text
+                for (search_text, _), embedding in zip(branches, embeddings)
+            }
+        done, not_done = wait(futures, timeout=max(0.0, deadline - time.perf_counter()))
+        
+        for future in not_done:
+            future.cancel()
+        if not_done:
+            print(f"⏱️ {len(not_done)}/{len(futures)} ramas descartadas por superar {MULTI_QUERY_BUDGET_MS:.0f} ms")
+
+        ranked_lists = []
+        for future, search_text in [(primary, query_text)] + [(future, futures[future]) for future in done]:
             try:
-                print("⚠️ Intentando búsqueda solo por texto...")
-                results = self.search_client.search(
-                    search_text=query_text,
-                    select=self.select_fields,
-                    top=5
-                )
-            except Exception as e2:
-                print(f"❌ Error crítico en búsqueda: {e2}")
-                return []
+                ranked_lists.append(future.result())
+            except Exception as e:
+                print(f"⚠️ Error en rama de búsqueda '{search_text[:40]}': {e}")
 
-        retrieved_documents = []
-        for result in results:
-            doc = dict(result)
-            score = doc.get('@search.reranker_score', 0.0) 
-            
-            lc_doc = Document(
-                page_content=doc.get("embedding_text", "Contenido no disponible"),
-                metadata={
-                    "source": doc.get("numero_dictamen", "N/A"),
-                    "url": doc.get("url", ""),
-                    "score": score,
-                    "summary_match": doc.get("ai_summary", "")
-                }
-            )
-            retrieved_documents.append(lc_doc)
-            
-        return retrieved_documents
+        if not ranked_lists:
+            print("⚠️ Ninguna rama de búsqueda respondió. Usando búsqueda simple.")
+            return self.run_hybrid_search(query_text, use_two_vectors=use_two_vectors, top=top,
+                                          latency_budget_ms=branch_budget(1))
+
+        fused = reciprocal_rank_fusion(ranked_lists, k=RRF_K)[:top]
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"🔀 Multi-consulta: {len(ranked_lists)} ramas fusionadas con RRF en {elapsed_ms:.0f} ms -> {len(fused)} documentos")
+        return fused
+
+    @staticmethod
+    def _to_document(doc: Dict) -> Document:
+        """Convierte un resultado de Azure AI Search en un Document de LangChain."""
+        score = doc.get('@search.reranker_score', 0.0) 
+        
+        return Document(
+            page_content=doc.get("embedding_text", "Contenido no disponible"),
+            metadata={
+                "chunk_id": doc.get("chunk_id", ""),
+                "source": doc.get("numero_dictamen", "N/A"),
+                "url": doc.get("url", ""),
+                "score": score,
+                "search_score": doc.get("@search.score", 0.0),
+                "summary_match": doc.get("ai_summary", "")
+            }
+        )
 
     def run_legal_list_search(self, query_text: str, limit: int = 3) -> List[Document]:
         """
@@ -115,13 +497,6 @@ class AzureHybridSearchRetriever:
         if not self.search_client:
             return [Document(page_content="Error: Cliente de búsqueda no disponible.")]
 
-        # Campos específicos para listados de dictámenes
-        select_fields = [
-            "numero_dictamen", "fecha", "ano", "ai_summary", 
-            "fuentes_legales", "dictamenes_aplicados", "url",
-            "accion", "referencias", "descriptores", "destinatarios"
-        ]
-        
         query_embedding = get_embedding(query_text)
         if not query_embedding:
             return []
@@ -135,40 +510,18 @@ class AzureHybridSearchRetriever:
             )
         ]
 
-        try:
-            # Búsqueda híbrida con filtros específicos para dictámenes
-            results = self.search_client.search(
-                search_text=query_text,
-                vector_queries=vector_queries,
-                query_type=QueryType.SEMANTIC,
-                semantic_configuration_name="my-semantic-config",
-                select=select_fields,
-                top=limit,
-                order_by=["fecha desc"]  # Ordenar por fecha descendente (más recientes primero)
-            )
-        except:
-            # Fallback a búsqueda simple
-            try:
-                results = self.search_client.search(
-                    search_text=query_text,
-                    vector_queries=vector_queries,
-                    select=select_fields,
-                    top=limit,
-                    order_by=["fecha desc"]
-                )
-            except:
-                # Último recurso: búsqueda solo por texto
-                results = self.search_client.search(
-                    search_text=query_text,
-                    select=select_fields,
-                    top=limit,
-                    order_by=["fecha desc"]
-                )
+        # Búsqueda híbrida ordenada por fecha descendente (más recientes primero)
+        results, _ = self._search_with_fallback(
+            query_text,
+            vector_queries,
+            select=self._ranking_select(self.legal_list_fields),
+            top=limit,
+            order_by=["fecha desc"]
+        )
+        results = self._hydrate(results, self.legal_list_fields)
 
         retrieved_documents = []
-        for result in results:
-            doc = dict(result)
-            
+        for doc in results:
             # Crear documento con metadata estructurada para tablas
             lc_doc = Document(
                 page_content=doc.get("ai_summary", "Resumen no disponible"),
@@ -190,3 +543,44 @@ class AzureHybridSearchRetriever:
             retrieved_documents.append(lc_doc)
             
         return retrieved_documents
+
+    def iter_legal_list(self, query_text: str, filter_expression: Optional[str] = None,
+                        search_mode: str = "any", max_results: int = 100000,
+                        progress=None) -> Iterator[Dict]:
+        """
+        Recorre todos los dictámenes que coinciden con la consulta, página a página.
+        
+        A diferencia de `run_legal_list_search`, no se limita a unos pocos resultados: usa
+        búsqueda por palabras clave (los vectores solo devuelven k vecinos), ordenada por fecha,
+        y sigue la continuación del SDK (páginas de hasta 1000), sin cargar todo en memoria.
+        
+        Args:
+            query_text: Términos de búsqueda ("*" para todos los que cumplen el filtro)
+            filter_expression: Filtro OData opcional (p. ej. "fecha ge 2020-01-01T00:00:00Z")
+            search_mode: "any" (algún término) o "all" (todos, para identificadores exactos)
+            max_results: Número máximo de resultados a recorrer
+            progress: Callback opcional que recibe el total estimado de resultados
+        """
+        if not self.search_client:
+            raise RuntimeError("Cliente de búsqueda no disponible.")
+        
+        results = self.search_client.search(
+            search_text=query_text,
+            search_mode=search_mode,
+            select=self.legal_list_fields,
+            filter=filter_expression,
+            order_by=["fecha desc"],
+            include_total_count=True,
+            top=max_results
+        )
+        
+        # El total viene en la respuesta de la primera página del mismo iterador
+        # (results.get_count() abriría otro iterador y repetiría la primera llamada)
+        pages = results.by_page()
+        for i, page in enumerate(pages):
+            if i == 0 and progress:
+                # Los paginadores sin total (p. ej. sustitutos) no deben impedir la exportación
+                get_count = getattr(pages, "get_count", None)
+                progress(get_count() if get_count else None)
+            for doc in page:
+                yield dict(doc)
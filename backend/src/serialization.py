@@ -0,0 +1,184 @@
+# backend/src/serialization.py
+
+"""
+Serialización JSON rápida y compresión negociada de respuestas.
+
+- `dumps`/`loads` usan orjson si está instalado (con fallback a `json` compacto, UTF-8)
+- `install(app)` registra el proveedor JSON de Quart (afecta a `jsonify`) y un hook que
+  comprime con brotli o gzip las respuestas que superan COMPRESSION_MIN_BYTES
+- `compress_stream` comprime respuestas en streaming (JSONL, CSV) bloque a bloque
+"""
+
+import gzip
+import json
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, AsyncIterator, Optional
+from uuid import UUID
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+from .config import COMPRESSION_MIN_BYTES, COMPRESSION_LEVEL
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+def _default(obj: Any):
+    """
+    Tipos no nativos de JSON.
+
+    Raises:
+        TypeError: tipo no soportado (mejor fallar que serializar su repr en silencio)
+    """
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, UUID):
+        return str(obj)
+    raise TypeError(f"Tipo no serializable a JSON: {type(obj).__name__}")
+
+
+def dumps(obj: Any) -> bytes:
+    """Serializa a JSON UTF-8 compacto."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data):
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Elige 'br' o 'gzip' según el encabezado Accept-Encoding del cliente."""
+    if not accept_encoding:
+        return None
+    accepted = set()
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().lower().partition(";")
+        quality = params.strip()[2:] if params.strip().startswith("q=") else "1"
+        try:
+            if float(quality) > 0:
+                accepted.add(token.strip())
+        except ValueError:
+            continue
+    if BROTLI_AVAILABLE and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=COMPRESSION_LEVEL)
+    return gzip.compress(data, compresslevel=COMPRESSION_LEVEL)
+
+
+class StreamCompressor:
+    """Compresor incremental que emite un bloque válido por cada fragmento (flush)."""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=COMPRESSION_LEVEL)
+        else:
+            self._compressor = zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(chunk) + self._compressor.flush()
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+async def compress_stream(chunks: AsyncIterator[bytes], encoding: Optional[str]) -> AsyncIterator[bytes]:
+    """Comprime un stream asíncrono de bytes (sin comprimir si `encoding` es None)."""
+    if not encoding:
+        async for chunk in chunks:
+            yield chunk
+        return
+
+    compressor = StreamCompressor(encoding)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.finish()
+
+
+def streaming_response(app, request, chunks: AsyncIterator[bytes], mimetype: str, headers: Optional[dict] = None):
+    """Crea una respuesta en streaming con compresión negociada."""
+    encoding = negotiate_encoding(request.headers.get("Accept-Encoding"))
+    response = app.response_class(compress_stream(chunks, encoding), mimetype=mimetype, headers=headers or {})
+    response.timeout = None
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+        response.headers["Vary"] = "Accept-Encoding"
+    return response
+
+
+def install(app):
+    """Registra el proveedor JSON rápido y la compresión de respuestas en la app Quart."""
+    from quart import request
+    from quart.json.provider import DefaultJSONProvider
+    from quart.wrappers.response import DataBody
+
+    class FastJSONProvider(DefaultJSONProvider):
+        def dumps(self, obj, **kwargs) -> str:
+            return dumps(obj).decode("utf-8")
+
+        def loads(self, s, **kwargs):
+            return loads(s)
+
+        def response(self, *args, **kwargs):
+            if args and kwargs:
+                raise TypeError("jsonify() recibe argumentos posicionales o nombrados, no ambos")
+            obj = args[0] if len(args) == 1 else (args or kwargs)
+            return self._app.response_class(dumps(obj), mimetype=self.mimetype)
+
+    app.json = FastJSONProvider(app)
+
+    @app.after_request
+    async def compress_response(response):
+        # Las respuestas en streaming se comprimen con `streaming_response`
+        if not isinstance(response.response, DataBody) or "Content-Encoding" in response.headers:
+            return response
+        if not (response.mimetype or "").startswith(COMPRESSIBLE_TYPES):
+            return response
+
+        data = await response.get_data()
+        if len(data) < COMPRESSION_MIN_BYTES:
+            return response
+
+        encoding = negotiate_encoding(request.headers.get("Accept-Encoding"))
+        if not encoding:
+            return response
+
+        response.set_data(compress(data, encoding))
+        response.headers["Content-Encoding"] = encoding
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+    print(f"✅ Serializador JSON: {'orjson' if ORJSON_AVAILABLE else 'json'}; "
+          f"compresión: {'br, gzip' if BROTLI_AVAILABLE else 'gzip'} desde {COMPRESSION_MIN_BYTES} bytes")
@@ -0,0 +1,197 @@
+# backend/src/standins.py
+
+"""
+Sustitutos locales de Azure AI Search, Azure OpenAI (chat) y embeddings (STANDIN_MODE).
+
+Permiten levantar el backend sin servicios externos para reproducir tráfico grabado
+(`python -m src.replay`) y comparar builds: el código propio (clasificación, cachés,
+planificador, reranker, hidratación, pool de LLM) corre igual, y los servicios externos se
+reemplazan en el borde del SDK por implementaciones deterministas con latencia simulada.
+
+- Búsqueda: BM25 sobre un corpus JSONL con los campos del índice (STANDIN_CORPUS_PATH)
+- Chat: reconoce el prompt por su mensaje de sistema (clasificación, reescritura,
+  variantes) y simula el resto con una latencia proporcional a los tokens
+- Embeddings: vectores deterministas a partir del hash del texto
+"""
+
+import hashlib
+import json
+import math
+import re
+import time
+from typing import Dict, List, Optional
+
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from .config import STANDIN_LATENCY_SCALE
+
+# Latencias simuladas (ms), escaladas por STANDIN_LATENCY_SCALE
+SEARCH_BASE_MS = 60
+SEARCH_PER_VECTOR_MS = 15
+SEARCH_SEMANTIC_MS = 80
+EMBEDDING_BASE_MS = 25
+CHAT_BASE_MS = 300
+CHAT_PER_COMPLETION_TOKEN_MS = 12
+
+EMBEDDING_DIMENSIONS = 64
+CHARS_PER_TOKEN = 4
+ANSWER_TOKENS = 250
+
+SEARCH_IN_FILTER = re.compile(r"search\.in\(chunk_id, '(.*)', ','\)")
+
+
+def _sleep(ms: float):
+    time.sleep(ms * STANDIN_LATENCY_SCALE / 1000)
+
+
+class StandInPages:
+    """Iterador de páginas con el total, como el que devuelve SearchItemPaged.by_page()."""
+
+    def __init__(self, results: List[Dict], total: int, page_size: int = 1000):
+        self._pages = (iter(results[offset:offset + page_size]) for offset in range(0, len(results), page_size))
+        self._total = total
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._pages)
+
+    def get_count(self) -> int:
+        return self._total
+
+
+class StandInResults(list):
+    """Resultados con la interfaz de paginación de SearchItemPaged usada por iter_legal_list."""
+
+    def __init__(self, results: List[Dict], total: int):
+        super().__init__(results)
+        self._total = total
+
+    def by_page(self) -> StandInPages:
+        return StandInPages(list(self), self._total)
+
+    def get_count(self) -> int:
+        return self._total
+
+
+class StandInSearchClient:
+    """Sustituto de SearchClient: BM25 sobre un corpus JSONL en memoria."""
+
+    def __init__(self, corpus_path: str):
+        from .reranker import bm25_scores
+
+        self._bm25 = bm25_scores
+        with open(corpus_path, encoding="utf-8") as f:
+            self.documents = [json.loads(line) for line in f if line.strip()]
+        self._texts = [f"{doc.get('embedding_text', '')} {doc.get('ai_summary', '')}" for doc in self.documents]
+        print(f"🧪 Búsqueda simulada: {len(self.documents)} documentos desde {corpus_path}")
+
+    def search(self, search_text: Optional[str] = None, select: Optional[List[str]] = None, top: int = 50,
+               filter: Optional[str] = None, order_by: Optional[List[str]] = None, query_type=None,
+               vector_queries: Optional[List] = None, **kwargs) -> StandInResults:
+        _sleep(SEARCH_BASE_MS + SEARCH_PER_VECTOR_MS * len(vector_queries or [])
+               + (SEARCH_SEMANTIC_MS if query_type else 0))
+
+        indices = list(range(len(self.documents)))
+        match = SEARCH_IN_FILTER.fullmatch(filter or "")
+        if match:
+            wanted = set(match.group(1).split(","))
+            indices = [i for i in indices if self.documents[i].get("chunk_id") in wanted]
+
+        scores = [0.0] * len(self.documents)
+        if search_text and search_text != "*":
+            all_scores = self._bm25(search_text, [self._texts[i] for i in indices])
+            for i, score in zip(indices, all_scores):
+                scores[i] = float(score)
+            indices = sorted(indices, key=lambda i: scores[i], reverse=True)
+
+        if order_by and order_by[0].startswith("fecha"):
+            indices = sorted(indices, key=lambda i: self.documents[i].get("fecha") or "",
+                             reverse=order_by[0].endswith("desc"))
+
+        results = []
+        for i in indices[:top]:
+            doc = self.documents[i]
+            result = {field: doc.get(field) for field in select} if select else dict(doc)
+            result["@search.score"] = scores[i]
+            if query_type:
+                result["@search.reranker_score"] = min(4.0, scores[i])
+            results.append(result)
+        return StandInResults(results, len(indices))
+
+    def close(self):
+        pass
+
+
+class StandInEmbeddings:
+    """Sustituto de AzureOpenAIEmbeddings con vectores deterministas."""
+
+    @staticmethod
+    def _vector(text: str) -> List[float]:
+        digest = hashlib.sha256(text.lower().encode("utf-8")).digest()
+        raw = [(digest[i % len(digest)] - 128) / 128 for i in range(EMBEDDING_DIMENSIONS)]
+        norm = math.sqrt(sum(value * value for value in raw)) or 1.0
+        return [value / norm for value in raw]
+
+    def embed_query(self, text: str) -> List[float]:
+        _sleep(EMBEDDING_BASE_MS)
+        return self._vector(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        _sleep(EMBEDDING_BASE_MS)
+        return [self._vector(text) for text in texts]
+
+
+class StandInChatModel:
+    """Sustituto de AzureChatOpenAI con respuestas deterministas y latencia simulada."""
+
+    def __init__(self, role: str):
+        from . import prompts
+
+        self.role = role
+        self._prompts = prompts
+
+    def _classify(self, query: str) -> str:
+        from .rag_service import LEGAL_LIST_INDICATORS
+
+        query_lower = query.lower()
+        if len(query_lower) < 30 and any(word in query_lower for word in ("hola", "gracias", "chao", "adiós")):
+            return "CONVERSACIONAL"
+        if query_lower.startswith(("qué es", "que es")) and "dictamen" not in query_lower[8:]:
+            return "GENERAL_CGR"
+        if any(indicator in query_lower for indicator in LEGAL_LIST_INDICATORS):
+            return "LEGAL_LIST"
+        return "ESPECIFICA"
+
+    def _respond(self, messages) -> str:
+        system = messages[0].content if messages else ""
+        human = messages[-1].content if messages else ""
+
+        if system == self._prompts.CLASSIFICATION_SYSTEM_PROMPT:
+            return self._classify(human.split("\n")[-1])
+        if system == self._prompts.REWRITE_SYSTEM_PROMPT:
+            return human.split("Pregunta original del usuario: ", 1)[-1].split("\n\n")[0]
+        if system == self._prompts.MULTI_QUERY_SYSTEM_PROMPT:
+            query = human.split(": ", 1)[-1]
+            return "\n".join(f"{query} (variante {i})" for i in range(1, 4))
+        return " ".join(["Respuesta simulada basada en el contexto recuperado."] * (ANSWER_TOKENS // 8))
+
+    def generate(self, messages_batch) -> LLMResult:
+        generations, prompt_tokens, completion_tokens = [], 0, 0
+        for messages in messages_batch:
+            content = self._respond(messages)
+            prompt_tokens += sum(len(message.content) for message in messages) // CHARS_PER_TOKEN
+            completion_tokens += len(content) // CHARS_PER_TOKEN
+            generations.append([ChatGeneration(message=AIMessage(content=content))])
+
+        _sleep(CHAT_BASE_MS + CHAT_PER_COMPLETION_TOKEN_MS * completion_tokens)
+        return LLMResult(generations=generations, llm_output={"token_usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }})
+
+    def invoke(self, messages) -> AIMessage:
+        return self.generate([messages]).generations[0][0].message
@@ -0,0 +1,247 @@
+# backend/src/traffic.py
+
+"""
+Trazas por petición y grabación anonimizada del tráfico de /chat.
+
+Cada petición de /chat corre dentro de una traza (por hilo) donde los módulos registran
+llamadas a servicios externos (LLM, embeddings, búsqueda), aciertos de caché, tokens,
+tiempos por etapa y atributos (intención, tipo de búsqueda, modo degradado). Fuera de una
+traza, `count`, `annotate` y `stage` no hacen nada.
+
+Con TRAFFIC_RECORD_ENABLED, cada traza se agrega como una línea JSON compacta a un log
+por proceso (solo anexar). Los IDs de sesión se guardan como hash con sal (TRAFFIC_RECORD_SALT,
+o una sal aleatoria generada y guardada en TRAFFIC_RECORD_DIR/.salt) y las consultas
+según TRAFFIC_RECORD_QUERIES: 'hash' (por defecto: solo huella, para medir repetición) o,
+si se habilita explícitamente, 'redacted' (texto sin RUT, correos ni teléfonos) o 'full'.
+El grabador se crea al iniciar la app (`start_recording`). El log se reproduce con
+`python -m src.replay`.
+"""
+
+import hashlib
+import os
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from .answer_store import normalize_query
+from .config import TRAFFIC_RECORD_ENABLED, TRAFFIC_RECORD_DIR, TRAFFIC_RECORD_QUERIES
+from .config import TRAFFIC_RECORD_SALT, TRAFFIC_RECORD_MAX_BYTES
+from .serialization import dumps
+
+REDACTION_PATTERNS = [
+    (re.compile(r"\b\d{1,2}\.?\d{3}\.?\d{3}-[\dkK]\b"), "<rut>"),
+    (re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+"), "<email>"),
+    (re.compile(r"\+?\b56\s?9\s?\d{4}\s?\d{4}\b|\b9\s?\d{4}\s?\d{4}\b"), "<telefono>"),
+]
+
+_local = threading.local()
+
+# Peticiones en curso en este proceso (el warm-up de cachés se pausa mientras haya tráfico)
+_active_requests = 0
+_active_lock = threading.Lock()
+
+
+class RequestTrace:
+    """Contadores, tiempos por etapa y atributos de una petición."""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.counts: Dict[str, float] = {}
+        self.stages: Dict[str, float] = {}
+        self.attrs: Dict = {}
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._start) * 1000
+
+    def summary(self) -> Dict:
+        """Resumen de la traza (también se expone en el encabezado X-Request-Trace)."""
+        return {
+            "ms": round(self.elapsed_ms(), 1),
+            "counts": self.counts,
+            "stages": {name: round(ms, 1) for name, ms in self.stages.items()},
+            **self.attrs
+        }
+
+
+def active_requests() -> int:
+    return _active_requests
+
+
+def current() -> Optional[RequestTrace]:
+    return getattr(_local, "trace", None)
+
+
+def count(name: str, value: float = 1):
+    trace = current()
+    if trace is not None:
+        trace.counts[name] = trace.counts.get(name, 0) + value
+
+
+def annotate(**attrs):
+    trace = current()
+    if trace is not None:
+        trace.attrs.update(attrs)
+
+
+@contextmanager
+def stage(name: str):
+    """Mide la duración de una etapa (acumulada si se repite)."""
+    trace = current()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.stages[name] = trace.stages.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+
+def bind(fn):
+    """Envuelve `fn` para que, ejecutada en otro hilo (pools), registre en la traza actual."""
+    trace = current()
+    if trace is None:
+        return fn
+
+    def bound(*args, **kwargs):
+        previous = current()
+        _local.trace = trace
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.trace = previous
+    return bound
+
+
+def hash_value(value: str, salt: str) -> str:
+    return hashlib.sha256(f"{salt}:{value}".encode("utf-8")).hexdigest()[:16]
+
+
+def load_salt(directory: str) -> str:
+    """
+    Sal de los hashes del log: TRAFFIC_RECORD_SALT o, si no está configurada, una aleatoria
+    guardada en `directory`/.salt (compartida por los workers que graban en ese directorio).
+    Sin sal, los IDs de sesión y las consultas se podrían revertir por fuerza bruta.
+    """
+    if TRAFFIC_RECORD_SALT:
+        return TRAFFIC_RECORD_SALT
+
+    path = os.path.join(directory, ".salt")
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # Otro worker la está creando: se espera a que termine de escribirla
+        for _ in range(50):
+            with open(path, encoding="utf-8") as f:
+                salt = f.read().strip()
+            if salt:
+                return salt
+            time.sleep(0.1)
+        raise RuntimeError(f"La sal de {path} está vacía")
+
+    salt = secrets.token_hex(32)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(salt)
+    print(f"🔑 TRAFFIC_RECORD_SALT no configurada: sal aleatoria guardada en {path}")
+    return salt
+
+
+def redact(text: str) -> str:
+    for pattern, replacement in REDACTION_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+class TrafficRecorder:
+    """Log JSONL de solo anexar, un archivo por proceso, rotado al superar TRAFFIC_RECORD_MAX_BYTES."""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._file = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.salt = load_salt(directory)
+
+    def _open(self):
+        path = os.path.join(self.directory, f"traffic-{os.getpid()}-{int(time.time())}.jsonl")
+        self._file = open(path, "ab", buffering=0)
+        print(f"🎙️ Grabando tráfico en {path}")
+
+    def append(self, record: Dict):
+        line = dumps(record) + b"\n"
+        with self._lock:
+            if self._file is None or self._file.tell() + len(line) > self.max_bytes:
+                if self._file:
+                    self._file.close()
+                self._open()
+            self._file.write(line)
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+
+# Se crea en el arranque de la app, no al importar (importar el módulo no toca el disco)
+recorder: Optional[TrafficRecorder] = None
+
+
+def start_recording() -> Optional[TrafficRecorder]:
+    """Crea el grabador del proceso si TRAFFIC_RECORD_ENABLED (idempotente)."""
+    global recorder
+    if TRAFFIC_RECORD_ENABLED and recorder is None:
+        recorder = TrafficRecorder(TRAFFIC_RECORD_DIR, TRAFFIC_RECORD_MAX_BYTES)
+    return recorder
+
+
+def _query_fields(query: str, salt: str) -> Dict:
+    fields = {"query_hash": hash_value(normalize_query(query), salt), "query_words": len(query.split())}
+    if TRAFFIC_RECORD_QUERIES == "full":
+        fields["query"] = query
+    elif TRAFFIC_RECORD_QUERIES == "redacted":
+        fields["query"] = redact(query)
+    return fields
+
+
+def traced(endpoint: str, session_id: str, query: str, fn, /, *args, **kwargs):
+    """
+    Ejecuta `fn` dentro de una traza en el hilo actual y, si la grabación está activa,
+    agrega el registro al log.
+
+    Returns:
+        Tupla (resultado de fn, traza)
+    """
+    global _active_requests
+    trace = RequestTrace(endpoint)
+    _local.trace = trace
+    with _active_lock:
+        _active_requests += 1
+    status = "ok"
+    try:
+        return fn(*args, **kwargs), trace
+    except Exception:
+        status = "error"
+        raise
+    finally:
+        _local.trace = None
+        with _active_lock:
+            _active_requests -= 1
+        if recorder:
+            try:
+                recorder.append({
+                    "ts": round(trace.started_at, 3),
+                    "endpoint": endpoint,
+                    "session": hash_value(session_id, recorder.salt),
+                    **_query_fields(query, recorder.salt),
+                    "status": status,
+                    **trace.summary()
+                })
+            except Exception as e:
+                print(f"⚠️ Error al grabar tráfico: {e}")
@@ -1,27 +1,100 @@
+import threading
+from collections import OrderedDict
 from langchain_openai import AzureOpenAIEmbeddings
-from .config import AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_KEY, AZURE_OPENAI_EMBEDDING_DEPLOYMENT
+from .config import AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_KEY, AZURE_OPENAI_EMBEDDING_DEPLOYMENT, STANDIN_MODE
+from .config import EMBEDDING_CACHE_SIZE
+from . import traffic
 
-# Inicializar el cliente de Embeddings de Azure OpenAI
-try:
-    embedding_model = AzureOpenAIEmbeddings(
-        azure_deployment=AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
-        openai_api_version="2024-02-01",
-        azure_endpoint=AZURE_OPENAI_ENDPOINT,
-        openai_api_key=AZURE_OPENAI_API_KEY
-    )
-    print("✅ AzureOpenAIEmbeddings inicializado.")
-except Exception as e:
-    print(f"❌ Error al inicializar AzureOpenAIEmbeddings. Verifica tu .env. Error: {e}")
-    embedding_model = None
+_embedding_model = None
+_embedding_lock = threading.Lock()
+
+# Caché LRU de embeddings por texto (consultas frecuentes, precargadas por cache_warmer)
+# Los vectores se guardan como tuplas y se entregan como listas nuevas: un llamador que
+# modifique su vector no altera la caché compartida entre hilos
+_embedding_cache: "OrderedDict[str, tuple[float, ...]]" = OrderedDict()
+_embedding_cache_lock = threading.Lock()
+
+def _cache_get(text: str) -> list[float] | None:
+    with _embedding_cache_lock:
+        vector = _embedding_cache.get(text)
+        if vector is not None:
+            _embedding_cache.move_to_end(text)
+    return list(vector) if vector is not None else None
+
+def _cache_put(text: str, vector: list[float]):
+    if not EMBEDDING_CACHE_SIZE or not vector:
+        return
+    vector = tuple(vector)
+    with _embedding_cache_lock:
+        _embedding_cache[text] = vector
+        _embedding_cache.move_to_end(text)
+        while len(_embedding_cache) > EMBEDDING_CACHE_SIZE:
+            _embedding_cache.popitem(last=False)
+
+def get_embedding_model() -> AzureOpenAIEmbeddings | None:
+    """
+    Devuelve el cliente de Embeddings de Azure OpenAI, creándolo en el primer uso.
+    """
+    global _embedding_model
+    if _embedding_model is None:
+        with _embedding_lock:
+            if _embedding_model is None:
+                if STANDIN_MODE:
+                    from .standins import StandInEmbeddings
+                    _embedding_model = StandInEmbeddings()
+                    return _embedding_model
+                try:
+                    _embedding_model = AzureOpenAIEmbeddings(
+                        azure_deployment=AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
+                        openai_api_version="2024-02-01",
+                        azure_endpoint=AZURE_OPENAI_ENDPOINT,
+                        openai_api_key=AZURE_OPENAI_API_KEY
+                    )
+                    print("✅ AzureOpenAIEmbeddings inicializado.")
+                except Exception as e:
+                    print(f"❌ Error al inicializar AzureOpenAIEmbeddings. Verifica tu .env. Error: {e}")
+                    _embedding_model = False
+    return _embedding_model or None
 
 def get_embedding(text: str) -> list[float] | None:
     """
     Genera el vector de embedding para una consulta de texto.
     """
+    embedding_model = get_embedding_model()
     if not embedding_model:
         return None
+    cached = _cache_get(text)
+    if cached is not None:
+        traffic.count("embedding_cache_hits")
+        return cached
+    traffic.count("embedding_calls")
     try:
-        return embedding_model.embed_query(text)
+        vector = embedding_model.embed_query(text)
+        _cache_put(text, vector)
+        return vector
     except Exception as e:
         print(f"Error generando embedding para el texto: '{text[:20]}...'. Error: {e}")
         return None
+
+def get_embeddings(texts: list[str]) -> list[list[float]] | None:
+    """
+    Genera los vectores de embedding para varios textos en una sola llamada
+    (solo para los que no están en la caché).
+    """
+    embedding_model = get_embedding_model()
+    if not embedding_model or not texts:
+        return None
+    vectors = {text: _cache_get(text) for text in texts}
+    missing = [text for text, vector in vectors.items() if vector is None]
+    traffic.count("embedding_cache_hits", len(vectors) - len(missing))
+    if not missing:
+        return [vectors[text] for text in texts]
+    traffic.count("embedding_calls")
+    try:
+        for text, vector in zip(missing, embedding_model.embed_documents(missing)):
+            vectors[text] = vector
+            _cache_put(text, vector)
+        return [vectors[text] for text in texts]
+    except Exception as e:
+        print(f"Error generando embeddings en lote ({len(texts)} textos). Error: {e}")
+        return None
@@ -6,23 +6,67 @@ import config from './config';
 // Usar la configuración centralizada
 const API_URL = config.CHAT_ENDPOINT;
 
+// Consulta de respuestas que siguen generándose tras una respuesta degradada
+const PENDING_POLL_INTERVAL_MS = 3000;
+const PENDING_POLL_MAX_ATTEMPTS = 40;
+
 const LoadingSpinner = () => (
     <div className="loading-spinner">
         <div className="spinner-circle"></div>
     </div>
 );
 
+// Convierte una fecha ISO (YYYY-MM-DD) al formato DD/MM/YYYY
+const formatDate = (isoDate) => {
+    if (!isoDate) return null;
+    const [year, month, day] = isoDate.split('-');
+    return day && month ? `${day}/${month}/${year}` : isoDate;
+};
+
+// Listado de dictámenes (result_type "legal_list") a partir de las filas tipadas del backend
+const LegalListTable = ({ rows }) => (
+    <div className="legal-list">
+        {rows.map((row, idx) => (
+            <div key={idx} className="legal-list-item">
+                <div className="legal-list-title">
+                    {idx + 1}. Dictamen {row.numero_dictamen}
+                </div>
+                <table className="legal-list-table">
+                    <tbody>
+                        <tr><th>Número</th><td>{row.numero_dictamen}</td></tr>
+                        <tr><th>Fecha</th><td>{formatDate(row.fecha) || row.ano || 'N/A'}</td></tr>
+                        <tr><th>Resumen</th><td className="legal-list-clamp">{row.resumen || 'Resumen no disponible'}</td></tr>
+                        <tr><th>Leyes aplicadas</th><td className="legal-list-clamp">{row.leyes_aplicadas || 'N/A'}</td></tr>
+                        <tr><th>Dictámenes aplicados</th><td className="legal-list-clamp">{row.dictamenes_aplicados || 'N/A'}</td></tr>
+                        {row.url && (
+                            <tr>
+                                <th>URL</th>
+                                <td><a href={row.url} target="_blank" rel="noopener noreferrer">Ver dictamen</a></td>
+                            </tr>
+                        )}
+                    </tbody>
+                </table>
+            </div>
+        ))}
+    </div>
+);
+
 const MessageBubble = ({ msg }) => (
     <div className={`message-bubble ${msg.role}`}>
         <div className="message-content">
             <div className="message-text">{msg.content}</div>
-            {msg.role === 'assistant' && msg.sources && msg.sources.length > 0 && (
+            {msg.resultType === 'legal_list' && msg.rows && msg.rows.length > 0 && (
+                <LegalListTable rows={msg.rows} />
+            )}
+            {msg.role === 'assistant' && !msg.rows && msg.sources && msg.sources.length > 0 && (
                 <div className="message-sources">
                     <div className="sources-title">Fuentes:</div>
                 {[...new Map(msg.sources.map(item => [item['source'], item])).values()].slice(0, 3).map((source, idx) => (
                         <div key={idx} className="source-item">
                             <span className="source-title">{source.source}</span>
-                            <span className="source-score">({source.score.toFixed(2)})</span>
+                            {typeof source.score === 'number' && (
+                                <span className="source-score">({source.score.toFixed(2)})</span>
+                            )}
                         </div>
                     ))}
                 </div>
@@ -68,6 +112,30 @@ export default function ChatContainer() {
         localStorage.setItem('sessionID', sessionID);
     }, [sessionID]);
 
+    // Reemplaza la respuesta degradada (solo fuentes) por la completa cuando esté lista
+    const pollPendingAnswer = async (answerId, degradedMessage) => {
+        for (let attempt = 0; attempt < PENDING_POLL_MAX_ATTEMPTS; attempt++) {
+            await new Promise(resolve => setTimeout(resolve, PENDING_POLL_INTERVAL_MS));
+            try {
+                const response = await fetch(`${API_URL}/pending/${answerId}`);
+                if (response.status === 202) continue;
+                if (!response.ok) return;
+
+                const data = await response.json();
+                if (data.status === 'completed') {
+                    setMessages(prev => prev.map(message => message === degradedMessage
+                        ? { ...message, content: data.response, sources: data.sources || message.sources }
+                        : message
+                    ));
+                }
+                return;
+            } catch (error) {
+                console.error('Error:', error);
+                return;
+            }
+        }
+    };
+
     const handleSendMessage = async () => {
         if (!inputValue.trim() || isLoading) return;
 
@@ -93,9 +161,15 @@ export default function ChatContainer() {
             const botMessage = { 
                 content: data.response, 
                 role: 'assistant',
-                sources: data.sources || []
+                sources: data.sources || [],
+                resultType: data.result_type,
+                rows: data.rows
             };
             setMessages(prev => [...prev, botMessage]);
+
+            if (data.pending_answer_id) {
+                pollPendingAnswer(data.pending_answer_id, botMessage);
+            }
         } catch (error) {
             console.error('Error:', error);
             const errorMessage = { 